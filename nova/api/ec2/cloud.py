@@ -363,6 +363,11 @@ class CloudController(object):
         else:
             snapshots = self.volume_api.get_all_snapshots(context)
 
+        # Resolve the ec2 ids of all snapshots and volumes at once
+        ec2utils.get_int_ids_from_snapshot_uuids(s['id'] for s in snapshots)
+        ec2utils.get_int_ids_from_volume_uuids(s['volume_id']
+                                               for s in snapshots)
+
         formatted_snapshots = []
         for s in snapshots:
             formatted = self._format_snapshot(context, s)
@@ -793,6 +798,14 @@ class CloudController(object):
                 volumes.append(volume)
         else:
             volumes = self.volume_api.get_all(context)
+
+        # Resolve the ec2 ids of all volumes, and of the instances and
+        # snapshots they refer to, at once
+        ec2utils.get_int_ids_from_volume_uuids(v['id'] for v in volumes)
+        ec2utils.get_int_ids_from_instance_uuids(v.get('instance_uuid')
+                                                 for v in volumes)
+        ec2utils.get_int_ids_from_snapshot_uuids(v.get('snapshot_id')
+                                                 for v in volumes)
         volumes = [self._format_volume(context, v) for v in volumes]
         return {'volumeSet': volumes}
 
@@ -1063,13 +1076,14 @@ class CloudController(object):
         return {'instancesSet': instances_set}
 
     def _format_instance_bdm(self, context, instance_uuid, root_device_name,
-                             result):
+                             result, bdms=None):
         """Format InstanceBlockDeviceMappingResponseItemType."""
         root_device_type = 'instance-store'
         mapping = []
-        for bdm in block_device.legacy_mapping(
-            db.block_device_mapping_get_all_by_instance(context,
-                                                        instance_uuid)):
+        if bdms is None:
+            bdms = db.block_device_mapping_get_all_by_instance(context,
+                                                               instance_uuid)
+        for bdm in block_device.legacy_mapping(bdms):
             volume_id = bdm['volume_id']
             if (volume_id is None or bdm['no_device']):
                 continue
@@ -1148,6 +1162,19 @@ class CloudController(object):
             except exception.NotFound:
                 instances = []
 
+        # Look up the block device mappings of all instances at once:
+        bdms_by_instance = dict((instance['uuid'], [])
+                                for instance in instances)
+        for bdm in db.block_device_mapping_get_all_by_instance_uuids(
+                context, bdms_by_instance.keys()):
+            bdms_by_instance[bdm['instance_uuid']].append(bdm)
+
+        # Resolve the ec2 ids of all instances at once
+        ec2utils.get_int_ids_from_instance_uuids(bdms_by_instance.keys())
+        # and the availability zones of their hosts
+        zones = availability_zones.get_hosts_availability_zones(context,
+                [instance['host'] for instance in instances])
+
         for instance in instances:
             if not context.is_admin:
                 if pipelib.is_vpn_image(instance['image_ref']):
@@ -1197,10 +1224,9 @@ class CloudController(object):
             i['amiLaunchIndex'] = instance['launch_index']
             self._format_instance_root_device_name(instance, i)
             self._format_instance_bdm(context, instance['uuid'],
-                                      i['rootDeviceName'], i)
-            host = instance['host']
-            zone = ec2utils.get_availability_zone_by_host(host)
-            i['placement'] = {'availabilityZone': zone}
+                                      i['rootDeviceName'], i,
+                                      bdms_by_instance[instance['uuid']])
+            i['placement'] = {'availabilityZone': zones[instance['host']]}
             if instance['reservation_id'] not in reservations:
                 r = {}
                 r['reservationId'] = instance['reservation_id']
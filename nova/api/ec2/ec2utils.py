@@ -16,9 +16,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import functools
 import re
 
+from oslo.config import cfg
+
 from nova import availability_zones
 from nova import context
 from nova import db
@@ -31,31 +34,139 @@ from nova.openstack.common import memorycache
 from nova.openstack.common import timeutils
 from nova.openstack.common import uuidutils
 
+ec2utils_opts = [
+    cfg.IntOpt('ec2_id_mapping_cache_size',
+               default=10000,
+               help='Number of ec2 id mappings kept in the in-process LRU '
+                    'cache in front of the memcache client, 0 disables it'),
+    ]
+
+CONF = cfg.CONF
+CONF.register_opts(ec2utils_opts)
+
 LOG = logging.getLogger(__name__)
 # NOTE(vish): cache mapping for one week
 _CACHE_TIME = 7 * 24 * 60 * 60
 _CACHE = None
+_LRU_CACHE = None
+
+
+class LRUCache(object):
+    """A bounded mapping which evicts the least recently used keys."""
+
+    def __init__(self, size):
+        self.size = size
+        self._items = collections.OrderedDict()
+
+    def get(self, key):
+        try:
+            value = self._items.pop(key)
+        except KeyError:
+            return None
+        self._items[key] = value
+        return value
+
+    def set(self, key, value):
+        if self.size <= 0:
+            return
+        self._items.pop(key, None)
+        self._items[key] = value
+        while len(self._items) > self.size:
+            self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+def _get_lru_cache():
+    global _LRU_CACHE
+    if _LRU_CACHE is None:
+        _LRU_CACHE = LRUCache(CONF.ec2_id_mapping_cache_size)
+    return _LRU_CACHE
+
+
+def _cache_key(func_name, reqid):
+    return str("%s:%s" % (func_name, reqid))
 
 
 def memoize(func):
     @functools.wraps(func)
     def memoizer(context, reqid):
         global _CACHE
+        key = _cache_key(func.__name__, reqid)
+        lru_cache = _get_lru_cache()
+        value = lru_cache.get(key)
+        if value is not None:
+            return value
         if not _CACHE:
             _CACHE = memorycache.get_client()
-        key = "%s:%s" % (func.__name__, reqid)
-        key = str(key)
         value = _CACHE.get(key)
         if value is None:
             value = func(context, reqid)
             _CACHE.set(key, value, time=_CACHE_TIME)
+        lru_cache.set(key, value)
         return value
     return memoizer
 
 
 def reset_cache():
     global _CACHE
+    global _LRU_CACHE
     _CACHE = None
+    _LRU_CACHE = None
+
+
+def _get_int_ids_from_uuids(uuids, get_or_create, to_int_id, to_uuid):
+    """Resolve the ec2 ids of many uuids with a single DB call.
+
+    Mappings which are not cached yet are looked up, or created, in one
+    go and stored in the LRU cache, for both directions, so the memoized
+    lookups done while formatting the results don't hit the DB again.
+    Returns a dict of uuid to int id.
+    """
+    lru_cache = _get_lru_cache()
+    int_ids = {}
+    missing = set()
+    for uuid in uuids:
+        if uuid is None or not uuidutils.is_uuid_like(uuid):
+            continue
+        int_id = lru_cache.get(_cache_key(to_int_id, uuid))
+        if int_id is None:
+            missing.add(uuid)
+        else:
+            int_ids[uuid] = int_id
+
+    if missing:
+        ctxt = context.get_admin_context()
+        for uuid, int_id in get_or_create(ctxt, list(missing)).iteritems():
+            lru_cache.set(_cache_key(to_int_id, uuid), int_id)
+            lru_cache.set(_cache_key(to_uuid, int_id), uuid)
+            int_ids[uuid] = int_id
+    return int_ids
+
+
+def get_int_ids_from_instance_uuids(instance_uuids):
+    """Get or create the ec2 ids of many instance uuids at once."""
+    return _get_int_ids_from_uuids(instance_uuids,
+                                   db.ec2_instance_ids_get_or_create,
+                                   'get_int_id_from_instance_uuid',
+                                   'get_instance_uuid_from_int_id')
+
+
+def get_int_ids_from_volume_uuids(volume_uuids):
+    """Get or create the ec2 ids of many volume uuids at once."""
+    return _get_int_ids_from_uuids(volume_uuids,
+                                   db.ec2_volume_ids_get_or_create,
+                                   'get_int_id_from_volume_uuid',
+                                   'get_volume_uuid_from_int_id')
+
+
+def get_int_ids_from_snapshot_uuids(snapshot_uuids):
+    """Get or create the ec2 ids of many snapshot uuids at once."""
+    return _get_int_ids_from_uuids(snapshot_uuids,
+                                   db.ec2_snapshot_ids_get_or_create,
+                                   'get_int_id_from_snapshot_uuid',
+                                   'get_snapshot_uuid_from_int_id')
 
 
 def image_type(image_type):
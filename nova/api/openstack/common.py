@@ -358,6 +358,18 @@ def get_networks_for_instance(context, instance):
     return get_networks_for_instance_from_nw_info(nw_info)
 
 
+def cache_instances_bdms(req, compute_api, context, instances):
+    """Fetch the block device mappings of a list of instances with a single
+    query and store them on the request for use by API extensions.
+
+    Instances whose mappings were already stored are not looked up again.
+    """
+    missing = [instance for instance in instances
+               if req.get_db_bdms(instance['uuid']) is None]
+    if missing:
+        req.cache_db_bdms(compute_api.get_instances_bdms(context, missing))
+
+
 def raise_http_conflict_for_instance_invalid_state(exc, action):
     """Return a webob.exc.HTTPConflict instance containing a message
     appropriate to return via the API based on the original
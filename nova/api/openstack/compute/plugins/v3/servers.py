@@ -598,13 +598,20 @@ class ServersController(wsgi.Controller):
             else:
                 search_opts['user_id'] = context.user_id
 
+        # The non-detailed view only shows the uuid and name, so don't load
+        # the rest of the instance and its side tables.
+        columns = None
+        if not is_detail:
+            columns = ['uuid', 'display_name']
+
         limit, marker = common.get_limit_and_marker(req)
         try:
             instance_list = self.compute_api.get_all(context,
                                                      search_opts=search_opts,
                                                      limit=limit,
                                                      marker=marker,
-                                                     want_objects=True)
+                                                     want_objects=True,
+                                                     columns=columns)
         except exception.MarkerNotFound as e:
             msg = _('marker [%s] not found') % marker
             raise exc.HTTPBadRequest(explanation=msg)
@@ -133,6 +133,23 @@ class Request(webob.Request):
     def get_db_flavor(self, flavorid):
         return self.get_db_item('flavors', flavorid)
 
+    def cache_db_bdms(self, bdms_by_instance):
+        """
+        Allow API methods and extensions to store the block device
+        mappings of instances, keyed by instance uuid, to be used by
+        other extensions within the same API request.
+        """
+        db_items = self._extension_data['db_items'].setdefault('bdms', {})
+        db_items.update(bdms_by_instance)
+
+    def get_db_bdms(self, instance_uuid):
+        """
+        Return the previously stored block device mappings of an
+        instance, or None if they were not stored.
+        """
+        return self._extension_data['db_items'].get('bdms', {}).get(
+                instance_uuid)
+
     def best_match_content_type(self):
         """Determine the requested response content-type."""
         if 'nova.best_content_type' not in self.environ:
@@ -19,11 +19,13 @@ from oslo.config import cfg
 
 from nova import db
 from nova.openstack.common import memorycache
+from nova.openstack.common import timeutils
 
 # NOTE(vish): azs don't change that often, so cache them for an hour to
 #             avoid hitting the db multiple times on every request.
 AZ_CACHE_SECONDS = 60 * 60
 MC = None
+ZONE_MAP = None
 
 availability_zone_opts = [
     cfg.StrOpt('internal_service_availability_zone',
@@ -32,6 +34,11 @@ availability_zone_opts = [
     cfg.StrOpt('default_availability_zone',
                default='nova',
                help='default compute node availability_zone'),
+    cfg.IntOpt('availability_zone_map_ttl',
+               default=0,
+               help='Number of seconds the map of every host to its '
+                    'availability_zone is kept in memory before it is '
+                    'reloaded, 0 loads it again for every lookup'),
     ]
 
 CONF = cfg.CONF
@@ -47,12 +54,68 @@ def _get_cache():
     return MC
 
 
+def _get_zone_map():
+    global ZONE_MAP
+
+    if ZONE_MAP is None:
+        ZONE_MAP = ZoneMap()
+
+    return ZONE_MAP
+
+
 def _reset_cache():
     """Reset the cache, mainly for testing purposes."""
 
     global MC
+    global ZONE_MAP
 
     MC = None
+    ZONE_MAP = None
+
+
+def reset_zone_map():
+    """Make the host to availability_zone map reload on the next lookup.
+
+    Called when the aggregates change, so the new zones show up at once
+    in this process.
+    """
+    if ZONE_MAP is not None:
+        ZONE_MAP.invalidate()
+
+
+class ZoneMap(object):
+    """Map of every host to its availability_zone.
+
+    The map is loaded with a single aggregate query and kept for
+    availability_zone_map_ttl seconds, or until it is invalidated.
+    """
+
+    def __init__(self):
+        self._zones = None
+        self._updated_at = None
+
+    def invalidate(self):
+        self._zones = None
+
+    def _expired(self):
+        ttl = CONF.availability_zone_map_ttl
+        return (self._zones is None or ttl <= 0 or
+                timeutils.is_older_than(self._updated_at, ttl))
+
+    def _load(self, context):
+        metadata = db.aggregate_host_get_by_metadata_key(context,
+                key='availability_zone')
+        self._zones = dict((host, list(zones)[0])
+                           for host, zones in metadata.iteritems())
+        self._updated_at = timeutils.utcnow()
+
+    def get_zones(self, context, hosts):
+        """Return a dict of the availability_zone of each of the hosts."""
+        if self._expired():
+            self._load(context)
+        return dict((host, self._zones.get(host,
+                                           CONF.default_availability_zone))
+                    for host in hosts)
 
 
 def _make_cache_key(host):
@@ -81,6 +144,8 @@ def set_availability_zones(context, services):
 
 
 def get_host_availability_zone(context, host, conductor_api=None):
+    if not conductor_api and CONF.availability_zone_map_ttl > 0:
+        return get_hosts_availability_zones(context, [host])[host]
     if conductor_api:
         metadata = conductor_api.aggregate_metadata_get_by_host(
             context, host, key='availability_zone')
@@ -94,6 +159,18 @@ def get_host_availability_zone(context, host, conductor_api=None):
     return az
 
 
+def get_hosts_availability_zones(context, hosts):
+    """Return a dict of the availability_zone of each of the hosts.
+
+    The zones of all hosts are looked up at once, rather than with one
+    query per host like get_host_availability_zone() does.
+    """
+    hosts = set(hosts)
+    if not hosts:
+        return {}
+    return _get_zone_map().get_zones(context.elevated(), hosts)
+
+
 def get_availability_zones(context, get_only_available=False):
     """Return available and unavailable zones on demands.
 
@@ -131,6 +208,9 @@ def get_instance_availability_zone(context, instance):
     if not host:
         return None
 
+    if CONF.availability_zone_map_ttl > 0:
+        return get_hosts_availability_zones(context, [host])[host]
+
     cache_key = _make_cache_key(host)
     cache = _get_cache()
     az = cache.get(cache_key)
@@ -139,3 +219,17 @@ def get_instance_availability_zone(context, instance):
         az = get_host_availability_zone(elevated, host)
         cache.set(cache_key, az, AZ_CACHE_SECONDS)
     return az
+
+
+def get_instances_availability_zones(context, instances):
+    """Return a dict of the availability zone of each instance by uuid.
+
+    Like get_instance_availability_zone(), but the zones of the hosts of
+    all instances are looked up at once.
+    """
+    hosts = dict((instance['uuid'], str(instance.get('host')))
+                 for instance in instances)
+    zones = get_hosts_availability_zones(context,
+                                         [host for host in hosts.values()
+                                          if host])
+    return dict((uuid, zones.get(host)) for uuid, host in hosts.iteritems())
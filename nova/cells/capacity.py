@@ -0,0 +1,217 @@
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Free capacity of a cell for every instance type.
+
+get_capacities() walks every compute node for every instance type.
+CapacityTable computes the same capacities with NumPy array operations
+over all compute nodes at once, and keeps its rows between refreshes so
+that only the compute nodes whose free or total ram and disk changed are
+computed again.
+"""
+
+from oslo.config import cfg
+
+from nova.openstack.common.gettextutils import _
+from nova.openstack.common import log as logging
+
+numpy = None
+try:
+    import numpy
+except ImportError:
+    pass
+
+capacity_opts = [
+    cfg.BoolOpt('vectorized_capacity',
+                default=False,
+                help='Compute the free capacity of this cell for every '
+                     'instance type with array operations over all compute '
+                     'nodes, only recomputing the compute nodes which '
+                     'changed since the last update. Requires numpy'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(capacity_opts, group='cells')
+
+LOG = logging.getLogger(__name__)
+
+# Columns of the compute node values, as found in the compute hosts dicts
+_COLUMNS = ('free_ram_mb', 'free_disk_mb', 'total_ram_mb', 'total_disk_mb')
+
+
+def is_enabled():
+    """Return True if cell capacities should use a CapacityTable."""
+    if not CONF.cells.vectorized_capacity:
+        return False
+    if numpy is None:
+        LOG.warn(_('vectorized_capacity is set but numpy is not available, '
+                   'falling back to per compute node capacities'))
+        return False
+    return True
+
+
+def _instance_type_sizes(instance_type):
+    memory_mb = instance_type['memory_mb']
+    disk_mb = (instance_type['root_gb'] +
+            instance_type['ephemeral_gb']) * 1024
+    return memory_mb, disk_mb
+
+
+def _capacities(total_ram_mb_free, total_disk_mb_free, ram_mb_free_units,
+                disk_mb_free_units):
+    return {'ram_free': {'total_mb': total_ram_mb_free,
+                         'units_by_mb': ram_mb_free_units},
+            'disk_free': {'total_mb': total_disk_mb_free,
+                          'units_by_mb': disk_mb_free_units}}
+
+
+def get_capacities(compute_hosts, instance_types, reserve_level):
+    """Return the free ram and disk of a cell and the number of instances
+    of every instance type they can hold.
+
+    :param compute_hosts: dict of host name to a dict with the free_ram_mb,
+                          free_disk_mb, total_ram_mb and total_disk_mb of
+                          its compute node
+    :param instance_types: list of instance types
+    :param reserve_level: fraction of the total ram and disk of every
+                          compute node to keep free
+    """
+    ram_mb_free_units = {}
+    disk_mb_free_units = {}
+    total_ram_mb_free = 0
+    total_disk_mb_free = 0
+
+    def _free_units(total, free, per_inst):
+        if per_inst:
+            min_free = total * reserve_level
+            free = max(0, free - min_free)
+            return int(free / per_inst)
+        else:
+            return 0
+
+    def _update_from_values(values, instance_type):
+        memory_mb, disk_mb = _instance_type_sizes(instance_type)
+        ram_mb_free_units.setdefault(str(memory_mb), 0)
+        disk_mb_free_units.setdefault(str(disk_mb), 0)
+        ram_free_units = _free_units(values['total_ram_mb'],
+                values['free_ram_mb'], memory_mb)
+        disk_free_units = _free_units(values['total_disk_mb'],
+                values['free_disk_mb'], disk_mb)
+        ram_mb_free_units[str(memory_mb)] += ram_free_units
+        disk_mb_free_units[str(disk_mb)] += disk_free_units
+
+    for compute_values in compute_hosts.values():
+        total_ram_mb_free += compute_values['free_ram_mb']
+        total_disk_mb_free += compute_values['free_disk_mb']
+        for instance_type in instance_types:
+            _update_from_values(compute_values, instance_type)
+
+    return _capacities(total_ram_mb_free, total_disk_mb_free,
+                       ram_mb_free_units, disk_mb_free_units)
+
+
+class CapacityTable(object):
+    """The compute nodes of a cell and the instances they can hold, as
+    NumPy arrays with a row per compute node and a column per instance
+    type.
+
+    The per column totals are kept up to date as rows change, so a refresh
+    where only a few compute nodes changed only computes those rows.  A
+    change of the compute nodes, instance types or reserve level rebuilds
+    the whole table.
+    """
+
+    def __init__(self):
+        self._hosts = None
+        self._sizes = None
+        self._reserve_level = None
+        self._values = None
+        self._ram_units = None
+        self._disk_units = None
+        self._ram_totals = None
+        self._disk_totals = None
+        self.rows_computed = 0
+
+    @staticmethod
+    def _units(free, total, per_inst, reserve_level):
+        """Number of instances of each size fitting on each compute node,
+        the same way get_capacities() computes them.
+        """
+        free = numpy.maximum(0, free - total * reserve_level)
+        units = numpy.zeros((len(free), len(per_inst)), dtype=numpy.int64)
+        sized = per_inst != 0
+        units[:, sized] = numpy.trunc(free[:, numpy.newaxis] /
+                                      per_inst[sized])
+        return units
+
+    def _compute_rows(self, values):
+        ram_units = self._units(values[:, 0], values[:, 2],
+                                self._sizes[:, 0], self._reserve_level)
+        disk_units = self._units(values[:, 1], values[:, 3],
+                                 self._sizes[:, 1], self._reserve_level)
+        self.rows_computed += len(values)
+        return ram_units, disk_units
+
+    def refresh(self, compute_hosts, instance_types, reserve_level):
+        """Bring the table up to date with the compute nodes of the cell
+        and return the capacities get_capacities() would return for them.
+        """
+        hosts = sorted(compute_hosts)
+        values = numpy.array([[compute_hosts[host][column]
+                               for column in _COLUMNS]
+                              for host in hosts], dtype=numpy.int64)
+        values = values.reshape((len(hosts), len(_COLUMNS)))
+        sizes = numpy.array([_instance_type_sizes(instance_type)
+                             for instance_type in instance_types],
+                            dtype=numpy.int64).reshape((-1, 2))
+
+        if (hosts != self._hosts or reserve_level != self._reserve_level or
+                not numpy.array_equal(sizes, self._sizes)):
+            self._hosts = hosts
+            self._sizes = sizes
+            self._reserve_level = reserve_level
+            self._values = values
+            self._ram_units, self._disk_units = self._compute_rows(values)
+            self._ram_totals = self._ram_units.sum(axis=0)
+            self._disk_totals = self._disk_units.sum(axis=0)
+        else:
+            changed = numpy.flatnonzero((values != self._values).any(axis=1))
+            if len(changed):
+                ram_units, disk_units = self._compute_rows(values[changed])
+                self._ram_totals += (ram_units.sum(axis=0) -
+                                     self._ram_units[changed].sum(axis=0))
+                self._disk_totals += (disk_units.sum(axis=0) -
+                                      self._disk_units[changed].sum(axis=0))
+                self._ram_units[changed] = ram_units
+                self._disk_units[changed] = disk_units
+                self._values[changed] = values[changed]
+
+        return self.get_capacities()
+
+    def get_capacities(self):
+        ram_mb_free_units = {}
+        disk_mb_free_units = {}
+        # Instance types of the same size add up under the same key
+        for (memory_mb, disk_mb), ram_units, disk_units in zip(
+                self._sizes.tolist(), self._ram_totals.tolist(),
+                self._disk_totals.tolist()):
+            ram_mb_free_units[str(memory_mb)] = (
+                    ram_mb_free_units.get(str(memory_mb), 0) + ram_units)
+            disk_mb_free_units[str(disk_mb)] = (
+                    disk_mb_free_units.get(str(disk_mb), 0) + disk_units)
+        totals = self._values[:, :2].sum(axis=0).tolist()
+        return _capacities(totals[0], totals[1], ram_mb_free_units,
+                           disk_mb_free_units)
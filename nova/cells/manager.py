@@ -27,7 +27,9 @@ from nova.cells import utils as cells_utils
 from nova import context
 from nova import exception
 from nova import manager
+from nova.openstack.common.gettextutils import _
 from nova.openstack.common import importutils
+from nova.openstack.common import log as logging
 from nova.openstack.common import periodic_task
 from nova.openstack.common import timeutils
 
@@ -47,8 +49,29 @@ cell_manager_opts = [
 
 CONF = cfg.CONF
 CONF.import_opt('name', 'nova.cells.opts', group='cells')
+CONF.import_opt('broadcast_cell_timeout', 'nova.cells.messaging',
+                group='cells')
 CONF.register_opts(cell_manager_opts, group='cells')
 
+LOG = logging.getLogger(__name__)
+
+
+def _answered_responses(responses):
+    """Leave the cells which timed out out of the responses to a streamed
+    broadcast, so the results of the cells which answered are returned.
+    """
+    if not CONF.cells.broadcast_cell_timeout:
+        return responses
+    answered = []
+    for response in responses:
+        if (response.failure and
+                isinstance(response.value, exception.CellTimeout)):
+            LOG.warn(_("Leaving out the results of cell %s, which timed "
+                       "out"), response.cell_name)
+            continue
+        answered.append(response)
+    return answered
+
 
 class CellsManager(manager.Manager):
     """The nova-cells manager class.  This class defines RPC
@@ -241,7 +264,8 @@ class CellsManager(manager.Manager):
 
     def service_get_all(self, ctxt, filters):
         """Return services in this cell and in all child cells."""
-        responses = self.msg_runner.service_get_all(ctxt, filters)
+        responses = _answered_responses(
+                self.msg_runner.service_get_all(ctxt, filters))
         ret_services = []
         # 1 response per cell.  Each response is a list of services.
         for response in responses:
@@ -308,9 +332,9 @@ class CellsManager(manager.Manager):
             # cell_name and that the target is all hosts
             if cell_name is None:
                 cell_name, host = host, cell_name
-        responses = self.msg_runner.task_log_get_all(ctxt, cell_name,
-                task_name, period_beginning, period_ending,
-                host=host, state=state)
+        responses = _answered_responses(self.msg_runner.task_log_get_all(
+                ctxt, cell_name, task_name, period_beginning, period_ending,
+                host=host, state=state))
         # 1 response per cell.  Each response is a list of task log
         # entries.
         ret_task_logs = []
@@ -334,8 +358,9 @@ class CellsManager(manager.Manager):
 
     def compute_node_get_all(self, ctxt, hypervisor_match=None):
         """Return list of compute nodes in all cells."""
-        responses = self.msg_runner.compute_node_get_all(ctxt,
-                hypervisor_match=hypervisor_match)
+        responses = _answered_responses(
+                self.msg_runner.compute_node_get_all(ctxt,
+                        hypervisor_match=hypervisor_match))
         # 1 response per cell.  Each response is a list of compute_node
         # entries.
         ret_nodes = []
@@ -349,7 +374,8 @@ class CellsManager(manager.Manager):
 
     def compute_node_stats(self, ctxt):
         """Return compute node stats totals from all cells."""
-        responses = self.msg_runner.compute_node_stats(ctxt)
+        responses = _answered_responses(
+                self.msg_runner.compute_node_stats(ctxt))
         totals = {}
         for response in responses:
             data = response.value_or_raise()
@@ -411,8 +437,9 @@ class CellsManager(manager.Manager):
             target_cell = '%s%s%s' % (CONF.cells.name, _path_cell_sep,
                                       filters['cell_name'])
 
-        responses = self.msg_runner.get_migrations(ctxt, target_cell,
-                                                       False, filters)
+        responses = _answered_responses(
+                self.msg_runner.get_migrations(ctxt, target_cell, False,
+                                               filters))
         migrations = []
         for response in responses:
             migrations += response.value_or_raise()
@@ -23,7 +23,9 @@ reached.
 The interface into this module is the MessageRunner class.
 """
 import sys
+import time
 
+from eventlet import greenthread
 from eventlet import queue
 from oslo.config import cfg
 
@@ -56,7 +58,23 @@ cell_messaging_opts = [
             help='Maximum number of hops for cells routing.'),
     cfg.StrOpt('scheduler',
             default='nova.cells.scheduler.CellsScheduler',
-            help='Cells scheduler to use')]
+            help='Cells scheduler to use'),
+    cfg.FloatOpt('instance_update_batch_interval',
+            default=0.0,
+            help='Seconds to gather the instance updates sent to the top '
+                 'level cell for, keeping only the latest of each '
+                 'instance, before sending them up in a single message. '
+                 '0 sends every update on its own'),
+    cfg.FloatOpt('broadcast_cell_timeout',
+            default=0.0,
+            help='Seconds to wait for the responses of each neighbor cell '
+                 'to a broadcast call.  Cells forward the responses of '
+                 'their neighbors as they arrive, give their own '
+                 'neighbors half of their time and answer with a '
+                 'CellTimeout for each neighbor which did not, so the '
+                 'results of the cells which answered are returned. 0 '
+                 'waits for all cells for up to call_timeout, failing the '
+                 'whole call on a timeout. Every cell must support it')]
 
 CONF = cfg.CONF
 CONF.import_opt('name', 'nova.cells.opts', group='cells')
@@ -456,13 +474,19 @@ class _BroadcastMessage(_BaseMessage):
     message_type = 'broadcast'
 
     def __init__(self, msg_runner, ctxt, method_name, method_kwargs,
-            direction, run_locally=True, **kwargs):
+            direction, run_locally=True, cell_timeout=None, **kwargs):
         super(_BroadcastMessage, self).__init__(msg_runner, ctxt,
                 method_name, method_kwargs, direction, **kwargs)
         # The local cell creating this message has the option
         # to be able to process the message locally or not.
         self.run_locally = run_locally
         self.is_broadcast = True
+        # Seconds this cell may wait for the responses of its neighbors,
+        # when responses are streamed.
+        if cell_timeout is None and self.source_is_us():
+            cell_timeout = CONF.cells.broadcast_cell_timeout or None
+        self.cell_timeout = cell_timeout
+        self.base_attrs_to_json.append('cell_timeout')
 
     def _get_next_hops(self):
         """Set the next hops and return the number of hops.  The next
@@ -527,6 +551,9 @@ class _BroadcastMessage(_BaseMessage):
             self._send_to_cells(next_hops)
             return
 
+        if self.cell_timeout:
+            return self._process_streamed(next_hops)
+
         # We'll need to aggregate all of the responses (from ourself
         # and our sibling cells) into 1 response
         try:
@@ -563,6 +590,129 @@ class _BroadcastMessage(_BaseMessage):
             remote_responses.append(local_response.to_json())
         return self._send_json_responses(remote_responses)
 
+    def _neighbor_path(self, cell):
+        return '%s%s%s' % (self.routing_path, _PATH_CELL_SEP, cell.name)
+
+    def _timeout_response(self, cell):
+        exc = exception.CellTimeout()
+        return Response(self._neighbor_path(cell),
+                        (exception.CellTimeout, exc, None), True)
+
+    def _send_response_chunk(self, json_responses, chunks=None):
+        """Send some of the responses to this message to the neighbor cell
+        we got it from, without waiting for the others.  The last chunk
+        has the number of chunks sent before it.
+        """
+        direction = self.direction == 'up' and 'down' or 'up'
+        # The original message is left out, only the source needs it and
+        # it is the same for every chunk.
+        response_kwargs = {'orig_message': None,
+                           'responses': json_responses,
+                           'sender': self.our_path_part,
+                           'chunks': chunks}
+        target_cell = _response_cell_name_from_path(self.routing_path,
+                neighbor_only=True)
+        response = self.msg_runner._create_response_message(self.ctxt,
+                direction, target_cell, self.uuid, response_kwargs,
+                fanout=True)
+        response.process()
+
+    def _process_streamed(self, next_hops):
+        """Process a broadcast call whose responses are streamed back.
+
+        The message is sent to the neighbor cells with half of our
+        cell_timeout, so their partial responses get back to us before we
+        give up on them.  Responses from the neighbors are forwarded to
+        the source as they arrive, unless we are the source.  Neighbors
+        which could not be sent the message or did not respond in time
+        get a failed Response with the error, the other responses are
+        still returned.
+        """
+        cell_timeout = self.cell_timeout
+        self.cell_timeout = cell_timeout / 2.0
+        self._setup_response_queue()
+        # Our own response and the errors of our neighbors, sent last
+        last_responses = []
+        waiting = []
+        for cell in next_hops:
+            try:
+                cell.send_message(self)
+            except Exception as exc:
+                LOG.exception(_("Error sending message to cell %(cell)s: "
+                                "%(exc)s"), {'cell': cell.name, 'exc': exc})
+                response = Response(self._neighbor_path(cell),
+                                    sys.exc_info(), True)
+                last_responses.append(response.to_json())
+                continue
+            waiting.append(cell)
+        sent_at = time.time()
+
+        if self.run_locally:
+            local_response = self._process_locally()
+            last_responses.append(local_response.to_json())
+
+        source_is_us = self.source_is_us()
+        remote_responses = []
+        chunks_sent = [0]
+
+        def _got_chunk(json_responses):
+            if source_is_us:
+                remote_responses.extend(json_responses)
+            else:
+                self._send_response_chunk(json_responses)
+                chunks_sent[0] += 1
+
+        timed_out = self._wait_for_response_chunks(waiting, sent_at,
+                                                   cell_timeout, _got_chunk)
+        for cell in timed_out:
+            last_responses.append(self._timeout_response(cell).to_json())
+
+        if source_is_us:
+            return [Response.from_json(json_response) for json_response in
+                    remote_responses + last_responses]
+        self._send_response_chunk(last_responses, chunks=chunks_sent[0])
+
+    def _wait_for_response_chunks(self, cells, sent_at, cell_timeout,
+                                  got_chunk):
+        """Pass the lists of JSON-ified responses sent back by the cells
+        to got_chunk as they arrive, until every cell sent its last chunk
+        or cell_timeout passed.  Returns the cells which did not finish.
+
+        Destroy the eventlet queue when done.
+        """
+        deadline = sent_at + cell_timeout
+        pending = dict((cell.name, cell) for cell in cells)
+        sizes = dict((cell.name, []) for cell in cells)
+        expected = {}
+        try:
+            while pending:
+                try:
+                    chunk = self.resp_queue.get(
+                            timeout=max(0, deadline - time.time()))
+                except queue.Empty:
+                    break
+                if chunk.sender not in pending:
+                    continue
+                got_chunk(chunk.json_responses)
+                sizes[chunk.sender].append(chunk.size)
+                if chunk.chunks is not None:
+                    expected[chunk.sender] = chunk.chunks + 1
+                if len(sizes[chunk.sender]) == expected.get(chunk.sender):
+                    del pending[chunk.sender]
+                    self.msg_runner._record_broadcast_response(
+                            chunk.sender, self.method_name,
+                            sum(sizes[chunk.sender]), time.time() - sent_at)
+        finally:
+            self._cleanup_response_queue()
+
+        for cell in pending.values():
+            LOG.warn(_("Timed out waiting for cell %(cell)s to respond to "
+                       "%(method)s"), {'cell': cell.name,
+                                       'method': self.method_name})
+            self.msg_runner._record_broadcast_response(
+                    cell.name, self.method_name, sum(sizes[cell.name]), None)
+        return pending.values()
+
 
 class _ResponseMessage(_TargetedMessage):
     """A response message is really just a special targeted message,
@@ -644,7 +794,11 @@ class _ResponseMessageMethods(_BaseMessageMethods):
     the source of a 'call'.  All we do is stuff the response into the
     eventlet queue to signal the caller that's waiting.
     """
-    def parse_responses(self, message, orig_message, responses):
+    def parse_responses(self, message, orig_message, responses,
+                        sender=None, chunks=None):
+        if sender is not None:
+            # Part of the responses to a streamed broadcast
+            responses = _ResponseChunk(sender, responses, chunks)
         self.msg_runner._put_response(message.response_uuid,
                 responses)
 
@@ -862,10 +1016,11 @@ class _BroadcastMessageMethods(_BaseMessageMethods):
         """Are we the API level?"""
         return not self.state_manager.get_parent_cells()
 
-    def instance_update_at_top(self, message, instance, **kwargs):
-        """Update an instance in the DB if we're a top level cell."""
-        if not self._at_the_top():
-            return
+    def _prepare_instance_update(self, message, instance):
+        """Turn an instance sent up by a child cell into the values to
+        update it with in our DB.  Returns the values and the info_cache
+        to update separately, if any.
+        """
         instance_uuid = instance['uuid']
 
         # Remove things that we can't update in the top level cells.
@@ -907,6 +1062,29 @@ class _BroadcastMessageMethods(_BaseMessageMethods):
                 instance.get('vm_state'))
         if expected_vm_states:
                 instance['expected_vm_state'] = expected_vm_states
+        return instance, info_cache
+
+    def _create_instance_at_top(self, ctxt, instance):
+        # FIXME(comstud): Strange.  Need to handle quotas here,
+        # if we actually want this code to remain..
+        self.db.instance_create(ctxt, instance)
+
+    def _update_info_cache_at_top(self, ctxt, instance_uuid, info_cache):
+        try:
+            self.db.instance_info_cache_update(ctxt, instance_uuid,
+                                               info_cache)
+        except exception.InstanceInfoCacheNotFound:
+            # Can happen if we try to update a deleted instance's
+            # network information.
+            pass
+
+    def instance_update_at_top(self, message, instance, **kwargs):
+        """Update an instance in the DB if we're a top level cell."""
+        if not self._at_the_top():
+            return
+        instance_uuid = instance['uuid']
+        instance, info_cache = self._prepare_instance_update(message,
+                                                             instance)
 
         # It's possible due to some weird condition that the instance
         # was already set as deleted... so we'll attempt to update
@@ -916,18 +1094,51 @@ class _BroadcastMessageMethods(_BaseMessageMethods):
                 self.db.instance_update(message.ctxt, instance_uuid,
                         instance, update_cells=False)
             except exception.NotFound:
-                # FIXME(comstud): Strange.  Need to handle quotas here,
-                # if we actually want this code to remain..
-                self.db.instance_create(message.ctxt, instance,
-                                        legacy=False)
+                self._create_instance_at_top(message.ctxt, instance)
         if info_cache:
-            try:
-                self.db.instance_info_cache_update(
-                        message.ctxt, instance_uuid, info_cache)
-            except exception.InstanceInfoCacheNotFound:
-                # Can happen if we try to update a deleted instance's
-                # network information.
-                pass
+            self._update_info_cache_at_top(message.ctxt, instance_uuid,
+                                           info_cache)
+
+    def instance_update_batch_at_top(self, message, instances, **kwargs):
+        """Update a batch of instances in the DB in one transaction if
+        we're a top level cell.
+        """
+        if not self._at_the_top():
+            return
+        updates = []
+        for instance in instances:
+            instance_uuid = instance['uuid']
+            instance, info_cache = self._prepare_instance_update(message,
+                                                                 instance)
+            updates.append({'instance_uuid': instance_uuid,
+                            'values': instance,
+                            'info_cache': info_cache})
+
+        created = []
+        with utils.temporary_mutation(message.ctxt, read_deleted="yes"):
+            failed = self.db.instance_update_batch(message.ctxt, updates)
+            for update in updates:
+                instance_uuid = update['instance_uuid']
+                error = failed.get(instance_uuid)
+                if error is None:
+                    continue
+                if isinstance(error, exception.NotFound):
+                    self._create_instance_at_top(message.ctxt,
+                                                 update['values'])
+                    created.append(update)
+                elif not isinstance(error,
+                                    exception.InstanceInfoCacheNotFound):
+                    LOG.warn(_("Failed to update instance: %s"),
+                             unicode(error), instance_uuid=instance_uuid)
+        for update in created:
+            if update['info_cache']:
+                self._update_info_cache_at_top(message.ctxt,
+                                               update['instance_uuid'],
+                                               update['info_cache'])
+        LOG.debug(_("Updated %(count)d instances from a batch of "
+                    "%(total)d"),
+                  {'count': len(updates) - len(failed),
+                   'total': len(updates)})
 
     def instance_destroy_at_top(self, message, instance, **kwargs):
         """Destroy an instance from the DB if we're a top level cell."""
@@ -1134,6 +1345,11 @@ class MessageRunner(object):
         for msg_type, cls in _CELL_MESSAGE_TYPE_TO_METHODS_CLS.iteritems():
             self.methods_by_type[msg_type] = cls(self)
         self.serializer = objects_base.NovaObjectSerializer()
+        # Instance updates waiting to be sent to the top level cell, by
+        # instance uuid
+        self.pending_instance_updates = {}
+        # Responses of neighbor cells to streamed broadcasts, by cell
+        self.broadcast_stats = {}
 
     def _process_message_locally(self, message):
         """Message processing will call this when its determined that
@@ -1178,6 +1394,33 @@ class MessageRunner(object):
             # Ignore if queue is gone already somehow.
             pass
 
+    def _record_broadcast_response(self, cell_name, method_name, size,
+                                   elapsed):
+        """Add the responses of a neighbor cell to a streamed broadcast to
+        the stats of the cell.  elapsed is None if the cell timed out.
+        """
+        stats = self.broadcast_stats.setdefault(cell_name,
+                {'responses': 0, 'timeouts': 0, 'bytes': 0,
+                 'elapsed': 0.0, 'max_elapsed': 0.0})
+        stats['bytes'] += size
+        if elapsed is None:
+            stats['timeouts'] += 1
+            return
+        stats['responses'] += 1
+        stats['elapsed'] += elapsed
+        stats['max_elapsed'] = max(stats['max_elapsed'], elapsed)
+        LOG.debug(_("Cell %(cell)s responded to %(method)s with %(size)d "
+                    "bytes in %(elapsed).3f seconds"),
+                  {'cell': cell_name, 'method': method_name, 'size': size,
+                   'elapsed': elapsed})
+
+    def get_broadcast_stats(self):
+        """Return the number of responses and timeouts of each neighbor
+        cell to streamed broadcasts, with the size and time of the
+        responses.
+        """
+        return self.broadcast_stats
+
     def _create_response_message(self, ctxt, direction, target_cell,
             response_uuid, response_kwargs, **kwargs):
         """Create a ResponseMessage.  This is used internally within
@@ -1303,13 +1546,51 @@ class MessageRunner(object):
 
     def instance_update_at_top(self, ctxt, instance):
         """Update an instance at the top level cell."""
+        if CONF.cells.instance_update_batch_interval > 0:
+            self._queue_instance_update(instance)
+            return
         message = _BroadcastMessage(self, ctxt, 'instance_update_at_top',
                                     dict(instance=instance), 'up',
                                     run_locally=False)
         message.process()
 
+    def _queue_instance_update(self, instance):
+        """Add an instance update to the next batch sent to the top level
+        cell.  A later update of the same instance wins over the values of
+        an earlier one, the top level cell still checks the expected
+        vm_state of the resulting update.
+        """
+        if not self.pending_instance_updates:
+            greenthread.spawn_after(
+                    CONF.cells.instance_update_batch_interval,
+                    self._send_instance_updates)
+        instance = jsonutils.to_primitive(instance)
+        pending = self.pending_instance_updates.setdefault(instance['uuid'],
+                                                           {})
+        pending.update(instance)
+
+    def _send_instance_updates(self):
+        """Send the batch of pending instance updates to the top level
+        cell.
+        """
+        instances = self.pending_instance_updates.values()
+        self.pending_instance_updates = {}
+        if not instances:
+            return
+        ctxt = context.get_admin_context()
+        message = _BroadcastMessage(self, ctxt, 'instance_update_batch_at_top',
+                                    dict(instances=instances), 'up',
+                                    run_locally=False)
+        try:
+            message.process()
+        except Exception:
+            LOG.exception(_("Failed to send a batch of %d instance "
+                            "updates"), len(instances))
+
     def instance_destroy_at_top(self, ctxt, instance):
         """Destroy an instance at the top level cell."""
+        # The destroy must not be undone by an update sent after it
+        self.pending_instance_updates.pop(instance['uuid'], None)
         message = _BroadcastMessage(self, ctxt, 'instance_destroy_at_top',
                                     dict(instance=instance), 'up',
                                     run_locally=False)
@@ -1591,6 +1872,19 @@ class MessageRunner(object):
         return _CELL_MESSAGE_TYPE_TO_MESSAGE_CLS.keys()
 
 
+class _ResponseChunk(object):
+    """Some of the JSON-ified responses of a neighbor cell to a streamed
+    broadcast.  'chunks' is only set on the last chunk sent by the cell,
+    to the number of chunks it sent before.
+    """
+    def __init__(self, sender, json_responses, chunks=None):
+        self.sender = sender
+        self.json_responses = json_responses
+        self.chunks = chunks
+        self.size = sum(len(json_response)
+                        for json_response in json_responses)
+
+
 class Response(object):
     """Holds a response from a cell.  If there was a failure, 'failure'
     will be True and 'response' will contain an encoded Exception.
@@ -22,6 +22,7 @@ import functools
 
 from oslo.config import cfg
 
+from nova.cells import capacity
 from nova.cells import rpc_driver
 from nova import context
 from nova.db import base
@@ -166,6 +167,7 @@ class CellStateManager(base.Base):
         self.parent_cells = {}
         self.child_cells = {}
         self.last_cell_db_check = datetime.datetime.min
+        self._capacity_table = None
 
         self._cell_data_sync(force=True)
 
@@ -268,44 +270,15 @@ class CellStateManager(base.Base):
             self.my_cell_state.update_capacities({})
             return
 
-        ram_mb_free_units = {}
-        disk_mb_free_units = {}
-        total_ram_mb_free = 0
-        total_disk_mb_free = 0
-
-        def _free_units(total, free, per_inst):
-            if per_inst:
-                min_free = total * reserve_level
-                free = max(0, free - min_free)
-                return int(free / per_inst)
-            else:
-                return 0
-
-        def _update_from_values(values, instance_type):
-            memory_mb = instance_type['memory_mb']
-            disk_mb = (instance_type['root_gb'] +
-                    instance_type['ephemeral_gb']) * 1024
-            ram_mb_free_units.setdefault(str(memory_mb), 0)
-            disk_mb_free_units.setdefault(str(disk_mb), 0)
-            ram_free_units = _free_units(compute_values['total_ram_mb'],
-                    compute_values['free_ram_mb'], memory_mb)
-            disk_free_units = _free_units(compute_values['total_disk_mb'],
-                    compute_values['free_disk_mb'], disk_mb)
-            ram_mb_free_units[str(memory_mb)] += ram_free_units
-            disk_mb_free_units[str(disk_mb)] += disk_free_units
-
         instance_types = self.db.flavor_get_all(ctxt)
-
-        for compute_values in compute_hosts.values():
-            total_ram_mb_free += compute_values['free_ram_mb']
-            total_disk_mb_free += compute_values['free_disk_mb']
-            for instance_type in instance_types:
-                _update_from_values(compute_values, instance_type)
-
-        capacities = {'ram_free': {'total_mb': total_ram_mb_free,
-                                   'units_by_mb': ram_mb_free_units},
-                      'disk_free': {'total_mb': total_disk_mb_free,
-                                    'units_by_mb': disk_mb_free_units}}
+        if capacity.is_enabled():
+            if self._capacity_table is None:
+                self._capacity_table = capacity.CapacityTable()
+            capacities = self._capacity_table.refresh(
+                    compute_hosts, instance_types, reserve_level)
+        else:
+            capacities = capacity.get_capacities(
+                    compute_hosts, instance_types, reserve_level)
         self.my_cell_state.update_capacities(capacities)
 
     @sync_before
@@ -77,6 +77,7 @@ from nova.openstack.common import importutils
 from nova.openstack.common import log as logging
 from nova.openstack.common import rpc
 from nova import quota
+from nova.scheduler import rpcapi as scheduler_rpcapi
 from nova import servicegroup
 from nova import version
 
@@ -320,7 +321,9 @@ class FixedIpCommands(object):
             print(_("error: %s") % ex)
             return(2)
 
-        instances = db.instance_get_all(context.get_admin_context())
+        instances = db.instance_get_all_columns_by_filters(
+                context.get_admin_context(),
+                {'deleted': False, 'soft_deleted': True}, ['hostname', 'host'])
         instances_by_uuid = {}
         for instance in instances:
             instances_by_uuid[instance['uuid']] = instance
@@ -650,11 +653,15 @@ class VmCommands(object):
                                              _('zone'),
                                              _('index'))))
 
-        if host is None:
-            instances = db.instance_get_all(context.get_admin_context())
-        else:
-            instances = db.instance_get_all_by_host(
-                           context.get_admin_context(), host)
+        filters = {'deleted': False, 'soft_deleted': True}
+        if host is not None:
+            filters['host'] = host
+        columns = ['display_name', 'host', 'vm_state', 'launched_at',
+                   'image_ref', 'kernel_id', 'ramdisk_id', 'project_id',
+                   'user_id', 'availability_zone', 'launch_index']
+        instances = db.instance_get_all_columns_by_filters(
+                context.get_admin_context(), filters, columns,
+                columns_to_join=['system_metadata'])
 
         for instance in instances:
             instance_type = flavors.extract_flavor(instance)
@@ -1237,6 +1244,60 @@ class CellCommands(object):
                 '-' * 5, '-' * 10))
 
 
+class SchedulerCommands(object):
+    """Report on the scheduler."""
+
+    @args('--host', metavar='<host>',
+          help='Scheduler host to report on, any scheduler if not given')
+    def stats(self, host=None):
+        """Show where the time of scheduling requests goes.
+
+        The scheduler only records it when scheduler_request_stats is set.
+        """
+        ctxt = context.get_admin_context()
+        stats = scheduler_rpcapi.SchedulerAPI().get_request_stats(ctxt,
+                                                                  host=host)
+        requests = stats['requests']
+        if not requests:
+            print(_("No scheduling requests were timed."))
+            return
+
+        print(_("Requests: %(requests)d  average: %(avg).1fms  "
+                "max: %(max).1fms  db queries per request: %(queries).1f") %
+              {'requests': requests,
+               'avg': stats['elapsed'] * 1000 / requests,
+               'max': stats['max_elapsed'] * 1000,
+               'queries': float(stats['db_queries']) / requests})
+
+        fmt = "%-40s %10s %12s"
+        print()
+        print(fmt % (_('Phase'), _('Total(s)'), _('Request(ms)')))
+        for name, elapsed in sorted(stats['phases'].items(),
+                                    key=lambda item: -item[1]):
+            print(fmt % (name, '%.3f' % elapsed,
+                         '%.2f' % (elapsed * 1000 / requests)))
+
+        fmt = "%-40s %8s %10s %10s %10s %10s"
+        print()
+        print(fmt % (_('Filter'), _('Calls'), _('Total(s)'), _('Call(ms)'),
+                     _('Hosts in'), _('Hosts out')))
+        for name, values in sorted(stats['filters'].items(),
+                                   key=lambda item: -item[1]['time']):
+            print(fmt % (name, values['calls'], '%.3f' % values['time'],
+                         '%.2f' % (values['time'] * 1000 / values['calls']),
+                         values['hosts_in'], values['hosts_out']))
+
+        fmt = "%-40s %8s %10s %10s %10s"
+        print()
+        print(fmt % (_('Weigher'), _('Calls'), _('Total(s)'), _('Call(ms)'),
+                     _('Hosts')))
+        for name, values in sorted(stats['weighers'].items(),
+                                   key=lambda item: -item[1]['time']):
+            print(fmt % (name, values['calls'], '%.3f' % values['time'],
+                         '%.2f' % (values['time'] * 1000 / values['calls']),
+                         values['hosts']))
+
+
 CATEGORIES = {
     'account': AccountCommands,
     'agent': AgentBuildCommands,
@@ -1251,6 +1312,7 @@ CATEGORIES = {
     'logs': GetLogCommands,
     'network': NetworkCommands,
     'project': ProjectCommands,
+    'scheduler': SchedulerCommands,
     'service': ServiceCommands,
     'shell': ShellCommands,
     'vm': VmCommands,
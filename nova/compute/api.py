@@ -1516,7 +1516,8 @@ class API(base.Base):
         return instance
 
     def get_all(self, context, search_opts=None, sort_key='created_at',
-                sort_dir='desc', limit=None, marker=None, want_objects=False):
+                sort_dir='desc', limit=None, marker=None, want_objects=False,
+                columns=None):
         """Get all instances filtered by one of the given parameters.
 
         If there is no filter and the context is an admin, it will retrieve
@@ -1528,6 +1529,9 @@ class API(base.Base):
         The results will be returned sorted in the order specified by the
         'sort_dir' parameter using the key specified in the 'sort_key'
         parameter.
+
+        If 'columns' is given, only those instance columns (and the uuid)
+        are loaded and the instances are returned as dicts.
         """
 
         #TODO(bcwaldon): determine the best argument for target here
@@ -1595,8 +1599,9 @@ class API(base.Base):
         inst_models = self._get_instances_by_filters(context, filters,
                                                      sort_key, sort_dir,
                                                      limit=limit,
-                                                     marker=marker)
-        if want_objects:
+                                                     marker=marker,
+                                                     columns=columns)
+        if want_objects or columns is not None:
             return inst_models
 
         # Convert the models to dictionaries
@@ -1609,7 +1614,8 @@ class API(base.Base):
     def _get_instances_by_filters(self, context, filters,
                                   sort_key, sort_dir,
                                   limit=None,
-                                  marker=None):
+                                  marker=None,
+                                  columns=None):
         if 'ip6' in filters or 'ip' in filters:
             res = self.network_api.get_instance_uuids_by_ip_filter(context,
                                                                    filters)
@@ -1618,6 +1624,11 @@ class API(base.Base):
             uuids = set([r['instance_uuid'] for r in res])
             filters['uuid'] = uuids
 
+        if columns is not None:
+            return self.db.instance_get_all_columns_by_filters(context,
+                    filters, columns, sort_key=sort_key, sort_dir=sort_dir,
+                    limit=limit, marker=marker)
+
         fields = ['metadata', 'system_metadata', 'info_cache',
                   'security_groups']
         return instance_obj.InstanceList.get_by_filters(
@@ -2751,6 +2762,22 @@ class API(base.Base):
             return block_device.legacy_mapping(bdms)
         return bdms
 
+    def get_instances_bdms(self, context, instances, legacy=True):
+        """Get the bdm tables of a list of instances with one query,
+        returned in a dict keyed by instance uuid.
+        """
+        bdms_by_instance = dict((instance['uuid'], [])
+                                for instance in instances)
+        bdms = self.db.block_device_mapping_get_all_by_instance_uuids(
+                context, bdms_by_instance.keys())
+        for bdm in bdms:
+            bdms_by_instance[bdm['instance_uuid']].append(bdm)
+        if legacy:
+            for uuid, instance_bdms in bdms_by_instance.items():
+                bdms_by_instance[uuid] = block_device.legacy_mapping(
+                        instance_bdms)
+        return bdms_by_instance
+
     def is_volume_backed_instance(self, context, instance, bdms):
         if not instance['image_ref']:
             return True
@@ -2974,6 +3001,7 @@ class AggregateAPI(base.Base):
                                                     aggregate_payload)
         aggregate = self.db.aggregate_create(context, values,
                 metadata=metadata)
+        availability_zones.reset_zone_map()
         aggregate = self._reformat_aggregate_info(aggregate)
         # To maintain the same API result as before.
         del aggregate['hosts']
@@ -3003,6 +3031,7 @@ class AggregateAPI(base.Base):
                                                     "updateprop.start",
                                                     aggregate_payload)
         aggregate = self.db.aggregate_update(context, aggregate_id, values)
+        availability_zones.reset_zone_map()
         compute_utils.notify_about_aggregate_update(context,
                                                     "updateprop.end",
                                                     aggregate_payload)
@@ -3026,6 +3055,7 @@ class AggregateAPI(base.Base):
                 except exception.AggregateMetadataNotFound as e:
                     LOG.warn(e.format_message())
         self.db.aggregate_metadata_add(context, aggregate_id, metadata)
+        availability_zones.reset_zone_map()
         compute_utils.notify_about_aggregate_update(context,
                                                     "updatemetadata.end",
                                                     aggregate_payload)
@@ -3044,6 +3074,7 @@ class AggregateAPI(base.Base):
                                                    aggregate_id=aggregate_id,
                                                    reason='not empty')
         self.db.aggregate_delete(context, aggregate_id)
+        availability_zones.reset_zone_map()
         compute_utils.notify_about_aggregate_update(context,
                                                     "delete.end",
                                                     aggregate_payload)
@@ -3059,6 +3090,7 @@ class AggregateAPI(base.Base):
         # validates the host; ComputeHostNotFound is raised if invalid
         self.db.service_get_by_compute_host(context, host_name)
         self.db.aggregate_host_add(context, aggregate_id, host_name)
+        availability_zones.reset_zone_map()
         #NOTE(jogo): Send message to host to support resource pools
         aggregate = self.db.aggregate_get(context, aggregate_id)
         self.compute_rpcapi.add_aggregate_host(context,
@@ -3080,6 +3112,7 @@ class AggregateAPI(base.Base):
         # validates the host; ComputeHostNotFound is raised if invalid
         self.db.service_get_by_compute_host(context, host_name)
         self.db.aggregate_host_delete(context, aggregate_id, host_name)
+        availability_zones.reset_zone_map()
         aggregate = self.db.aggregate_get(context, aggregate_id)
         self.compute_rpcapi.remove_aggregate_host(context,
                 aggregate=aggregate, host_param=host_name, host=host_name)
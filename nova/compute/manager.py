@@ -4409,9 +4409,9 @@ class ComputeManager(manager.SchedulerDependentManager):
 
         To sync power state data we make a DB call to get the number of
         virtual machines known by the hypervisor and if the number matches the
-        number of virtual machines known by the database, we proceed in a lazy
-        loop, one database record at a time, checking if the hypervisor has the
-        same power state as is in the database.
+        number of virtual machines known by the database, we fetch the power
+        states of all instances without a pending task from the hypervisor in
+        one call and then check each database record against them.
         """
         db_instances = instance_obj.InstanceList.get_by_host(context,
                                                              self.host)
@@ -4425,19 +4425,19 @@ class ComputeManager(manager.SchedulerDependentManager):
                      {'num_db_instances': num_db_instances,
                       'num_vm_instances': num_vm_instances})
 
+        sync_instances = []
         for db_instance in db_instances:
             if db_instance['task_state'] is not None:
                 LOG.info(_("During sync_power_state the instance has a "
                            "pending task. Skip."), instance=db_instance)
                 continue
-            # No pending tasks. Now try to figure out the real vm_power_state.
-            try:
-                vm_instance = self.driver.get_info(db_instance)
-                vm_power_state = vm_instance['state']
-            except exception.InstanceNotFound:
-                vm_power_state = power_state.NOSTATE
-            # Note(maoy): the above get_info call might take a long time,
-            # for example, because of a broken libvirt driver.
+            sync_instances.append(db_instance)
+
+        # No pending tasks. Now try to figure out the real vm_power_states.
+        vm_power_states = self.driver.get_power_states(sync_instances)
+        for db_instance in sync_instances:
+            vm_power_state = vm_power_states.get(db_instance['uuid'],
+                                                 power_state.NOSTATE)
             self._sync_instance_power_state(context,
                                             db_instance,
                                             vm_power_state)
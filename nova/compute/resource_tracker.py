@@ -32,6 +32,7 @@ from nova.openstack.common.gettextutils import _
 from nova.openstack.common import importutils
 from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
+from nova.openstack.common import timeutils
 from nova import utils
 
 resource_tracker_opts = [
@@ -41,7 +42,19 @@ resource_tracker_opts = [
                help='Amount of memory in MB to reserve for the host'),
     cfg.StrOpt('compute_stats_class',
                default='nova.compute.stats.Stats',
-               help='Class that will manage stats for the local compute host')
+               help='Class that will manage stats for the local compute host'),
+    cfg.BoolOpt('resource_tracker_incremental',
+                default=False,
+                help='Keep compute node usage up to date from resource '
+                     'claims and instance updates, only write changed '
+                     'compute node fields and stats, and audit all '
+                     'instances and migrations of the node every '
+                     'resource_tracker_audit_interval seconds instead of '
+                     'on every periodic update'),
+    cfg.IntOpt('resource_tracker_audit_interval',
+               default=600,
+               help='Number of seconds between full audits of the compute '
+                    'node usage when resource_tracker_incremental is set'),
 ]
 
 CONF = cfg.CONF
@@ -50,6 +63,16 @@ CONF.register_opts(resource_tracker_opts)
 LOG = logging.getLogger(__name__)
 COMPUTE_RESOURCE_SEMAPHORE = "compute_resources"
 
+# Usage fields which the resource tracker computes from the instances and
+# migrations on the node, rather than taking from the hypervisor:
+USAGE_KEYS = ('memory_mb_used', 'local_gb_used', 'vcpus_used',
+              'free_ram_mb', 'free_disk_gb', 'current_workload',
+              'running_vms', 'stats')
+
+# Compute node fields which are never compared for incremental updates:
+UNTRACKED_KEYS = ('id', 'service', 'service_id', 'stats', 'created_at',
+                  'updated_at', 'deleted_at', 'deleted')
+
 
 class ResourceTracker(object):
     """Compute helper class for keeping track of resource usage as instances
@@ -65,6 +88,10 @@ class ResourceTracker(object):
         self.tracked_instances = {}
         self.tracked_migrations = {}
         self.conductor_api = conductor.API()
+        self.last_audit = None
+        # Compute node fields and stats as last written to the DB:
+        self._written_values = None
+        self._written_stats = {}
 
     @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
     def instance_claim(self, context, instance_ref, limits=None):
@@ -269,6 +296,10 @@ class ResourceTracker(object):
 
         self._report_hypervisor_resource_view(resources)
 
+        if CONF.resource_tracker_incremental and not self._audit_due():
+            self._update_capacity(context, resources)
+            return
+
         # Grab all instances assigned to this node:
         instances = self.conductor_api.instance_get_all_by_host_and_node(
             context, self.host, self.nodename)
@@ -291,6 +322,30 @@ class ResourceTracker(object):
         self._report_final_resource_view(resources)
 
         self._sync_compute_node(context, resources)
+        self.last_audit = timeutils.utcnow()
+
+    def _audit_due(self):
+        """Return True if the usage of the node needs a full audit."""
+        return (self.compute_node is None or self.last_audit is None or
+                timeutils.is_older_than(self.last_audit,
+                                        CONF.resource_tracker_audit_interval))
+
+    def _update_capacity(self, context, resources):
+        """Update the compute node with the capacity reported by the
+        hypervisor, keeping the usage tracked from claims and instance
+        updates since the last audit.
+        """
+        node = self.compute_node
+        for key, value in resources.iteritems():
+            if key not in USAGE_KEYS:
+                node[key] = value
+
+        node['free_ram_mb'] = node['memory_mb'] - node['memory_mb_used']
+        node['free_disk_gb'] = node['local_gb'] - node['local_gb_used']
+        node['stats'] = self.stats
+
+        self._report_final_resource_view(node)
+        self._update(context, node, heartbeat=True)
 
     def _sync_compute_node(self, context, resources):
         """Create or update the compute node DB record."""
@@ -317,15 +372,18 @@ class ResourceTracker(object):
 
         else:
             # just update the record:
-            self._update(context, resources, prune_stats=True)
+            self._update(context, resources, prune_stats=True,
+                         heartbeat=True)
             LOG.info(_('Compute_service record updated for %(host)s:%(node)s')
                     % {'host': self.host, 'node': self.nodename})
 
     def _create(self, context, values):
         """Create the compute node in the DB."""
+        stats = values.get('stats')
         # initialize load stats from existing instances:
         self.compute_node = self.conductor_api.compute_node_create(context,
                                                                    values)
+        self._record_written(values, stats, prune_stats=True)
 
     def _get_service(self, context):
         try:
@@ -367,12 +425,69 @@ class ResourceTracker(object):
         else:
             LOG.audit(_("Free VCPU information unavailable"))
 
-    def _update(self, context, values, prune_stats=False):
-        """Persist the compute node updates to the DB."""
+    def _update(self, context, values, prune_stats=False, heartbeat=False):
+        """Persist the compute node updates to the DB.
+
+        With heartbeat, the compute node is written even if nothing changed,
+        so that its updated_at moves on and schedulers drop the usage they
+        consumed for instances which never landed here.
+        """
         if "service" in self.compute_node:
             del self.compute_node['service']
+        if (CONF.resource_tracker_incremental and
+                self._written_values is not None):
+            values, prune_stats = self._get_changed_values(values,
+                                                           prune_stats)
+            if not values and not heartbeat:
+                return
+        # NOTE: the DB API pops the stats from the values it is given.
+        stats = values.get('stats')
         self.compute_node = self.conductor_api.compute_node_update(
             context, self.compute_node, values, prune_stats)
+        self._record_written(values, stats, prune_stats)
+
+    def _get_changed_values(self, values, prune_stats):
+        """Return the compute node fields and stats which differ from what
+        was last written to the DB, and whether stats need to be pruned.
+        """
+        changes = dict((key, value) for key, value in values.iteritems()
+                       if key not in UNTRACKED_KEYS and
+                       (key not in self._written_values or
+                        self._written_values[key] != value))
+
+        stats = values.get('stats')
+        if isinstance(stats, dict):
+            removed = prune_stats and set(self._written_stats) - set(stats)
+            if removed:
+                # pruning drops every stat which is not passed in:
+                changes['stats'] = stats
+                return changes, True
+            changed_stats = dict((key, value)
+                                 for key, value in stats.iteritems()
+                                 if self._written_stats.get(key) !=
+                                 unicode(value))
+            if changed_stats:
+                changes['stats'] = changed_stats
+        return changes, False
+
+    def _record_written(self, values, stats, prune_stats):
+        """Remember the compute node fields and stats written to the DB."""
+        written = dict((key, value) for key, value in values.iteritems()
+                       if key not in UNTRACKED_KEYS)
+        if isinstance(stats, dict):
+            stats = dict((key, unicode(value))
+                         for key, value in stats.iteritems())
+        else:
+            stats = {}
+
+        if self._written_values is None:
+            self._written_values = written
+        else:
+            self._written_values.update(written)
+        if prune_stats:
+            self._written_stats = stats
+        else:
+            self._written_stats.update(stats)
 
     def _update_usage(self, resources, usage, sign=1):
         mem_usage = usage['memory_mb']
@@ -204,6 +204,12 @@ class LocalAPI(object):
         return self._manager.block_device_mapping_get_all_by_instance(
             context, instance, legacy)
 
+    def block_device_mapping_get_all_by_instance_uuids(self, context,
+                                                       instance_uuids,
+                                                       legacy=True):
+        return self._manager.block_device_mapping_get_all_by_instance_uuids(
+            context, instance_uuids, legacy)
+
     def block_device_mapping_destroy(self, context, bdms):
         return self._manager.block_device_mapping_destroy(context, bdms=bdms)
 
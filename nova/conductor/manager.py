@@ -75,7 +75,7 @@ class ConductorManager(manager.Manager):
     namespace.  See the ComputeTaskManager class for details.
     """
 
-    RPC_API_VERSION = '1.55'
+    RPC_API_VERSION = '1.56'
 
     def __init__(self, *args, **kwargs):
         super(ConductorManager, self).__init__(service_name='conductor',
@@ -292,6 +292,23 @@ class ConductorManager(manager.Manager):
             bdms = block_device.legacy_mapping(bdms)
         return jsonutils.to_primitive(bdms)
 
+    def block_device_mapping_get_all_by_instance_uuids(self, context,
+                                                       instance_uuids,
+                                                       legacy=True):
+        bdms = self.db.block_device_mapping_get_all_by_instance_uuids(
+            context, instance_uuids)
+        if legacy:
+            # NOTE: the legacy format numbers the ephemeral devices of each
+            # instance, so the mappings are converted instance by instance.
+            bdms_by_instance = {}
+            for bdm in bdms:
+                bdms_by_instance.setdefault(bdm['instance_uuid'],
+                                            []).append(bdm)
+            bdms = []
+            for instance_bdms in bdms_by_instance.values():
+                bdms.extend(block_device.legacy_mapping(instance_bdms))
+        return jsonutils.to_primitive(bdms)
+
     def block_device_mapping_destroy(self, context, bdms=None,
                                      instance=None, volume_id=None,
                                      device_name=None):
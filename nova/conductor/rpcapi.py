@@ -107,6 +107,7 @@ class ConductorAPI(nova.openstack.common.rpc.proxy.RpcProxy):
     1.53 - Added compute_reboot
     1.54 - Added 'update_cells' argument to bw_usage_update
     1.55 - Pass instance objects for compute_stop
+    1.56 - Added block_device_mapping_get_all_by_instance_uuids
     """
 
     BASE_RPC_API_VERSION = '1.0'
@@ -287,6 +288,13 @@ class ConductorAPI(nova.openstack.common.rpc.proxy.RpcProxy):
 
         return self.call(context, msg, version=version)
 
+    def block_device_mapping_get_all_by_instance_uuids(self, context,
+                                                       instance_uuids,
+                                                       legacy=True):
+        msg = self.make_msg('block_device_mapping_get_all_by_instance_uuids',
+                            instance_uuids=instance_uuids, legacy=legacy)
+        return self.call(context, msg, version='1.56')
+
     def block_device_mapping_destroy(self, context, bdms=None,
                                      instance=None, volume_id=None,
                                      device_name=None):
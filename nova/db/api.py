@@ -183,6 +183,15 @@ def compute_node_get_all(context):
     return IMPL.compute_node_get_all(context)
 
 
+def compute_node_get_all_changed_since(context, since):
+    """Get computeNodes created, updated or deleted since the given time.
+
+    Nodes whose service record changed since then are included as well, and
+    deleted nodes are returned so that callers can drop them.
+    """
+    return IMPL.compute_node_get_all_changed_since(context, since)
+
+
 def compute_node_search_by_hypervisor(context, hypervisor_match):
     """Get computeNodes given a hypervisor hostname match string."""
     return IMPL.compute_node_search_by_hypervisor(context, hypervisor_match)
@@ -511,6 +520,21 @@ def fixed_ips_by_virtual_interface(context, vif_id):
     return IMPL.fixed_ips_by_virtual_interface(context, vif_id)
 
 
+def instance_addresses_get_by_filter(context, fixed_address=None,
+                                     address=None, address_like=None):
+    """Get the fixed and floating ips of instance virtual interfaces
+    matching an address filter.
+
+    Returns a list of dicts with the 'instance_uuid' and 'address' of the
+    fixed ips equal to fixed_address or address or LIKE address_like, then
+    of the floating ips equal to address or LIKE address_like.  The
+    'fixed_address' of floating ips is the fixed ip they are associated
+    with, it is None for fixed ips.
+    """
+    return IMPL.instance_addresses_get_by_filter(context, fixed_address,
+                                                 address, address_like)
+
+
 def fixed_ip_update(context, address, values):
     """Create a fixed ip from the values dictionary."""
     return IMPL.fixed_ip_update(context, address, values)
@@ -608,6 +632,20 @@ def instance_get_all_by_filters(context, filters, sort_key='created_at',
                                             columns_to_join=columns_to_join)
 
 
+def instance_get_all_columns_by_filters(context, filters, columns,
+                                        sort_key='created_at',
+                                        sort_dir='desc', limit=None,
+                                        marker=None, columns_to_join=None):
+    """Get the given columns of all instances that match all filters.
+
+    Returns a list of dicts holding only the requested instance columns
+    and side tables.
+    """
+    return IMPL.instance_get_all_columns_by_filters(context, filters,
+            columns, sort_key=sort_key, sort_dir=sort_dir, limit=limit,
+            marker=marker, columns_to_join=columns_to_join)
+
+
 def instance_get_active_by_window_joined(context, begin, end=None,
                                          project_id=None, host=None):
     """Get instances and joins active during a certain time window.
@@ -691,6 +729,20 @@ def instance_update_and_get_original(context, instance_uuid, values,
     return rv
 
 
+def instance_update_batch(context, updates):
+    """Update a batch of instances and their info caches in a single
+    transaction, without notifying cells.
+
+    :param updates: list of dicts with the instance_uuid, the values to
+                    update the instance with and optionally the values to
+                    update its info_cache with
+
+    :returns: a dict of the uuids of the instances which failed to update
+              to the exception raised
+    """
+    return IMPL.instance_update_batch(context, updates)
+
+
 def instance_add_security_group(context, instance_id, security_group_id):
     """Associate the given security group with the given instance."""
     return IMPL.instance_add_security_group(context, instance_id,
@@ -1063,6 +1115,19 @@ def quota_reserve(context, resources, quotas, user_quotas, deltas, expire,
                               project_id=project_id, user_id=user_id)
 
 
+def quota_reserve_conditional(context, resources, quotas, user_quotas, deltas,
+                              expire, until_refresh, max_age, project_id=None,
+                              user_id=None, retries=3):
+    """Check quotas and create appropriate reservations without locking
+    the quota usages.
+    """
+    return IMPL.quota_reserve_conditional(context, resources, quotas,
+                                          user_quotas, deltas, expire,
+                                          until_refresh, max_age,
+                                          project_id=project_id,
+                                          user_id=user_id, retries=retries)
+
+
 def reservation_commit(context, reservations, project_id=None, user_id=None):
     """Commit quota reservations."""
     return IMPL.reservation_commit(context, reservations,
@@ -1108,6 +1173,11 @@ def ec2_volume_create(context, volume_id, forced_id=None):
     return IMPL.ec2_volume_create(context, volume_id, forced_id)
 
 
+def ec2_volume_ids_get_or_create(context, volume_ids):
+    """Get ec2 ids for volume uuids, creating any missing mappings."""
+    return IMPL.ec2_volume_ids_get_or_create(context, volume_ids)
+
+
 def get_snapshot_uuid_by_ec2_id(context, ec2_id):
     return IMPL.get_snapshot_uuid_by_ec2_id(context, ec2_id)
 
@@ -1120,6 +1190,11 @@ def ec2_snapshot_create(context, snapshot_id, forced_id=None):
     return IMPL.ec2_snapshot_create(context, snapshot_id, forced_id)
 
 
+def ec2_snapshot_ids_get_or_create(context, snapshot_ids):
+    """Get ec2 ids for snapshot uuids, creating any missing mappings."""
+    return IMPL.ec2_snapshot_ids_get_or_create(context, snapshot_ids)
+
+
 ####################
 
 
@@ -1147,6 +1222,12 @@ def block_device_mapping_get_all_by_instance(context, instance_uuid):
                                                          instance_uuid)
 
 
+def block_device_mapping_get_all_by_instance_uuids(context, instance_uuids):
+    """Get all block device mappings belonging to a list of instances."""
+    return IMPL.block_device_mapping_get_all_by_instance_uuids(context,
+                                                               instance_uuids)
+
+
 def block_device_mapping_destroy(context, bdm_id):
     """Destroy the block device mapping."""
     return IMPL.block_device_mapping_destroy(context, bdm_id)
@@ -1654,6 +1735,16 @@ def aggregate_metadata_get_by_host(context, host, key=None):
     return IMPL.aggregate_metadata_get_by_host(context, host, key)
 
 
+def aggregate_metadata_get_all_by_hosts(context):
+    """Get aggregate metadata for every host that is in an aggregate.
+
+    Returns a dictionary keyed by hostname where each value is a dictionary
+    as returned by aggregate_metadata_get_by_host for that host.
+    return value:  {machine: {key: set( value1, value2 )}}
+    """
+    return IMPL.aggregate_metadata_get_all_by_hosts(context)
+
+
 def aggregate_host_get_by_metadata_key(context, key):
     """Get hosts with a specific metadata key metadata for all aggregates.
 
@@ -1791,6 +1882,11 @@ def ec2_instance_create(context, instance_uuid, id=None):
     return IMPL.ec2_instance_create(context, instance_uuid, id)
 
 
+def ec2_instance_ids_get_or_create(context, instance_uuids):
+    """Get ec2 ids for instance uuids, creating any missing mappings."""
+    return IMPL.ec2_instance_ids_get_or_create(context, instance_uuids)
+
+
 ####################
 
 
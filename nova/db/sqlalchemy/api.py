@@ -57,6 +57,7 @@ from nova import exception
 from nova.openstack.common.db import exception as db_exc
 from nova.openstack.common.db.sqlalchemy import session as db_session
 from nova.openstack.common.db.sqlalchemy import utils as sqlalchemyutils
+from nova.openstack.common import excutils
 from nova.openstack.common.gettextutils import _
 from nova.openstack.common import log as logging
 from nova.openstack.common import timeutils
@@ -510,6 +511,20 @@ def compute_node_get_all(context):
             all()
 
 
+@require_admin_context
+def compute_node_get_all_changed_since(context, since):
+    return model_query(context, models.ComputeNode, read_deleted='yes').\
+            outerjoin(models.Service,
+                      models.ComputeNode.service_id == models.Service.id).\
+            options(joinedload('service')).\
+            options(joinedload('stats')).\
+            filter(or_(models.ComputeNode.created_at > since,
+                       models.ComputeNode.updated_at > since,
+                       models.ComputeNode.deleted_at > since,
+                       models.Service.updated_at > since)).\
+            all()
+
+
 @require_admin_context
 def compute_node_search_by_hypervisor(context, hypervisor_match):
     field = models.ComputeNode.hypervisor_hostname
@@ -1308,6 +1323,64 @@ def fixed_ips_by_virtual_interface(context, vif_id):
     return result
 
 
+def _address_column(column):
+    # NOTE: PostgreSQL stores addresses as INET, which LIKE can't match.
+    if get_engine().name == 'postgresql':
+        return func.host(column)
+    return column
+
+
+@require_context
+def instance_addresses_get_by_filter(context, fixed_address=None,
+                                     address=None, address_like=None):
+    def _conditions(column, exact_addresses):
+        # Exact matches compare the column itself, so they can use its index
+        conditions = [column == exact for exact in exact_addresses
+                      if exact is not None]
+        if address_like is not None:
+            conditions.append(_address_column(column).like(address_like))
+        return conditions
+
+    vif_and = and_(models.VirtualInterface.id ==
+                   models.FixedIp.virtual_interface_id,
+                   models.VirtualInterface.deleted == 0,
+                   models.VirtualInterface.instance_uuid != None)
+    session = get_session()
+    data = []
+    conditions = _conditions(models.FixedIp.address, [fixed_address, address])
+    if conditions:
+        query = session.query(models.VirtualInterface.instance_uuid,
+                              models.FixedIp.address).\
+                        select_from(models.FixedIp).\
+                        filter(models.FixedIp.deleted == 0).\
+                        join((models.VirtualInterface, vif_and)).\
+                        filter(or_(*conditions)).\
+                        order_by(models.VirtualInterface.id,
+                                 models.FixedIp.id)
+        data.extend({'instance_uuid': instance_uuid, 'address': fixed_ip,
+                     'fixed_address': None}
+                    for instance_uuid, fixed_ip in query.all())
+
+    conditions = _conditions(models.FloatingIp.address, [address])
+    if conditions:
+        fixed_and = and_(models.FixedIp.id == models.FloatingIp.fixed_ip_id,
+                         models.FixedIp.deleted == 0)
+        query = session.query(models.VirtualInterface.instance_uuid,
+                              models.FloatingIp.address,
+                              models.FixedIp.address).\
+                        select_from(models.FloatingIp).\
+                        filter(models.FloatingIp.deleted == 0).\
+                        join((models.FixedIp, fixed_and)).\
+                        join((models.VirtualInterface, vif_and)).\
+                        filter(or_(*conditions)).\
+                        order_by(models.VirtualInterface.id,
+                                 models.FloatingIp.id)
+        data.extend({'instance_uuid': instance_uuid, 'address': floating_ip,
+                     'fixed_address': fixed_ip}
+                    for instance_uuid, floating_ip, fixed_ip in query.all())
+    return data
+
+
 @require_context
 def fixed_ip_update(context, address, values):
     session = get_session()
@@ -1691,6 +1764,64 @@ def instance_get_all(context, columns_to_join=None):
     return _instances_fill_metadata(context, instances, manual_joins)
 
 
+def _instances_filter_query(context, query, filters):
+    """Apply the filters accepted by instance_get_all_by_filters to an
+    instances query and return the updated query.
+    """
+
+    # Make a copy of the filters dictionary to use going forward, as we'll
+    # be modifying it and we shouldn't affect the caller's use of it.
+    filters = filters.copy()
+
+    if 'changes-since' in filters:
+        changes_since = timeutils.normalize_time(filters['changes-since'])
+        query = query.filter(models.Instance.updated_at > changes_since)
+
+    if 'deleted' in filters:
+        # Instances can be soft or hard deleted and the query needs to
+        # include or exclude both
+        if filters.pop('deleted'):
+            if filters.pop('soft_deleted', True):
+                deleted = or_(
+                    models.Instance.deleted == models.Instance.id,
+                    models.Instance.vm_state == vm_states.SOFT_DELETED
+                    )
+                query = query.filter(deleted)
+            else:
+                query = query.\
+                    filter(models.Instance.deleted == models.Instance.id)
+        else:
+            query = query.filter_by(deleted=0)
+            if not filters.pop('soft_deleted', False):
+                query = query.\
+                    filter(models.Instance.vm_state != vm_states.SOFT_DELETED)
+
+    if not context.is_admin:
+        # If we're not admin context, add appropriate filter..
+        if context.project_id:
+            filters['project_id'] = context.project_id
+        else:
+            filters['user_id'] = context.user_id
+
+    # Filters for exact matches that we can do along with the SQL query...
+    # For other filters that don't match this, we will do regexp matching
+    exact_match_filter_names = ['project_id', 'user_id', 'image_ref',
+                                'vm_state', 'instance_type_id', 'uuid',
+                                'metadata', 'host', 'task_state']
+
+    # Filter the query
+    query = exact_filter(query, models.Instance,
+                         filters, exact_match_filter_names)
+
+    query = regex_filter(query, models.Instance, filters)
+    query = tag_filter(context, query, models.Instance,
+                       models.InstanceMetadata,
+                       models.InstanceMetadata.instance_uuid,
+                       filters)
+
+    return query
+
+
 @require_context
 def instance_get_all_by_filters(context, filters, sort_key, sort_dir,
                                 limit=None, marker=None, columns_to_join=None,
@@ -1747,58 +1878,7 @@ def instance_get_all_by_filters(context, filters, sort_key, sort_dir,
     query_prefix = query_prefix.order_by(sort_fn[sort_dir](
             getattr(models.Instance, sort_key)))
 
-    # Make a copy of the filters dictionary to use going forward, as we'll
-    # be modifying it and we shouldn't affect the caller's use of it.
-    filters = filters.copy()
-
-    if 'changes-since' in filters:
-        changes_since = timeutils.normalize_time(filters['changes-since'])
-        query_prefix = query_prefix.\
-                            filter(models.Instance.updated_at > changes_since)
-
-    if 'deleted' in filters:
-        # Instances can be soft or hard deleted and the query needs to
-        # include or exclude both
-        if filters.pop('deleted'):
-            if filters.pop('soft_deleted', True):
-                deleted = or_(
-                    models.Instance.deleted == models.Instance.id,
-                    models.Instance.vm_state == vm_states.SOFT_DELETED
-                    )
-                query_prefix = query_prefix.\
-                    filter(deleted)
-            else:
-                query_prefix = query_prefix.\
-                    filter(models.Instance.deleted == models.Instance.id)
-        else:
-            query_prefix = query_prefix.\
-                    filter_by(deleted=0)
-            if not filters.pop('soft_deleted', False):
-                query_prefix = query_prefix.\
-                    filter(models.Instance.vm_state != vm_states.SOFT_DELETED)
-
-    if not context.is_admin:
-        # If we're not admin context, add appropriate filter..
-        if context.project_id:
-            filters['project_id'] = context.project_id
-        else:
-            filters['user_id'] = context.user_id
-
-    # Filters for exact matches that we can do along with the SQL query...
-    # For other filters that don't match this, we will do regexp matching
-    exact_match_filter_names = ['project_id', 'user_id', 'image_ref',
-                                'vm_state', 'instance_type_id', 'uuid',
-                                'metadata', 'host', 'task_state']
-
-    # Filter the query
-    query_prefix = exact_filter(query_prefix, models.Instance,
-                                filters, exact_match_filter_names)
-
-    query_prefix = regex_filter(query_prefix, models.Instance, filters)
-    query_prefix = tag_filter(context, query_prefix, models.Instance,
-                              models.InstanceMetadata,
-                              models.InstanceMetadata.instance_uuid,
-                              filters)
+    query_prefix = _instances_filter_query(context, query_prefix, filters)
 
     # paginate query
     if marker is not None:
@@ -1815,6 +1895,98 @@ def instance_get_all_by_filters(context, filters, sort_key, sort_dir,
     return _instances_fill_metadata(context, query_prefix.all(), manual_joins)
 
 
+@require_context
+def instance_get_all_columns_by_filters(context, filters, columns,
+                                        sort_key='created_at',
+                                        sort_dir='desc', limit=None,
+                                        marker=None, columns_to_join=None):
+    """Return only the given columns of the instances that match all
+    filters, as a list of dicts.
+
+    Filters are applied as in instance_get_all_by_filters.  Pagination is
+    done on (sort_key, id), and only those two values of the marker
+    instance are loaded.  The side tables in columns_to_join ('metadata',
+    'system_metadata', 'info_cache' and 'security_groups') are loaded with
+    a single IN query each for all of the returned instances.
+    """
+    columns = list(columns)
+    if 'uuid' not in columns:
+        columns.append('uuid')
+    if columns_to_join is None:
+        columns_to_join = []
+
+    session = get_session()
+    query = session.query(*[getattr(models.Instance, column)
+                            for column in columns])
+    query = _instances_filter_query(context, query, filters)
+
+    marker_row = None
+    if marker is not None:
+        marker_row = model_query(context,
+                                 getattr(models.Instance, sort_key),
+                                 models.Instance.id, session=session,
+                                 base_model=models.Instance,
+                                 project_only=True).\
+                        filter_by(uuid=marker).\
+                        first()
+        if marker_row is None:
+            raise exception.MarkerNotFound(marker=marker)
+    query = sqlalchemyutils.paginate_query(query, models.Instance, limit,
+                                           [sort_key, 'id'],
+                                           marker=marker_row,
+                                           sort_dir=sort_dir)
+
+    instances = [dict(zip(columns, row)) for row in query.all()]
+    _instances_fill_side_tables(context, instances, columns_to_join,
+                                session=session)
+    return instances
+
+
+def _instances_fill_side_tables(context, instances, columns_to_join,
+                                session=None):
+    """Add the side tables in columns_to_join to a list of instance dicts,
+    with one query per table.
+    """
+    uuids = [inst['uuid'] for inst in instances]
+    if not uuids:
+        return
+
+    rows_by_table = {}
+    if 'metadata' in columns_to_join:
+        rows_by_table['metadata'] = [(row['instance_uuid'], row) for row in
+                _instance_metadata_get_multi(context, uuids, session=session)]
+    if 'system_metadata' in columns_to_join:
+        rows_by_table['system_metadata'] = [(row['instance_uuid'], row)
+                for row in _instance_system_metadata_get_multi(
+                        context, uuids, session=session)]
+    if 'security_groups' in columns_to_join:
+        rows_by_table['security_groups'] = model_query(context,
+                models.SecurityGroupInstanceAssociation.instance_uuid,
+                models.SecurityGroup, session=session,
+                base_model=models.SecurityGroupInstanceAssociation).\
+            join(models.SecurityGroup, models.SecurityGroup.id ==
+                 models.SecurityGroupInstanceAssociation.security_group_id).\
+            filter(models.SecurityGroup.deleted == 0).\
+            filter(models.SecurityGroupInstanceAssociation.instance_uuid.in_(
+                    uuids)).\
+            all()
+
+    for table, rows in rows_by_table.iteritems():
+        by_uuid = collections.defaultdict(list)
+        for instance_uuid, row in rows:
+            by_uuid[instance_uuid].append(row)
+        for inst in instances:
+            inst[table] = by_uuid[inst['uuid']]
+
+    if 'info_cache' in columns_to_join:
+        info_caches = dict((row['instance_uuid'], row) for row in
+                model_query(context, models.InstanceInfoCache,
+                            session=session).
+                filter(models.InstanceInfoCache.instance_uuid.in_(uuids)))
+        for inst in instances:
+            inst['info_cache'] = info_caches.get(inst['uuid'])
+
+
 def tag_filter(context, query, model, model_metadata,
                model_uuid, filters):
     """Applies tag filtering to a query.
@@ -2084,6 +2256,72 @@ def _instance_metadata_update_in_place(context, instance, metadata_type, model,
         instance[metadata_type].append(newitem)
 
 
+def _instance_ref_update(context, instance_ref, values, session):
+    """Check the expected states of an instance and update it with values,
+    within the transaction of session.
+
+    Nothing is written if an expected state does not match.
+    """
+    if "expected_task_state" in values:
+        # it is not a db column so always pop out
+        expected = values.pop("expected_task_state")
+        if not isinstance(expected, (tuple, list, set)):
+            expected = (expected,)
+        actual_state = instance_ref["task_state"]
+        if actual_state not in expected:
+            raise exception.UnexpectedTaskStateError(actual=actual_state,
+                                                     expected=expected)
+    if "expected_vm_state" in values:
+        expected = values.pop("expected_vm_state")
+        if not isinstance(expected, (tuple, list, set)):
+            expected = (expected,)
+        actual_state = instance_ref["vm_state"]
+        if actual_state not in expected:
+            raise exception.UnexpectedVMStateError(actual=actual_state,
+                                                   expected=expected)
+
+    instance_hostname = instance_ref['hostname'] or ''
+    if ("hostname" in values and
+            values["hostname"].lower() != instance_hostname.lower()):
+            _validate_unique_server_name(context,
+                                         session,
+                                         values['hostname'])
+
+    metadata = values.get('metadata')
+    if metadata is not None:
+        _instance_metadata_update_in_place(context, instance_ref,
+                                           'metadata',
+                                           models.InstanceMetadata,
+                                           values.pop('metadata'),
+                                           session)
+
+    system_metadata = values.get('system_metadata')
+    if system_metadata is not None:
+        _instance_metadata_update_in_place(context, instance_ref,
+                                           'system_metadata',
+                                           models.InstanceSystemMetadata,
+                                           values.pop('system_metadata'),
+                                           session)
+
+    # NOTE(danms): Make sure IP addresses are passed as strings to
+    # the database engine
+    for key in ('access_ip_v4', 'access_ip_v6'):
+        if key in values and values[key] is not None:
+            values[key] = str(values[key])
+
+    # NOTE(danms): Strip UTC timezones from datetimes, since they're
+    # stored that way in the database
+    for key in ('created_at', 'deleted_at', 'updated_at',
+                'launched_at', 'terminated_at', 'scheduled_at'):
+        if key in values and values[key]:
+            if isinstance(values[key], basestring):
+                values[key] = timeutils.parse_strtime(values[key])
+            values[key] = values[key].replace(tzinfo=None)
+
+    instance_ref.update(values)
+    instance_ref.save(session=session)
+
+
 def _instance_update(context, instance_uuid, values, copy_old_instance=False):
     session = get_session()
 
@@ -2093,73 +2331,60 @@ def _instance_update(context, instance_uuid, values, copy_old_instance=False):
     with session.begin():
         instance_ref = _instance_get_by_uuid(context, instance_uuid,
                                              session=session)
-        if "expected_task_state" in values:
-            # it is not a db column so always pop out
-            expected = values.pop("expected_task_state")
-            if not isinstance(expected, (tuple, list, set)):
-                expected = (expected,)
-            actual_state = instance_ref["task_state"]
-            if actual_state not in expected:
-                raise exception.UnexpectedTaskStateError(actual=actual_state,
-                                                         expected=expected)
-        if "expected_vm_state" in values:
-            expected = values.pop("expected_vm_state")
-            if not isinstance(expected, (tuple, list, set)):
-                expected = (expected,)
-            actual_state = instance_ref["vm_state"]
-            if actual_state not in expected:
-                raise exception.UnexpectedVMStateError(actual=actual_state,
-                                                       expected=expected)
-
-        instance_hostname = instance_ref['hostname'] or ''
-        if ("hostname" in values and
-                values["hostname"].lower() != instance_hostname.lower()):
-                _validate_unique_server_name(context,
-                                             session,
-                                             values['hostname'])
-
         if copy_old_instance:
             old_instance_ref = copy.copy(instance_ref)
         else:
             old_instance_ref = None
 
-        metadata = values.get('metadata')
-        if metadata is not None:
-            _instance_metadata_update_in_place(context, instance_ref,
-                                               'metadata',
-                                               models.InstanceMetadata,
-                                               values.pop('metadata'),
-                                               session)
-
-        system_metadata = values.get('system_metadata')
-        if system_metadata is not None:
-            _instance_metadata_update_in_place(context, instance_ref,
-                                               'system_metadata',
-                                               models.InstanceSystemMetadata,
-                                               values.pop('system_metadata'),
-                                               session)
-
-        # NOTE(danms): Make sure IP addresses are passed as strings to
-        # the database engine
-        for key in ('access_ip_v4', 'access_ip_v6'):
-            if key in values and values[key] is not None:
-                values[key] = str(values[key])
-
-        # NOTE(danms): Strip UTC timezones from datetimes, since they're
-        # stored that way in the database
-        for key in ('created_at', 'deleted_at', 'updated_at',
-                    'launched_at', 'terminated_at', 'scheduled_at'):
-            if key in values and values[key]:
-                if isinstance(values[key], basestring):
-                    values[key] = timeutils.parse_strtime(values[key])
-                values[key] = values[key].replace(tzinfo=None)
-
-        instance_ref.update(values)
-        instance_ref.save(session=session)
+        _instance_ref_update(context, instance_ref, values, session)
 
     return (old_instance_ref, instance_ref)
 
 
+@require_context
+def instance_update_batch(context, updates):
+    """Update a batch of instances and their info caches in a single
+    transaction.
+
+    :param updates: list of dicts with the instance_uuid, the values to
+                    update the instance with and optionally the values to
+                    update its info_cache with
+
+    Returns a dict of the uuids of the instances which failed to update to
+    the exception raised, the other updates are applied.
+    """
+    failed = {}
+    session = get_session()
+    with session.begin():
+        uuids = [update['instance_uuid'] for update in updates]
+        instance_refs = dict((instance_ref['uuid'], instance_ref)
+                             for instance_ref in
+                             _build_instance_get(context, session=session).
+                             filter(models.Instance.uuid.in_(uuids)).all())
+        for update in updates:
+            instance_uuid = update['instance_uuid']
+            instance_ref = instance_refs.get(instance_uuid)
+            if instance_ref is None:
+                failed[instance_uuid] = exception.InstanceNotFound(
+                        instance_id=instance_uuid)
+                continue
+            # These are raised before anything of the instance is written,
+            # so the other updates can go on in the same transaction.
+            try:
+                _instance_ref_update(context, instance_ref,
+                                     update['values'], session)
+                if update.get('info_cache') is not None:
+                    _instance_info_cache_update(context, instance_uuid,
+                                                update['info_cache'],
+                                                session)
+            except (exception.UnexpectedTaskStateError,
+                    exception.UnexpectedVMStateError,
+                    exception.InstanceExists,
+                    exception.InstanceInfoCacheNotFound) as e:
+                failed[instance_uuid] = e
+    return failed
+
+
 def instance_add_security_group(context, instance_uuid, security_group_id):
     """Associate the given security group with the given instance."""
     sec_group_ref = models.SecurityGroupInstanceAssociation()
@@ -2202,26 +2427,31 @@ def instance_info_cache_update(context, instance_uuid, values):
     """
     session = get_session()
     with session.begin():
-        info_cache = model_query(context, models.InstanceInfoCache,
-                                 session=session).\
-                         filter_by(instance_uuid=instance_uuid).\
-                         first()
-        if info_cache and info_cache['deleted']:
-            raise exception.InstanceInfoCacheNotFound(
-                    instance_uuid=instance_uuid)
-        elif not info_cache:
-            # NOTE(tr3buchet): just in case someone blows away an instance's
-            #                  cache entry, re-create it.
-            info_cache = models.InstanceInfoCache()
-            values['instance_uuid'] = instance_uuid
+        return _instance_info_cache_update(context, instance_uuid, values,
+                                           session)
 
-        try:
-            info_cache.update(values)
-        except db_exc.DBDuplicateEntry:
-            # NOTE(sirp): Possible race if two greenthreads attempt to
-            # recreate the instance cache entry at the same time. First one
-            # wins.
-            pass
+
+def _instance_info_cache_update(context, instance_uuid, values, session):
+    info_cache = model_query(context, models.InstanceInfoCache,
+                             session=session).\
+                     filter_by(instance_uuid=instance_uuid).\
+                     first()
+    if info_cache and info_cache['deleted']:
+        raise exception.InstanceInfoCacheNotFound(
+                instance_uuid=instance_uuid)
+    elif not info_cache:
+        # NOTE(tr3buchet): just in case someone blows away an instance's
+        #                  cache entry, re-create it.
+        info_cache = models.InstanceInfoCache()
+        values['instance_uuid'] = instance_uuid
+
+    try:
+        info_cache.update(values)
+    except db_exc.DBDuplicateEntry:
+        # NOTE(sirp): Possible race if two greenthreads attempt to
+        # recreate the instance cache entry at the same time. First one
+        # wins.
+        pass
 
     return info_cache
 
@@ -3095,6 +3325,143 @@ def quota_reserve(context, resources, project_quotas, user_quotas, deltas,
     return reservations
 
 
+def _quota_usage_add_reserved(context, usage_id, delta, limit=-1):
+    """Atomically add delta to the reserved count of a usage.
+
+    If limit is not negative, the usage is only updated if its in_use and
+    reserved counts plus delta stay within limit.  Returns whether the
+    usage was updated.
+    """
+    query = model_query(context, models.QuotaUsage, read_deleted="no").\
+                    filter_by(id=usage_id)
+    if limit >= 0:
+        query = query.filter(models.QuotaUsage.in_use +
+                             models.QuotaUsage.reserved + delta <= limit)
+    return query.update({'reserved': models.QuotaUsage.reserved + delta},
+                        synchronize_session=False) == 1
+
+
+def _quota_usage_project_total(context, project_id, resource):
+    total = model_query(context,
+                        func.sum(models.QuotaUsage.in_use +
+                                 models.QuotaUsage.reserved),
+                        base_model=models.QuotaUsage, read_deleted="no").\
+                    filter_by(project_id=project_id).\
+                    filter_by(resource=resource).\
+                    scalar()
+    return total or 0
+
+
+@require_context
+def quota_reserve_conditional(context, resources, project_quotas,
+                              user_quotas, deltas, expire, until_refresh,
+                              max_age, project_id=None, user_id=None,
+                              retries=3):
+    """Reserve quota like quota_reserve(), without locking the usages.
+
+    Each positive delta is applied with a single conditional UPDATE of the
+    user's usage which only succeeds if the user quota is not exceeded.
+    The project total is checked once the delta is applied; if a
+    concurrent reservation pushed it over the project quota the delta is
+    backed out and applied again, up to `retries` times.  Usages which
+    still have to be created or refreshed are handled by quota_reserve().
+    """
+    elevated = context.elevated()
+
+    if project_id is None:
+        project_id = context.project_id
+    if user_id is None:
+        user_id = context.user_id
+
+    rows = model_query(elevated, models.QuotaUsage, read_deleted="no").\
+                   filter_by(project_id=project_id).\
+                   filter_by(user_id=user_id).\
+                   filter(models.QuotaUsage.resource.in_(deltas.keys())).\
+                   all()
+    usages = dict((row.resource, row) for row in rows)
+
+    for resource in deltas:
+        usage = usages.get(resource)
+        if (usage is None or usage.in_use < 0 or
+                usage.until_refresh is not None or
+                (max_age and (usage.updated_at -
+                              timeutils.utcnow()).seconds >= max_age)):
+            return quota_reserve(context, resources, project_quotas,
+                                 user_quotas, deltas, expire, until_refresh,
+                                 max_age, project_id=project_id,
+                                 user_id=user_id)
+
+    unders = [res for res, delta in deltas.items()
+              if delta < 0 and delta + usages[res].in_use < 0]
+
+    # NOTE(Vek): As in quota_reserve(), only positive increments are
+    #            checked against the quotas and added to reserved.
+    applied = []
+    overs = []
+    for res, delta in deltas.items():
+        if delta <= 0:
+            continue
+        usage_id = usages[res].id
+        if user_quotas[res] < 0:
+            _quota_usage_add_reserved(elevated, usage_id, delta)
+            applied.append((usage_id, delta))
+            continue
+
+        for attempt in xrange(retries + 1):
+            if not _quota_usage_add_reserved(elevated, usage_id, delta,
+                                             limit=user_quotas[res]):
+                overs.append(res)
+                break
+            total = _quota_usage_project_total(elevated, project_id, res)
+            if total <= project_quotas[res]:
+                applied.append((usage_id, delta))
+                break
+            # The project is over quota, possibly only because of other
+            # reservations which are in flight, so back out and retry.
+            _quota_usage_add_reserved(elevated, usage_id, -delta)
+        else:
+            overs.append(res)
+
+    reservations = []
+    if not overs:
+        try:
+            session = get_session()
+            with session.begin():
+                for res, delta in deltas.items():
+                    reservation = _reservation_create(elevated,
+                                                      str(uuid.uuid4()),
+                                                      usages[res],
+                                                      project_id,
+                                                      user_id,
+                                                      res, delta, expire,
+                                                      session=session)
+                    reservations.append(reservation.uuid)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                for usage_id, delta in applied:
+                    _quota_usage_add_reserved(elevated, usage_id, -delta)
+
+    if unders:
+        LOG.warning(_("Change will make usage less than 0 for the following "
+                      "resources: %s"), unders)
+    if overs:
+        for usage_id, delta in applied:
+            _quota_usage_add_reserved(elevated, usage_id, -delta)
+
+        usages = {}
+        for row in model_query(elevated, models.QuotaUsage,
+                               read_deleted="no").\
+                       filter_by(project_id=project_id).\
+                       filter_by(user_id=user_id).\
+                       all():
+            usages[row.resource] = dict(in_use=row.in_use,
+                                        reserved=row.reserved)
+        raise exception.OverQuota(overs=sorted(overs), quotas=user_quotas,
+                                  usages=usages)
+
+    return reservations
+
+
 def _quota_reservations_query(session, context, reservations):
     """Return the relevant reservations."""
 
@@ -3210,6 +3577,37 @@ def _ec2_snapshot_get_query(context, session=None):
                        session=session, read_deleted='yes')
 
 
+def _ec2_ids_get_or_create(context, model, uuids):
+    """Map uuids to ec2 ids, creating the missing mappings in one go."""
+    ec2_ids = {}
+    uuids = set(uuids)
+    if not uuids:
+        return ec2_ids
+
+    session = get_session()
+    with session.begin():
+        rows = model_query(context, model, session=session,
+                           read_deleted='yes').\
+                        filter(model.uuid.in_(uuids)).\
+                        order_by(model.id).\
+                        all()
+        for row in rows:
+            ec2_ids.setdefault(row['uuid'], row['id'])
+
+        created = []
+        for uuid in uuids - set(ec2_ids):
+            mapping_ref = model()
+            mapping_ref.uuid = uuid
+            session.add(mapping_ref)
+            created.append(mapping_ref)
+        if created:
+            session.flush()
+        for mapping_ref in created:
+            ec2_ids[mapping_ref['uuid']] = mapping_ref['id']
+
+    return ec2_ids
+
+
 @require_context
 def ec2_volume_create(context, volume_uuid, id=None):
     """Create ec2 compatible volume by provided uuid."""
@@ -3247,6 +3645,12 @@ def get_volume_uuid_by_ec2_id(context, ec2_id, session=None):
     return result['uuid']
 
 
+@require_context
+def ec2_volume_ids_get_or_create(context, volume_uuids):
+    return _ec2_ids_get_or_create(context, models.VolumeIdMapping,
+                                  volume_uuids)
+
+
 @require_context
 def ec2_snapshot_create(context, snapshot_uuid, id=None):
     """Create ec2 compatible snapshot by provided uuid."""
@@ -3284,6 +3688,12 @@ def get_snapshot_uuid_by_ec2_id(context, ec2_id, session=None):
     return result['uuid']
 
 
+@require_context
+def ec2_snapshot_ids_get_or_create(context, snapshot_uuids):
+    return _ec2_ids_get_or_create(context, models.SnapshotIdMapping,
+                                  snapshot_uuids)
+
+
 ###################
 
 
@@ -3376,6 +3786,16 @@ def block_device_mapping_get_all_by_instance(context, instance_uuid):
                  all()
 
 
+@require_context
+def block_device_mapping_get_all_by_instance_uuids(context, instance_uuids):
+    if not instance_uuids:
+        return []
+    return _block_device_mapping_get_query(context).\
+                 filter(models.BlockDeviceMapping.instance_uuid.in_(
+                     instance_uuids)).\
+                 all()
+
+
 @require_context
 def block_device_mapping_destroy(context, bdm_id):
     _block_device_mapping_get_query(context).\
@@ -4842,6 +5262,23 @@ def aggregate_metadata_get_by_host(context, host, key=None):
     return dict(metadata)
 
 
+@require_admin_context
+def aggregate_metadata_get_all_by_hosts(context):
+    query = model_query(context, models.Aggregate)
+    query = query.join("_metadata")
+    query = query.options(contains_eager("_metadata"))
+    query = query.options(joinedload("_hosts"))
+    rows = query.all()
+
+    metadata = collections.defaultdict(lambda: collections.defaultdict(set))
+    for agg in rows:
+        for agghost in agg._hosts:
+            for kv in agg._metadata:
+                metadata[agghost.host][kv['key']].add(kv['value'])
+    return dict((host, dict(host_metadata))
+                for host, host_metadata in metadata.iteritems())
+
+
 @require_admin_context
 def aggregate_host_get_by_metadata_key(context, key):
     query = model_query(context, models.Aggregate)
@@ -5195,6 +5632,12 @@ def ec2_instance_create(context, instance_uuid, id=None):
     return ec2_instance_ref
 
 
+@require_context
+def ec2_instance_ids_get_or_create(context, instance_uuids):
+    return _ec2_ids_get_or_create(context, models.InstanceIdMapping,
+                                  instance_uuids)
+
+
 @require_context
 def get_ec2_instance_id_by_uuid(context, instance_id, session=None):
     result = _ec2_instance_get_query(context,
@@ -17,8 +17,11 @@
 Filter support
 """
 
+import time
+
 from nova import loadables
 from nova.openstack.common.gettextutils import _
+from nova.openstack.common import local
 from nova.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
@@ -68,18 +71,24 @@ class BaseFilterHandler(loadables.BaseLoader):
             filter_properties, index=0):
         list_objs = list(objs)
         LOG.debug(_("Starting with %d host(s)"), len(list_objs))
+        request_stats = getattr(local.store, 'request_stats', None)
         for filter_cls in filter_classes:
             cls_name = filter_cls.__name__
             filter = filter_cls()
 
             if filter.run_filter_for_index(index):
+                start = time.time()
                 objs = filter.filter_all(list_objs,
                                                filter_properties)
                 if objs is None:
                     LOG.debug(_("Filter %(cls_name)s says to stop filtering"),
                           {'cls_name': cls_name})
                     return
+                hosts_in = len(list_objs)
                 list_objs = list(objs)
+                if request_stats is not None:
+                    request_stats.add_filter(cls_name, time.time() - start,
+                                             hosts_in, len(list_objs))
                 LOG.debug(_("Filter %(cls_name)s returned "
                             "%(obj_len)d host(s)"),
                           {'cls_name': cls_name, 'obj_len': len(list_objs)})
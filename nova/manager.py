@@ -53,6 +53,10 @@ This module provides Manager, a base class for managers.
 
 """
 
+import bisect
+import datetime
+import time
+
 from oslo.config import cfg
 
 from nova import baserpc
@@ -62,13 +66,145 @@ from nova.openstack.common.gettextutils import _
 from nova.openstack.common import log as logging
 from nova.openstack.common import periodic_task
 from nova.openstack.common.rpc import dispatcher as rpc_dispatcher
+from nova.openstack.common import timeutils
 from nova.scheduler import rpcapi as scheduler_rpcapi
+from nova import utils
+
 
+manager_opts = [
+    cfg.BoolOpt('periodic_tasks_parallel',
+                default=False,
+                help='Run each periodic task of a service in its own '
+                     'greenthread, so a slow task does not delay the '
+                     'others. A task is not started again while its '
+                     'previous run is still going on'),
+    ]
 
 CONF = cfg.CONF
+CONF.register_opts(manager_opts)
 CONF.import_opt('host', 'nova.netconf')
 LOG = logging.getLogger(__name__)
 
+# Upper bounds, in seconds, of the buckets of the periodic task runtime
+# histograms. The last bucket counts the runs longer than all of them.
+RUNTIME_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300)
+
+
+class PeriodicTaskStats(object):
+    """Runtime statistics of a periodic task."""
+
+    def __init__(self):
+        self.runs = 0
+        self.failures = 0
+        self.overruns = 0
+        self.last_runtime = None
+        self.max_runtime = 0
+        self.histogram = [0] * (len(RUNTIME_BUCKETS) + 1)
+
+    def record(self, runtime, failed=False):
+        self.runs += 1
+        if failed:
+            self.failures += 1
+        self.last_runtime = runtime
+        self.max_runtime = max(self.max_runtime, runtime)
+        self.histogram[bisect.bisect_left(RUNTIME_BUCKETS, runtime)] += 1
+
+    def to_dict(self):
+        histogram = dict(('<=%s' % bound, count) for bound, count
+                         in zip(RUNTIME_BUCKETS, self.histogram))
+        histogram['>%s' % RUNTIME_BUCKETS[-1]] = self.histogram[-1]
+        return {'runs': self.runs,
+                'failures': self.failures,
+                'overruns': self.overruns,
+                'last_runtime': self.last_runtime,
+                'max_runtime': self.max_runtime,
+                'histogram': histogram}
+
+
+class PeriodicTaskScheduler(object):
+    """Runs each periodic task of a manager in its own greenthread.
+
+    Tasks are started when they are due, like run_periodic_tasks() does,
+    but the scheduler doesn't wait for them to finish. A task which is
+    still running when it is due again is skipped and counted as an
+    overrun. The next run of a task is due its spacing after the time the
+    previous run was due, rather than after it was started, so the runs
+    don't drift by the time it takes to notice they are due.
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.stats = {}
+        self._running = set()
+
+    def _schedule_next_run(self, task_name, spacing, due, now):
+        if (due is not None and
+                timeutils.delta_seconds(due, now) < spacing):
+            self.manager._periodic_last_run[task_name] = due
+        else:
+            self.manager._periodic_last_run[task_name] = now
+
+    def run_periodic_tasks(self, context):
+        """Start the periodic tasks which are due.
+
+        Returns the number of seconds until the next task is due.
+        """
+        idle_for = periodic_task.DEFAULT_INTERVAL
+        for task_name, task in self.manager._periodic_tasks:
+            now = timeutils.utcnow()
+            spacing = self.manager._periodic_spacing[task_name]
+            last_run = self.manager._periodic_last_run[task_name]
+
+            due = None
+            if spacing is not None and last_run is not None:
+                due = last_run + datetime.timedelta(seconds=spacing)
+                if not timeutils.is_soon(due, 0.2):
+                    idle_for = min(idle_for, timeutils.delta_seconds(now, due))
+                    continue
+
+            if spacing is not None:
+                idle_for = min(idle_for, spacing)
+
+            stats = self.stats.setdefault(task_name, PeriodicTaskStats())
+            self._schedule_next_run(task_name, spacing, due, now)
+            if task_name in self._running:
+                stats.overruns += 1
+                LOG.warn(_("Periodic task %(task)s is still running, "
+                           "skipping this run"), {'task': task_name})
+                continue
+
+            self._running.add(task_name)
+            utils.spawn_n(self._run_task, context, task_name, task, stats)
+
+        return idle_for
+
+    def _run_task(self, context, task_name, task, stats):
+        full_task_name = '.'.join([self.manager.__class__.__name__,
+                                   task_name])
+        LOG.debug(_("Running periodic task %(full_task_name)s"),
+                  {'full_task_name': full_task_name})
+        failed = False
+        start = time.time()
+        try:
+            task(self.manager, context)
+        except Exception as e:
+            failed = True
+            LOG.exception(_("Error during %(full_task_name)s: %(e)s"),
+                          {'full_task_name': full_task_name, 'e': e})
+        finally:
+            self._running.discard(task_name)
+
+        runtime = time.time() - start
+        stats.record(runtime, failed=failed)
+        LOG.debug(_("Periodic task %(full_task_name)s took %(runtime).2f "
+                    "seconds"), {'full_task_name': full_task_name,
+                                 'runtime': runtime})
+
+    def get_stats(self):
+        """Return the runtime statistics of every task that was run."""
+        return dict((task_name, stats.to_dict())
+                    for task_name, stats in self.stats.iteritems())
+
 
 class Manager(base.Base, periodic_task.PeriodicTasks):
     # Set RPC API version to 1.0 by default.
@@ -96,10 +232,26 @@ class Manager(base.Base, periodic_task.PeriodicTasks):
         serializer = objects_base.NovaObjectSerializer()
         return rpc_dispatcher.RpcDispatcher(apis, serializer)
 
+    def _get_periodic_task_scheduler(self):
+        scheduler = getattr(self, '_periodic_task_scheduler', None)
+        if scheduler is None:
+            scheduler = PeriodicTaskScheduler(self)
+            self._periodic_task_scheduler = scheduler
+        return scheduler
+
     def periodic_tasks(self, context, raise_on_error=False):
         """Tasks to be run at a periodic interval."""
+        # NOTE: errors can't be raised from tasks running in their own
+        # greenthread, so those runs are left to the serial scheduler.
+        if CONF.periodic_tasks_parallel and not raise_on_error:
+            scheduler = self._get_periodic_task_scheduler()
+            return scheduler.run_periodic_tasks(context)
         return self.run_periodic_tasks(context, raise_on_error=raise_on_error)
 
+    def get_periodic_task_stats(self):
+        """Return the runtime statistics of the parallel periodic tasks."""
+        return self._get_periodic_task_scheduler().get_stats()
+
     def init_host(self):
         """Hook to do additional manager initialization when one requests
         the service be started.  This is called before any service record
@@ -25,6 +25,7 @@ import netaddr
 import os
 import re
 
+from eventlet import greenthread
 from oslo.config import cfg
 
 from nova import db
@@ -34,6 +35,7 @@ from nova.openstack.common import fileutils
 from nova.openstack.common.gettextutils import _
 from nova.openstack.common import importutils
 from nova.openstack.common import jsonutils
+from nova.openstack.common import lockutils
 from nova.openstack.common import log as logging
 from nova.openstack.common import processutils
 from nova.openstack.common import timeutils
@@ -123,6 +125,17 @@ linux_net_opts = [
                default='DROP',
                help=('The table that iptables to jump to when a packet is '
                      'to be dropped.')),
+    cfg.BoolOpt('iptables_incremental_apply',
+                default=False,
+                help='Only rewrite the wrapped iptables chains which changed '
+                     'since the last apply, with iptables-restore --noflush, '
+                     'when none of the shared chains changed'),
+    cfg.FloatOpt('dhcp_update_batch_interval',
+                 default=0.0,
+                 help='Number of seconds to gather the dhcp host updates of '
+                      'a network for, before rewriting its dnsmasq host '
+                      'file and reloading dnsmasq once. 0 updates them '
+                      'right away'),
     ]
 
 CONF = cfg.CONF
@@ -334,6 +347,10 @@ class IptablesManager(object):
 
         self.iptables_apply_deferred = False
 
+        # The chains and rules of each table as of the last apply, keyed
+        # by (command, table name).
+        self.applied_rules = {}
+
         # Add a nova-filter-top chain. It's intended to be shared
         # among the various nova components. It sits at the very top
         # of FORWARD and OUTPUT.
@@ -411,19 +428,97 @@ class IptablesManager(object):
             s += [('ip6tables', self.ipv6)]
 
         for cmd, tables in s:
-            all_tables, _err = self.execute('%s-save' % (cmd,), '-c',
+            table_rules = dict((table_name, self._get_table_rules(table))
+                               for table_name, table in tables.iteritems())
+
+            changed_lines = None
+            if CONF.iptables_incremental_apply:
+                changed_lines = self._get_changed_chains(cmd, table_rules)
+            if changed_lines is not None:
+                if changed_lines:
+                    self.execute('%s-restore' % (cmd,), '-c', '--noflush',
+                                 run_as_root=True,
+                                 process_input='\n'.join(changed_lines),
+                                 attempts=5)
+            else:
+                all_tables, _err = self.execute('%s-save' % (cmd,), '-c',
                                                 run_as_root=True,
                                                 attempts=5)
-            all_lines = all_tables.split('\n')
-            for table_name, table in tables.iteritems():
-                start, end = self._find_table(all_lines, table_name)
-                all_lines[start:end] = self._modify_rules(
-                        all_lines[start:end], table, table_name)
-            self.execute('%s-restore' % (cmd,), '-c', run_as_root=True,
-                         process_input='\n'.join(all_lines),
-                         attempts=5)
+                all_lines = all_tables.split('\n')
+                for table_name, table in tables.iteritems():
+                    start, end = self._find_table(all_lines, table_name)
+                    all_lines[start:end] = self._modify_rules(
+                            all_lines[start:end], table, table_name)
+                self.execute('%s-restore' % (cmd,), '-c', run_as_root=True,
+                             process_input='\n'.join(all_lines),
+                             attempts=5)
+
+            for table_name, rules in table_rules.iteritems():
+                self.applied_rules[(cmd, table_name)] = rules
         LOG.debug(_("IPTablesManager.apply completed with success"))
 
+    @staticmethod
+    def _get_table_rules(table):
+        """Return the shared (unwrapped) chains and rules of a table, and
+        the rules of each of its wrapped chains in the order _modify_rules()
+        writes them.
+        """
+        shared = [tuple(sorted(table.unwrapped_chains))]
+        wrapped = dict(('%s-%s' % (binary_name, name), [])
+                       for name in table.chains)
+        for top in (True, False):
+            for rule in table.rules:
+                if rule.top != top:
+                    continue
+                if rule.wrap:
+                    chain = '%s-%s' % (binary_name, rule.chain)
+                    wrapped.setdefault(chain, []).append(str(rule))
+                else:
+                    shared.append((top, str(rule)))
+
+        # Duplicate rules are dropped, the last occurrence taking precedence
+        for chain, lines in wrapped.iteritems():
+            seen_lines = set()
+            unique_lines = []
+            for line in reversed(lines):
+                if line not in seen_lines:
+                    seen_lines.add(line)
+                    unique_lines.append(line)
+            unique_lines.reverse()
+            wrapped[chain] = unique_lines
+
+        pending = bool(table.remove_rules or table.remove_chains)
+        return tuple(shared), pending, wrapped
+
+    def _get_changed_chains(self, cmd, table_rules):
+        """Return iptables-restore --noflush input which rewrites only the
+        wrapped chains that changed since the last apply.
+
+        Returns None if the tables have to be rewritten as a whole, because
+        they were not applied yet or their shared chains changed.
+        """
+        lines = []
+        for table_name, (shared, pending, wrapped) in table_rules.iteritems():
+            applied = self.applied_rules.get((cmd, table_name))
+            if applied is None or pending or applied[0] != shared:
+                return None
+            applied_wrapped = applied[2]
+
+            changed = [chain for chain, rules in wrapped.iteritems()
+                       if applied_wrapped.get(chain) != rules]
+            removed = [chain for chain in applied_wrapped
+                       if chain not in wrapped]
+            if not changed and not removed:
+                continue
+
+            lines.append('*%s' % table_name)
+            lines += [':%s - [0:0]' % chain for chain in changed + removed]
+            for chain in changed:
+                lines += wrapped[chain]
+            lines += ['-X %s' % chain for chain in removed]
+            lines.append('COMMIT')
+        return lines
+
     def _find_table(self, lines, table_name):
         if len(lines) < 3:
             # length only <2 when fake iptables
@@ -459,17 +554,17 @@ class IptablesManager(object):
         if CONF.iptables_top_regex:
             regex = re.compile(CONF.iptables_top_regex)
             temp_filter = filter(lambda line: regex.search(line), new_filter)
-            for rule_str in temp_filter:
-                new_filter = filter(lambda s: s.strip() != rule_str.strip(),
-                                    new_filter)
+            temp_lines = set(line.strip() for line in temp_filter)
+            new_filter = filter(lambda s: s.strip() not in temp_lines,
+                                new_filter)
             top_rules = temp_filter
 
         if CONF.iptables_bottom_regex:
             regex = re.compile(CONF.iptables_bottom_regex)
             temp_filter = filter(lambda line: regex.search(line), new_filter)
-            for rule_str in temp_filter:
-                new_filter = filter(lambda s: s.strip() != rule_str.strip(),
-                    new_filter)
+            temp_lines = set(line.strip() for line in temp_filter)
+            new_filter = filter(lambda s: s.strip() not in temp_lines,
+                                new_filter)
             bottom_rules = temp_filter
 
         seen_chains = False
@@ -485,39 +580,35 @@ class IptablesManager(object):
         if not seen_chains:
             rules_index = 2
 
+        # rule.top == True means we want this rule to be at the top.
+        # Further down, we weed out duplicates from the bottom of the
+        # list, so here we remove the dupes ahead of time.
+
+        # We don't want to remove an entry if it has non-zero
+        # [packet:byte] counts and replace it with [0:0], so let's
+        # go look for a duplicate, and over-ride our table rule if
+        # found.
+        top_dups = dict((_strip_rule_counts(str(rule)), None)
+                        for rule in rules if rule.top)
+        if top_dups:
+            other_lines = []
+            for line in new_filter:
+                line_str = _strip_rule_counts(line)
+                if line_str in top_dups:
+                    # keep the last entry
+                    top_dups[line_str] = line
+                else:
+                    other_lines.append(line)
+            new_filter = other_lines
+
         our_rules = top_rules
         bot_rules = []
         for rule in rules:
             rule_str = str(rule)
             if rule.top:
-                # rule.top == True means we want this rule to be at the top.
-                # Further down, we weed out duplicates from the bottom of the
-                # list, so here we remove the dupes ahead of time.
-
-                # We don't want to remove an entry if it has non-zero
-                # [packet:byte] counts and replace it with [0:0], so let's
-                # go look for a duplicate, and over-ride our table rule if
-                # found.
-
-                # ignore [packet:byte] counts at beginning of line
-                if rule_str.startswith('['):
-                    rule_str = rule_str.split(']', 1)[1]
-                dup_filter = filter(lambda s: rule_str.strip() in s.strip(),
-                                    new_filter)
-
-                new_filter = filter(lambda s:
-                                    rule_str.strip() not in s.strip(),
-                                    new_filter)
                 # if no duplicates, use original rule
-                if dup_filter:
-                    # grab the last entry, if there is one
-                    dup = dup_filter[-1]
-                    rule_str = str(dup)
-                else:
-                    rule_str = str(rule)
-                rule_str.strip()
-
-                our_rules += [rule_str]
+                our_rules += [top_dups[_strip_rule_counts(rule_str)] or
+                              rule_str]
             else:
                 bot_rules += [rule_str]
 
@@ -537,15 +628,16 @@ class IptablesManager(object):
 
         def _weed_out_duplicates(line):
             # ignore [packet:byte] counts at beginning of lines
-            if line.startswith('['):
-                line = line.split(']', 1)[1]
-            line = line.strip()
+            line = _strip_rule_counts(line)
             if line in seen_lines:
                 return False
             else:
                 seen_lines.add(line)
                 return True
 
+        remove_lines = set(_strip_rule_counts(str(rule))
+                           for rule in remove_rules)
+
         def _weed_out_removes(line):
             # We need to find exact matches here
             if line.startswith(':'):
@@ -554,23 +646,15 @@ class IptablesManager(object):
                 line = line.split(':')[1]
                 line = line.split('- [')[0]
                 line = line.strip()
-                for chain in remove_chains:
-                    if chain == line:
-                        remove_chains.remove(chain)
-                        return False
+                if line in remove_chains:
+                    remove_chains.remove(line)
+                    return False
             elif line.startswith('['):
                 # it's a rule
-                # ignore [packet:byte] counts at beginning of lines
-                line = line.split(']', 1)[1]
-                line = line.strip()
-                for rule in remove_rules:
-                    # ignore [packet:byte] counts at beginning of rules
-                    rule_str = str(rule)
-                    rule_str = rule_str.split(' ', 1)[1]
-                    rule_str = rule_str.strip()
-                    if rule_str == line:
-                        remove_rules.remove(rule)
-                        return False
+                line = _strip_rule_counts(line)
+                if line in remove_lines:
+                    remove_lines.remove(line)
+                    return False
 
             # Leave it alone
             return True
@@ -585,12 +669,18 @@ class IptablesManager(object):
 
         # flush lists, just in case we didn't find something
         remove_chains.clear()
-        for rule in remove_rules:
-            remove_rules.remove(rule)
+        del remove_rules[:]
 
         return new_filter
 
 
+def _strip_rule_counts(line):
+    """Return an iptables-save line without its [packet:byte] counts."""
+    if line.startswith('['):
+        line = line.split(']', 1)[1]
+    return line.strip()
+
+
 # NOTE(jkoelker) This is just a nice little stub point since mocking
 #                builtins with mox is a nightmare
 def write_to_file(file, data, mode='w'):
@@ -951,7 +1041,89 @@ def release_dhcp(dev, address, mac_address):
     utils.execute('dhcp_release', dev, address, mac_address, run_as_root=True)
 
 
+class DhcpUpdateBatcher(object):
+    """Coalesces the dhcp host updates of each device.
+
+    The first update of a device schedules a flush after the batch
+    interval, later updates only replace the context and network the flush
+    uses.  The flush reads the hosts of the network once and only rewrites
+    the host file and reloads dnsmasq if they changed.  Flushes of a
+    device are serialized with each other and with discarding it.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        # dev -> (context, network_ref) of the last update
+        self._pending = {}
+        # dev -> hosts last written to the host file of the device
+        self._hosts = {}
+        self.stats = {'updates': 0, 'flushes': 0, 'unchanged': 0,
+                      'discarded': 0}
+
+    def update(self, context, dev, network_ref):
+        self.stats['updates'] += 1
+        if dev not in self._pending:
+            greenthread.spawn_after(self.interval, self._flush, dev)
+        self._pending[dev] = (context, network_ref)
+
+    def discard(self, dev):
+        """Drop the pending update of a device whose dnsmasq is killed."""
+        with lockutils.lock('dhcp-update-%s' % dev):
+            if self._pending.pop(dev, None) is not None:
+                self.stats['discarded'] += 1
+            self._hosts.pop(dev, None)
+
+    def _flush(self, dev):
+        with lockutils.lock('dhcp-update-%s' % dev):
+            if dev not in self._pending:
+                # Discarded since the flush was scheduled
+                return
+            context, network_ref = self._pending.pop(dev)
+            self.stats['flushes'] += 1
+            try:
+                hosts = get_dhcp_hosts(context, network_ref)
+                if hosts == self._hosts.get(dev) and _dnsmasq_running(dev):
+                    self.stats['unchanged'] += 1
+                    return
+                write_to_file(_dhcp_file(dev, 'conf'), hosts)
+                restart_dhcp(context, dev, network_ref)
+                self._hosts[dev] = hosts
+            except Exception:
+                self._hosts.pop(dev, None)
+                LOG.exception(_('Failed to update dhcp hosts of %s'), dev)
+        LOG.debug(_('Coalesced %(coalesced)d of %(updates)d dhcp host '
+                    'updates'), self.get_stats())
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['coalesced'] = (stats['updates'] - stats['flushes'] -
+                              stats['discarded'] - len(self._pending))
+        return stats
+
+
+_DHCP_UPDATE_BATCHER = None
+
+
+def _get_dhcp_update_batcher():
+    global _DHCP_UPDATE_BATCHER
+    if _DHCP_UPDATE_BATCHER is None:
+        _DHCP_UPDATE_BATCHER = DhcpUpdateBatcher(
+                CONF.dhcp_update_batch_interval)
+    return _DHCP_UPDATE_BATCHER
+
+
+def get_dhcp_update_stats():
+    """Return how many dhcp host updates were asked for, how many host
+    file flushes they were coalesced into, how many of those found the
+    hosts unchanged and how many were discarded with their dnsmasq.
+    """
+    return _get_dhcp_update_batcher().get_stats()
+
+
 def update_dhcp(context, dev, network_ref):
+    if CONF.dhcp_update_batch_interval > 0:
+        _get_dhcp_update_batcher().update(context, dev, network_ref)
+        return
     conffile = _dhcp_file(dev, 'conf')
     write_to_file(conffile, get_dhcp_hosts(context, network_ref))
     restart_dhcp(context, dev, network_ref)
@@ -969,6 +1141,9 @@ def update_dhcp_hostfile_with_text(dev, hosts_text):
 
 
 def kill_dhcp(dev):
+    # A batched update must not restart dnsmasq once it is killed
+    if _DHCP_UPDATE_BATCHER is not None:
+        _DHCP_UPDATE_BATCHER.discard(dev)
     pid = _dnsmasq_pid_for(dev)
     if pid:
         # Check that the process exists and looks like a dnsmasq process
@@ -1206,6 +1381,12 @@ def _dnsmasq_pid_for(dev):
             return None
 
 
+def _dnsmasq_running(dev):
+    """Returns True if the dnsmasq of a bridge/device is running."""
+    pid = _dnsmasq_pid_for(dev)
+    return pid is not None and os.path.exists('/proc/%d' % pid)
+
+
 def _ra_pid_for(dev):
     """Returns the pid for prior radvd instance for a bridge/device.
 
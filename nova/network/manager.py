@@ -179,6 +179,48 @@ CONF.import_opt('my_ip', 'nova.netconf')
 CONF.import_opt('network_topic', 'nova.network.rpcapi')
 
 
+def _ip_filter_to_sql(ip_filter):
+    """Turn an ip filter regex into an address to match exactly and a
+    pattern for SQL LIKE, which match at least the addresses matching the
+    regex.
+
+    Regexes made of address characters, escaped dots, dots matching any
+    character and anchors are turned into a pattern using indexes. Any
+    other regex gives a pattern for the literal prefix before its first
+    unsupported token, or matching every address if it has alternatives
+    or groups.
+    """
+    pattern = []
+    exact = True
+    tokens = re.findall(r'\\.|.', ip_filter)
+    if '|' in tokens or '(' in tokens:
+        return None, '%'
+    if tokens and tokens[0] == '^':
+        tokens.pop(0)
+    end = bool(tokens) and tokens[-1] == '$'
+    if end:
+        tokens.pop()
+    for token in tokens:
+        if token == '\\.':
+            pattern.append('.')
+        elif token == '.':
+            pattern.append('_')
+            exact = False
+        elif re.match('[0-9a-zA-Z:]$', token):
+            pattern.append(token)
+        else:
+            # The previous token may match nothing at all
+            if token in ('*', '?', '{') and pattern:
+                pattern.pop()
+            return None, ''.join(pattern) + '%'
+    pattern = ''.join(pattern)
+    if not end:
+        return None, pattern + '%'
+    if exact:
+        return pattern, None
+    return None, pattern
+
+
 class RPCAllocateFixedIP(object):
     """Mixin class originally for FlatDCHP and VLAN network managers.
 
@@ -399,51 +441,64 @@ class NetworkManager(manager.Manager):
         fixed_ip_filter = filters.get('fixed_ip')
         ip_filter = re.compile(str(filters.get('ip')))
         ipv6_filter = re.compile(str(filters.get('ip6')))
+        results = []
 
-        # NOTE(jkoelker) Should probably figure out a better way to do
-        #                this. But for now it "works", this could suck on
-        #                large installs.
+        # NOTE: The ip filter is turned into SQL predicates which may
+        #       match more addresses than the regex, they are checked
+        #       again here.
+        address = address_like = None
+        if filters.get('ip') is not None:
+            address, address_like = _ip_filter_to_sql(filters['ip'])
+        if fixed_ip_filter or address or address_like:
+            ips = self.db.instance_addresses_get_by_filter(context,
+                    fixed_address=fixed_ip_filter, address=address,
+                    address_like=address_like)
+            fixed_ips = [ip for ip in ips if ip['fixed_address'] is None]
+            floating_ips = [ip for ip in ips
+                            if ip['fixed_address'] is not None]
+
+            matched = set()
+            for fixed_ip in fixed_ips:
+                if (fixed_ip['address'] == fixed_ip_filter or
+                        ip_filter.match(fixed_ip['address'])):
+                    results.append({'instance_uuid':
+                                        fixed_ip['instance_uuid'],
+                                    'ip': fixed_ip['address']})
+                    matched.add(fixed_ip['address'])
+            # The floating ips of a matching fixed ip are not listed
+            for floating_ip in floating_ips:
+                if floating_ip['fixed_address'] in matched:
+                    continue
+                if ip_filter.match(floating_ip['address']):
+                    results.append({'instance_uuid':
+                                        floating_ip['instance_uuid'],
+                                    'ip': floating_ip['address']})
 
-        vifs = self.db.virtual_interface_get_all(context)
-        results = []
+        if filters.get('ip6') is None:
+            return results
 
-        for vif in vifs:
+        # NOTE: IPv6 addresses are not stored but derived from the
+        #       network, the vif mac address and the project of the
+        #       request, so every vif still has to be checked.
+        networks = {}
+        for vif in self.db.virtual_interface_get_all(context):
             if vif['instance_uuid'] is None:
                 continue
 
-            network = self._get_network_by_id(context, vif['network_id'])
-            fixed_ipv6 = None
-            if network['cidr_v6'] is not None:
-                fixed_ipv6 = ipv6.to_global(network['cidr_v6'],
-                                            vif['address'],
-                                            context.project_id)
-
-            if fixed_ipv6 and ipv6_filter.match(fixed_ipv6):
+            network_id = vif['network_id']
+            if network_id not in networks:
+                networks[network_id] = self._get_network_by_id(context,
+                                                               network_id)
+            network = networks[network_id]
+            if network['cidr_v6'] is None:
+                continue
+            fixed_ipv6 = ipv6.to_global(network['cidr_v6'],
+                                        vif['address'],
+                                        context.project_id)
+            if ipv6_filter.match(fixed_ipv6):
                 results.append({'instance_uuid': vif['instance_uuid'],
                                 'ip': fixed_ipv6})
 
-            vif_id = vif['id']
-            fixed_ips = self.db.fixed_ips_by_virtual_interface(context,
-                                                               vif_id)
-            for fixed_ip in fixed_ips:
-                if not fixed_ip or not fixed_ip['address']:
-                    continue
-                if fixed_ip['address'] == fixed_ip_filter:
-                    results.append({'instance_uuid': vif['instance_uuid'],
-                                    'ip': fixed_ip['address']})
-                    continue
-                if ip_filter.match(fixed_ip['address']):
-                    results.append({'instance_uuid': vif['instance_uuid'],
-                                    'ip': fixed_ip['address']})
-                    continue
-                for floating_ip in fixed_ip.get('floating_ips', []):
-                    if not floating_ip or not floating_ip['address']:
-                        continue
-                    if ip_filter.match(floating_ip['address']):
-                        results.append({'instance_uuid': vif['instance_uuid'],
-                                        'ip': floating_ip['address']})
-                        continue
-
         return results
 
     def _get_networks_for_instance(self, context, instance_id, project_id,
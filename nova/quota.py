@@ -81,6 +81,16 @@ quota_opts = [
     cfg.StrOpt('quota_driver',
                default='nova.quota.DbQuotaDriver',
                help='default driver to use for quota checks'),
+    cfg.BoolOpt('quota_conditional_reserve',
+                default=False,
+                help='reserve quota with conditional updates of the quota '
+                     'usages instead of locking all of the usages of the '
+                     'user. Only used by the DbQuotaDriver'),
+    cfg.IntOpt('quota_conditional_reserve_retries',
+               default=3,
+               help='number of times a conditional quota reservation is '
+                    'retried when concurrent reservations push the project '
+                    'over quota'),
     ]
 
 CONF = cfg.CONF
@@ -477,6 +487,12 @@ class DbQuotaDriver(object):
         #            which means access to the session.  Since the
         #            session isn't available outside the DBAPI, we
         #            have to do the work there.
+        if CONF.quota_conditional_reserve:
+            return db.quota_reserve_conditional(context, resources, quotas,
+                    user_quotas, deltas, expire,
+                    CONF.until_refresh, CONF.max_age,
+                    project_id=project_id, user_id=user_id,
+                    retries=CONF.quota_conditional_reserve_retries)
         return db.quota_reserve(context, resources, quotas, user_quotas,
                                 deltas, expire,
                                 CONF.until_refresh, CONF.max_age,
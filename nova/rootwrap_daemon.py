@@ -0,0 +1,248 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Long running root wrapper for nova services
+
+   nova-rootwrap-daemon loads the rootwrap configuration and filters once
+   and then runs the commands sent to it over a UNIX socket, if they match
+   one of the filters, saving the cost of starting sudo and nova-rootwrap
+   for every command.
+
+   It is started by the service itself, when use_rootwrap_daemon is set,
+   and needs to be allowed in sudoers like nova-rootwrap:
+   nova ALL = (root) NOPASSWD: /usr/bin/nova-rootwrap-daemon
+                                   /etc/nova/rootwrap.conf
+
+   The daemon creates its socket in a new private directory, owned by the
+   user who ran sudo, and writes the path of the socket to stdout. Only
+   connections from that user are accepted. The daemon exits when its
+   stdin is closed, that is when the service which started it is gone.
+
+   Like nova-rootwrap, this runs as root and must not depend on more than
+   the standard library and the rootwrap filters.
+"""
+
+from __future__ import print_function
+
+import ConfigParser
+import json
+import logging
+import os
+import shutil
+import signal
+import socket
+import SocketServer
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+
+from nova.openstack.common.rootwrap import cmd
+from nova.openstack.common.rootwrap import wrapper
+
+
+SOCKET_NAME = 'rootwrap.sock'
+# Messages are JSON documents prefixed by their length
+_HEADER = struct.Struct('!I')
+# SO_PEERCRED is only exposed by the socket module from python 3.3
+SO_PEERCRED = getattr(socket, 'SO_PEERCRED', 17)
+_UCRED = struct.Struct('3i')
+# Exit code of nova-rootwrap when it dies on an unexpected exception
+RC_EXCEPTION = 1
+
+
+def _subprocess_setup():
+    # Python installs a SIGPIPE handler by default. This is usually not what
+    # non-Python subprocesses expect.
+    signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+
+
+def _exit_error(execname, message, errorcode):
+    print("%s: %s" % (execname, message))
+    sys.exit(errorcode)
+
+
+def _recv_exactly(sock, size):
+    data = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise EOFError()
+        data.append(chunk)
+        size -= len(chunk)
+    return ''.join(data)
+
+
+def send_message(sock, message):
+    data = json.dumps(message)
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def recv_message(sock):
+    size, = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    return json.loads(_recv_exactly(sock, size))
+
+
+def encode_output(data):
+    """Make command output, which may not be text, JSON serializable."""
+    if data is None:
+        return None
+    return data.decode('latin-1')
+
+
+def decode_output(data):
+    if data is None:
+        return None
+    return data.encode('latin-1')
+
+
+class RootwrapHandler(SocketServer.BaseRequestHandler):
+    """Runs the command sent on a connection and sends back its result."""
+
+    def handle(self):
+        creds = self.request.getsockopt(socket.SOL_SOCKET, SO_PEERCRED,
+                                        _UCRED.size)
+        pid, uid, gid = _UCRED.unpack(creds)
+        if uid not in (0, self.server.allowed_uid):
+            logging.error("Refused connection from uid %d" % uid)
+            return
+
+        try:
+            request = recv_message(self.request)
+        except (EOFError, ValueError):
+            return
+        try:
+            returncode, stdout, stderr = self.server.run_command(
+                [str(arg) for arg in request['cmd']],
+                decode_output(request.get('stdin')))
+        except Exception as exc:
+            # Like nova-rootwrap dying on an exception, so that the client
+            # gets a failure rather than a closed connection
+            logging.exception("Failed to run %r" % request.get('cmd'))
+            returncode, stdout, stderr = RC_EXCEPTION, '', (
+                "nova-rootwrap-daemon: %s\n" % exc)
+        send_message(self.request, {'returncode': returncode,
+                                    'stdout': encode_output(stdout),
+                                    'stderr': encode_output(stderr)})
+
+
+class RootwrapServer(SocketServer.ThreadingMixIn,
+                     SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, config, filters, allowed_uid):
+        SocketServer.UnixStreamServer.__init__(self, socket_path,
+                                               RootwrapHandler)
+        self.config = config
+        self.filters = filters
+        self.allowed_uid = allowed_uid
+
+    def run_command(self, userargs, process_input=None):
+        """Run a command if it matches a filter, like nova-rootwrap does.
+
+        Returns the exit code, stdout and stderr of the command.
+        """
+        config = self.config
+        try:
+            filtermatch = wrapper.match_filter(self.filters, userargs,
+                                               exec_dirs=config.exec_dirs)
+        except wrapper.FilterMatchNotExecutable as exc:
+            msg = ("Executable not found: %s (filter match = %s)"
+                   % (exc.match.exec_path, exc.match.name))
+            return self._error(msg, cmd.RC_NOEXECFOUND)
+        except wrapper.NoFilterMatched:
+            msg = ("Unauthorized command: %s (no filter matched)"
+                   % ' '.join(userargs))
+            return self._error(msg, cmd.RC_UNAUTHORIZED)
+
+        command = filtermatch.get_command(userargs,
+                                          exec_dirs=config.exec_dirs)
+        if config.use_syslog:
+            logging.info("(daemon) Executing %s (filter match = %s)" % (
+                command, filtermatch.name))
+
+        obj = subprocess.Popen(command,
+                               stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE,
+                               close_fds=True,
+                               preexec_fn=_subprocess_setup,
+                               env=filtermatch.get_environment(userargs))
+        stdout, stderr = obj.communicate(process_input)
+        return obj.returncode, stdout, stderr
+
+    def _error(self, msg, returncode):
+        if self.config.use_syslog:
+            logging.error(msg)
+        return returncode, '', "nova-rootwrap-daemon: %s\n" % msg
+
+
+def _wait_for_eof(server):
+    try:
+        while sys.stdin.read(4096):
+            pass
+    finally:
+        server.shutdown()
+
+
+def main():
+    execname = sys.argv.pop(0)
+    if len(sys.argv) != 1:
+        _exit_error(execname, "No configuration file specified",
+                    cmd.RC_BADCONFIG)
+    configfile = sys.argv[0]
+
+    try:
+        rawconfig = ConfigParser.RawConfigParser()
+        rawconfig.read(configfile)
+        config = wrapper.RootwrapConfig(rawconfig)
+    except ValueError as exc:
+        msg = "Incorrect value in %s: %s" % (configfile, exc.message)
+        _exit_error(execname, msg, cmd.RC_BADCONFIG)
+    except ConfigParser.Error:
+        _exit_error(execname, "Incorrect configuration file: %s" % configfile,
+                    cmd.RC_BADCONFIG)
+
+    if config.use_syslog:
+        wrapper.setup_syslog(execname,
+                             config.syslog_log_facility,
+                             config.syslog_log_level)
+
+    filters = wrapper.load_filters(config.filters_path)
+    uid = int(os.environ.get('SUDO_UID', os.getuid()))
+    gid = int(os.environ.get('SUDO_GID', os.getgid()))
+
+    # Only the user who started the daemon may reach its socket
+    socket_dir = tempfile.mkdtemp(prefix='nova-rootwrap-')
+    try:
+        os.chown(socket_dir, uid, gid)
+        socket_path = os.path.join(socket_dir, SOCKET_NAME)
+        server = RootwrapServer(socket_path, config, filters, uid)
+        os.chmod(socket_path, 0o600)
+        os.chown(socket_path, uid, gid)
+
+        signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+        watcher = threading.Thread(target=_wait_for_eof, args=(server,))
+        watcher.daemon = True
+        watcher.start()
+
+        print(socket_path)
+        sys.stdout.flush()
+        server.serve_forever()
+    finally:
+        shutil.rmtree(socket_dir, ignore_errors=True)
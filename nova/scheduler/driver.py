@@ -36,6 +36,7 @@ from nova.openstack.common import importutils
 from nova.openstack.common import log as logging
 from nova.openstack.common.notifier import api as notifier
 from nova.openstack.common import timeutils
+from nova.scheduler import request_stats
 from nova import servicegroup
 
 LOG = logging.getLogger(__name__)
@@ -120,12 +121,17 @@ class Scheduler(object):
         self.host_manager = importutils.import_object(
                 CONF.scheduler_host_manager)
         self.servicegroup_api = servicegroup.API()
+        self.scheduler_stats = request_stats.SchedulerStats()
 
     def update_service_capabilities(self, service_name, host, capabilities):
         """Process a capability update from a service node."""
         self.host_manager.update_service_capabilities(service_name,
                 host, capabilities)
 
+    def get_request_stats(self):
+        """Return the totals of the requests timed by this scheduler."""
+        return self.scheduler_stats.to_dict()
+
     def hosts_up(self, context, topic):
         """Return the list of hosts that have a running service for topic."""
 
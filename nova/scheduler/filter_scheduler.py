@@ -19,6 +19,7 @@ You can customize this scheduler by specifying your own Host Filters and
 Weighing Functions.
 """
 
+import heapq
 import random
 
 from oslo.config import cfg
@@ -31,6 +32,7 @@ from nova.openstack.common.gettextutils import _
 from nova.openstack.common import log as logging
 from nova.openstack.common.notifier import api as notifier
 from nova.scheduler import driver
+from nova.scheduler import request_stats
 from nova.scheduler import scheduler_options
 from nova.scheduler import utils as scheduler_utils
 
@@ -48,7 +50,23 @@ filter_scheduler_opts = [
                     'chosen from. A value of 1 chooses the '
                     'first host returned by the weighing functions. '
                     'This value must be at least 1. Any value less than 1 '
-                    'will be ignored, and 1 will be used instead')
+                    'will be ignored, and 1 will be used instead'),
+    cfg.BoolOpt('scheduler_heap_placement',
+                default=False,
+                help='Place the instances of a multi-instance request using '
+                     'a priority queue of weighed hosts. Only the host '
+                     'chosen for an instance is filtered and weighed again '
+                     'for the next one, instead of every host. Requires '
+                     'weighers that weigh each host independently of the '
+                     'others'),
+    cfg.BoolOpt('scheduler_filter_early_stop',
+                default=False,
+                help='With scheduler_adaptive_filters, stop filtering the '
+                     'hosts once scheduler_host_subset_size times the '
+                     'number of instances requested passed the filters. '
+                     'Only those hosts are weighed, so this is only suited '
+                     'to clouds where any host passing the filters is a '
+                     'good enough choice'),
 ]
 
 CONF.register_opts(filter_scheduler_opts)
@@ -300,6 +318,25 @@ class FilterScheduler(driver.Scheduler):
         """Returns a list of hosts that meet the required specs,
         ordered by their fitness.
         """
+        if not request_stats.is_enabled():
+            return self._schedule_hosts(context, request_spec,
+                                        filter_properties, instance_uuids)
+
+        stats = request_stats.RequestStats()
+        try:
+            with stats:
+                return self._schedule_hosts(context, request_spec,
+                                            filter_properties, instance_uuids)
+        finally:
+            self.scheduler_stats.add(stats)
+            payload = stats.to_dict()
+            payload['num_instances'] = request_spec.get('num_instances', 1)
+            notifier.notify(context, notifier.publisher_id("scheduler"),
+                            'scheduler.request.stats', notifier.INFO,
+                            payload)
+
+    def _schedule_hosts(self, context, request_spec, filter_properties,
+                        instance_uuids):
         elevated = context.elevated()
         instance_properties = request_spec['instance_properties']
         instance_type = request_spec.get("instance_type", None)
@@ -342,43 +379,145 @@ class FilterScheduler(driver.Scheduler):
         # Note: remember, we are using an iterator here. So only
         # traverse this list once. This can bite you if the hosts
         # are being scanned in a filter or weighing function.
-        hosts = self.host_manager.get_all_host_states(elevated)
+        with request_stats.timed('get_all_host_states'):
+            hosts = self.host_manager.get_all_host_states(elevated)
 
-        selected_hosts = []
         if instance_uuids:
             num_instances = len(instance_uuids)
         else:
             num_instances = request_spec.get('num_instances', 1)
+        if CONF.scheduler_filter_early_stop:
+            filter_properties['host_candidate_limit'] = (
+                    max(CONF.scheduler_host_subset_size, 1) * num_instances)
+        if CONF.scheduler_heap_placement and num_instances > 1:
+            selected_hosts = self._schedule_with_heap(hosts,
+                    filter_properties, instance_properties, num_instances,
+                    update_group_hosts)
+        else:
+            selected_hosts = self._schedule_with_sort(hosts,
+                    filter_properties, instance_properties, num_instances,
+                    update_group_hosts)
+
+        # The aggregate metadata loaded by the filters and the candidate
+        # limit are only valid for this request and must not be passed on
+        # to the compute host.
+        filter_properties.pop('aggregate_metadata', None)
+        filter_properties.pop('host_candidate_limit', None)
+        return selected_hosts
+
+    def _get_subset_size(self, num_hosts):
+        scheduler_host_subset_size = CONF.scheduler_host_subset_size
+        if scheduler_host_subset_size > num_hosts:
+            scheduler_host_subset_size = num_hosts
+        if scheduler_host_subset_size < 1:
+            scheduler_host_subset_size = 1
+        return scheduler_host_subset_size
+
+    def _schedule_with_sort(self, hosts, filter_properties,
+                            instance_properties, num_instances,
+                            update_group_hosts):
+        """Filter and weigh every host again for each instance."""
+        selected_hosts = []
         for num in xrange(num_instances):
             # Filter local hosts based on requirements ...
-            hosts = self.host_manager.get_filtered_hosts(hosts,
-                    filter_properties, index=num)
+            with request_stats.timed('filtering'):
+                hosts = self.host_manager.get_filtered_hosts(hosts,
+                        filter_properties, index=num)
             if not hosts:
                 # Can't get any more locally.
                 break
 
             LOG.debug(_("Filtered %(hosts)s"), {'hosts': hosts})
 
-            weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
-                    filter_properties)
+            with request_stats.timed('weighing'):
+                weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
+                        filter_properties)
 
             LOG.debug(_("Weighed %(hosts)s"), {'hosts': weighed_hosts})
 
-            scheduler_host_subset_size = CONF.scheduler_host_subset_size
-            if scheduler_host_subset_size > len(weighed_hosts):
-                scheduler_host_subset_size = len(weighed_hosts)
-            if scheduler_host_subset_size < 1:
-                scheduler_host_subset_size = 1
-
+            scheduler_host_subset_size = self._get_subset_size(
+                    len(weighed_hosts))
             chosen_host = random.choice(
                 weighed_hosts[0:scheduler_host_subset_size])
             selected_hosts.append(chosen_host)
 
             # Now consume the resources so the filter/weights
             # will change for the next instance.
-            chosen_host.obj.consume_from_instance(instance_properties)
+            with request_stats.timed('consume'):
+                chosen_host.obj.consume_from_instance(instance_properties)
+            if update_group_hosts is True:
+                filter_properties['group_hosts'].append(chosen_host.obj.host)
+        return selected_hosts
+
+    def _schedule_with_heap(self, hosts, filter_properties,
+                            instance_properties, num_instances,
+                            update_group_hosts):
+        """Filter and weigh every host once, then keep the weighed hosts
+        in a priority queue.
+
+        Only the state of the chosen host changes between instances, so
+        only that host is weighed again and pushed back on the queue.  The
+        filters that run for every instance are checked again on a host
+        when it reaches the top of the queue; filters marked
+        run_filter_once_per_request are not run again.
+        """
+        with request_stats.timed('filtering'):
+            hosts = self.host_manager.get_filtered_hosts(hosts,
+                    filter_properties, index=0)
+        if not hosts:
+            return []
+
+        LOG.debug(_("Filtered %(hosts)s"), {'hosts': hosts})
+
+        # The position of a host in the filtered list breaks ties between
+        # equal weights the same way the stable sort of the weighers does.
+        order = dict((id(host), i) for i, host in enumerate(hosts))
+        with request_stats.timed('weighing'):
+            weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
+                    filter_properties)
+        heap = [(-weighed_host.weight, order[id(weighed_host.obj)],
+                 weighed_host) for weighed_host in weighed_hosts]
+        heapq.heapify(heap)
+
+        selected_hosts = []
+        for num in xrange(num_instances):
+            scheduler_host_subset_size = self._get_subset_size(len(heap))
+            candidates = []
+            while heap and len(candidates) < scheduler_host_subset_size:
+                entry = heapq.heappop(heap)
+                # Hosts are only dropped here, the rest of the queue still
+                # passes the filters it passed for the previous instance.
+                if num == 0:
+                    candidates.append(entry)
+                    continue
+                with request_stats.timed('filtering'):
+                    passes = self.host_manager.get_filtered_hosts(
+                            [entry[2].obj], filter_properties, index=num)
+                if passes:
+                    candidates.append(entry)
+            if not candidates:
+                # Can't get any more locally.
+                break
+
+            chosen = random.choice(candidates)
+            for entry in candidates:
+                if entry is not chosen:
+                    heapq.heappush(heap, entry)
+            chosen_host = chosen[2]
+            selected_hosts.append(chosen_host)
+
+            # Now consume the resources so the filter/weights
+            # will change for the next instance.
+            with request_stats.timed('consume'):
+                chosen_host.obj.consume_from_instance(instance_properties)
             if update_group_hosts is True:
                 filter_properties['group_hosts'].append(chosen_host.obj.host)
+
+            with request_stats.timed('weighing'):
+                reweighed_host = self.host_manager.get_weighed_hosts(
+                        [chosen_host.obj], filter_properties)[0]
+            heapq.heappush(heap, (-reweighed_host.weight, chosen[1],
+                                  reweighed_host))
         return selected_hosts
 
     def _get_compute_info(self, context, dest):
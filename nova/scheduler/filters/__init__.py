@@ -17,7 +17,33 @@
 Scheduler host filters
 """
 
+import time
+
+from oslo.config import cfg
+
 from nova import filters
+from nova.openstack.common.gettextutils import _
+from nova.openstack.common import local
+from nova.openstack.common import log as logging
+from nova.scheduler import host_table
+
+host_filter_opts = [
+    cfg.BoolOpt('scheduler_adaptive_filters',
+                default=False,
+                help='Pass each host through all the filters at once, '
+                     'running first the filters which are cheap and reject '
+                     'many hosts according to their cost and pass rate in '
+                     'previous requests. Not used with '
+                     'scheduler_use_host_table'),
+    ]
+
+CONF = cfg.CONF
+CONF.register_opts(host_filter_opts)
+
+LOG = logging.getLogger(__name__)
+
+# Weight of the last request in the measured cost and pass rate of filters
+_COST_DECAY = 0.2
 
 
 class BaseHostFilter(filters.BaseFilter):
@@ -32,10 +58,155 @@ class BaseHostFilter(filters.BaseFilter):
         """
         raise NotImplementedError()
 
+    def host_table_passes(self, host_table, filter_properties):
+        """Return an array of booleans telling which hosts in the HostTable
+        pass the filter, or None if the filter can only check hosts one at
+        a time.  Override this in a subclass.
+        """
+        return None
+
+
+def _filters_each_host(filter):
+    """Return True if the filter only looks at one host at a time."""
+    return (type(filter).filter_all.__func__ is
+            filters.BaseFilter.filter_all.__func__)
+
 
 class HostFilterHandler(filters.BaseFilterHandler):
     def __init__(self):
         super(HostFilterHandler, self).__init__(BaseHostFilter)
+        # Filter class name -> [seconds per host, pass rate]
+        self.filter_costs = {}
+
+    def get_filtered_objects(self, filter_classes, objs,
+            filter_properties, index=0):
+        if host_table.is_enabled():
+            return self._get_filtered_host_table(filter_classes, objs,
+                    filter_properties, index)
+        if CONF.scheduler_adaptive_filters:
+            return self._get_filtered_adaptive(filter_classes, objs,
+                    filter_properties, index)
+        return super(HostFilterHandler, self).get_filtered_objects(
+                filter_classes, objs, filter_properties, index)
+
+    def _filter_rank(self, filter):
+        """Filters with a lower rank are run first.
+
+        Running the filters by increasing cost / (1 - pass rate) minimizes
+        the expected cost of rejecting a host.  Filters which were not
+        measured yet are run first, in their configured order.
+        """
+        cost = self.filter_costs.get(type(filter).__name__)
+        if cost is None:
+            return 0.0
+        seconds, pass_rate = cost
+        if pass_rate >= 1.0:
+            return float('inf')
+        return seconds / (1.0 - pass_rate)
+
+    def _update_filter_cost(self, cls_name, elapsed, hosts_in, hosts_out):
+        seconds = elapsed / hosts_in
+        pass_rate = float(hosts_out) / hosts_in
+        cost = self.filter_costs.get(cls_name)
+        if cost is not None:
+            seconds = (1 - _COST_DECAY) * cost[0] + _COST_DECAY * seconds
+            pass_rate = (1 - _COST_DECAY) * cost[1] + _COST_DECAY * pass_rate
+        self.filter_costs[cls_name] = [seconds, pass_rate]
+
+    def _get_filtered_adaptive(self, filter_classes, objs,
+            filter_properties, index):
+        """Stream the hosts through the filters ordered by _filter_rank(),
+        each host stopping at the first filter it fails.
+
+        Filters overriding filter_all() need the whole host list and are
+        run on it first, in their configured order.  If filter_properties
+        has a host_candidate_limit, filtering stops once that many hosts
+        passed, leaving the other hosts out of the weighing.
+        """
+        request_stats = getattr(local.store, 'request_stats', None)
+        host_filters = []
+        hosts = objs
+        for filter_cls in filter_classes:
+            filter = filter_cls()
+            if not filter.run_filter_for_index(index):
+                continue
+            if _filters_each_host(filter):
+                host_filters.append(filter)
+                continue
+            hosts = list(hosts)
+            objs = filter.filter_all(hosts, filter_properties)
+            if objs is None:
+                LOG.debug(_("Filter %(cls_name)s says to stop filtering"),
+                          {'cls_name': filter_cls.__name__})
+                return
+            hosts = list(objs)
+        host_filters.sort(key=self._filter_rank)
+
+        limit = filter_properties.get('host_candidate_limit')
+        # Hosts in, hosts out and time spent per filter
+        counters = [[0, 0, 0.0] for filter in host_filters]
+        passed_hosts = []
+        for host in hosts:
+            for filter, counter in zip(host_filters, counters):
+                start = time.time()
+                passes = filter._filter_one(host, filter_properties)
+                counter[2] += time.time() - start
+                counter[0] += 1
+                if not passes:
+                    break
+                counter[1] += 1
+            else:
+                passed_hosts.append(host)
+                if limit and len(passed_hosts) >= limit:
+                    break
+
+        for filter, (hosts_in, hosts_out, elapsed) in zip(host_filters,
+                                                          counters):
+            if not hosts_in:
+                continue
+            cls_name = type(filter).__name__
+            LOG.debug(_("Filter %(cls_name)s passed %(hosts_out)d of "
+                        "%(hosts_in)d host(s)"),
+                      {'cls_name': cls_name, 'hosts_out': hosts_out,
+                       'hosts_in': hosts_in})
+            self._update_filter_cost(cls_name, elapsed, hosts_in, hosts_out)
+            if request_stats is not None:
+                request_stats.add_filter(cls_name, elapsed, hosts_in,
+                                         hosts_out)
+        return passed_hosts
+
+    def _get_filtered_host_table(self, filter_classes, objs,
+            filter_properties, index):
+        table = host_table.HostTable(objs)
+        LOG.debug(_("Starting with %d host(s)"), len(table))
+        request_stats = getattr(local.store, 'request_stats', None)
+        for filter_cls in filter_classes:
+            cls_name = filter_cls.__name__
+            filter = filter_cls()
+
+            if filter.run_filter_for_index(index):
+                start = time.time()
+                hosts_in = len(table)
+                mask = filter.host_table_passes(table, filter_properties)
+                if mask is not None:
+                    table = table.select(mask)
+                else:
+                    objs = filter.filter_all(table.host_states,
+                                             filter_properties)
+                    if objs is None:
+                        LOG.debug(_("Filter %(cls_name)s says to stop "
+                                    "filtering"), {'cls_name': cls_name})
+                        return
+                    table = table.select_host_states(list(objs))
+                if request_stats is not None:
+                    request_stats.add_filter(cls_name, time.time() - start,
+                                             hosts_in, len(table))
+                LOG.debug(_("Filter %(cls_name)s returned "
+                            "%(obj_len)d host(s)"),
+                          {'cls_name': cls_name, 'obj_len': len(table)})
+                if len(table) == 0:
+                    break
+        return table.host_states
 
 
 def all_filters():
@@ -28,6 +28,30 @@ LOG = logging.getLogger(__name__)
 class AffinityFilter(filters.BaseHostFilter):
     def __init__(self):
         self.compute_api = compute.API()
+        self._affinity_hosts = {}
+
+    def _get_affinity_uuids(self, filter_properties, hint):
+        scheduler_hints = filter_properties.get('scheduler_hints') or {}
+
+        affinity_uuids = scheduler_hints.get(hint, [])
+        if isinstance(affinity_uuids, basestring):
+            affinity_uuids = [affinity_uuids]
+        return affinity_uuids
+
+    def _get_affinity_hosts(self, context, affinity_uuids):
+        """Returns the set of hosts running the given instances.
+
+        The instances are looked up with a single query the first time and
+        the result is reused for every host checked by this filter.
+        """
+        key = tuple(sorted(affinity_uuids))
+        if key not in self._affinity_hosts:
+            instances = self.compute_api.get_all(context,
+                                                 {'uuid': affinity_uuids,
+                                                  'deleted': False})
+            self._affinity_hosts[key] = set(instance['host']
+                                            for instance in instances)
+        return self._affinity_hosts[key]
 
 
 class DifferentHostFilter(AffinityFilter):
@@ -37,17 +61,12 @@ class DifferentHostFilter(AffinityFilter):
     run_filter_once_per_request = True
 
     def host_passes(self, host_state, filter_properties):
-        context = filter_properties['context']
-        scheduler_hints = filter_properties.get('scheduler_hints') or {}
-
-        affinity_uuids = scheduler_hints.get('different_host', [])
-        if isinstance(affinity_uuids, basestring):
-            affinity_uuids = [affinity_uuids]
+        affinity_uuids = self._get_affinity_uuids(filter_properties,
+                                                  'different_host')
         if affinity_uuids:
-            return not self.compute_api.get_all(context,
-                                                {'host': host_state.host,
-                                                 'uuid': affinity_uuids,
-                                                 'deleted': False})
+            affinity_hosts = self._get_affinity_hosts(
+                    filter_properties['context'], affinity_uuids)
+            return host_state.host not in affinity_hosts
         # With no different_host key
         return True
 
@@ -61,16 +80,12 @@ class SameHostFilter(AffinityFilter):
     run_filter_once_per_request = True
 
     def host_passes(self, host_state, filter_properties):
-        context = filter_properties['context']
-        scheduler_hints = filter_properties.get('scheduler_hints') or {}
-
-        affinity_uuids = scheduler_hints.get('same_host', [])
-        if isinstance(affinity_uuids, basestring):
-            affinity_uuids = [affinity_uuids]
+        affinity_uuids = self._get_affinity_uuids(filter_properties,
+                                                  'same_host')
         if affinity_uuids:
-            return self.compute_api.get_all(context, {'host': host_state.host,
-                                                      'uuid': affinity_uuids,
-                                                      'deleted': False})
+            affinity_hosts = self._get_affinity_hosts(
+                    filter_properties['context'], affinity_uuids)
+            return host_state.host in affinity_hosts
         # With no same_host key
         return True
 
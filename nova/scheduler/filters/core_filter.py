@@ -17,10 +17,10 @@
 
 from oslo.config import cfg
 
-from nova import db
 from nova.openstack.common.gettextutils import _
 from nova.openstack.common import log as logging
 from nova.scheduler import filters
+from nova.scheduler.filters import utils
 
 LOG = logging.getLogger(__name__)
 
@@ -70,6 +70,28 @@ class CoreFilter(BaseCoreFilter):
     def _get_cpu_allocation_ratio(self, host_state, filter_properties):
         return CONF.cpu_allocation_ratio
 
+    def host_table_passes(self, host_table, filter_properties):
+        """Return the hosts that have sufficient CPU cores."""
+        instance_type = filter_properties.get('instance_type')
+        if not instance_type:
+            return [True] * len(host_table)
+
+        vcpus_total = host_table.column('vcpus_total')
+        # Fail safe for hosts with no VCPUs set
+        broken = vcpus_total == 0
+        if broken.any():
+            LOG.warning(_("VCPUs not set; assuming CPU collection broken"))
+
+        vcpus_limit = vcpus_total * CONF.cpu_allocation_ratio
+        passes = broken | (vcpus_limit - host_table.column('vcpus_used') >=
+                           instance_type['vcpus'])
+
+        # Only provide a VCPU limit to compute if the virt driver is reporting
+        # an accurate count of installed VCPUs. (XenServer driver does not)
+        for i in (passes & (vcpus_limit > 0)).nonzero()[0]:
+            host_table.host_states[i].limits['vcpu'] = float(vcpus_limit[i])
+        return passes
+
 
 class AggregateCoreFilter(BaseCoreFilter):
     """AggregateCoreFilter with per-aggregate CPU subscription flag.
@@ -78,12 +100,9 @@ class AggregateCoreFilter(BaseCoreFilter):
     """
 
     def _get_cpu_allocation_ratio(self, host_state, filter_properties):
-        context = filter_properties['context'].elevated()
-        # TODO(uni): DB query in filter is a performance hit, especially for
-        # system with lots of hosts. Will need a general solution here to fix
-        # all filters with aggregate DB call things.
-        metadata = db.aggregate_metadata_get_by_host(
-                     context, host_state.host, key='cpu_allocation_ratio')
+        metadata = utils.aggregate_metadata_get_by_host(
+                     host_state, filter_properties,
+                     key='cpu_allocation_ratio')
         aggregate_vals = metadata.get('cpu_allocation_ratio', set())
         num_values = len(aggregate_vals)
 
@@ -55,3 +55,19 @@ class DiskFilter(filters.BaseHostFilter):
         disk_gb_limit = disk_mb_limit / 1024
         host_state.limits['disk_gb'] = disk_gb_limit
         return True
+
+    def host_table_passes(self, host_table, filter_properties):
+        """Filter based on disk usage."""
+        instance_type = filter_properties.get('instance_type')
+        requested_disk = 1024 * (instance_type['root_gb'] +
+                                 instance_type['ephemeral_gb'])
+
+        total_usable_disk_mb = host_table.column('total_usable_disk_gb') * 1024
+        disk_mb_limit = total_usable_disk_mb * CONF.disk_allocation_ratio
+        used_disk_mb = total_usable_disk_mb - host_table.column('free_disk_mb')
+        passes = disk_mb_limit - used_disk_mb >= requested_disk
+
+        for i in passes.nonzero()[0]:
+            host_table.host_states[i].limits['disk_gb'] = float(
+                    disk_mb_limit[i] / 1024)
+        return passes
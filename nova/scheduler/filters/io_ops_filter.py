@@ -45,3 +45,7 @@ class IoOpsFilter(filters.BaseHostFilter):
                         {'host_state': host_state,
                          'max_io_ops': max_io_ops})
         return passes
+
+    def host_table_passes(self, host_table, filter_properties):
+        max_io_ops = CONF.max_io_ops_per_host
+        return host_table.column('num_io_ops') < max_io_ops
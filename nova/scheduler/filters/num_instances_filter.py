@@ -42,3 +42,7 @@ class NumInstancesFilter(filters.BaseHostFilter):
                         {'host_state': host_state,
                          'max_instances': max_instances})
         return passes
+
+    def host_table_passes(self, host_table, filter_properties):
+        max_instances = CONF.max_instances_per_host
+        return host_table.column('num_instances') < max_instances
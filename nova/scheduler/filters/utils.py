@@ -0,0 +1,40 @@
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Utility methods shared by scheduler filters."""
+
+from nova import db
+
+
+def aggregate_metadata_get_by_host(host_state, filter_properties, key=None):
+    """Returns the aggregate metadata of a host, as returned by
+    db.aggregate_metadata_get_by_host.
+
+    The metadata of every host is loaded with a single query the first time
+    it is needed and kept in filter_properties['aggregate_metadata'] for the
+    rest of the request, so filters don't query the database once per host.
+    """
+    index = filter_properties.get('aggregate_metadata')
+    if index is None:
+        context = filter_properties['context'].elevated()
+        index = db.aggregate_metadata_get_all_by_hosts(context)
+        filter_properties['aggregate_metadata'] = index
+
+    metadata = index.get(host_state.host, {})
+    if key is None:
+        return metadata
+    if key in metadata:
+        return {key: metadata[key]}
+    return {}
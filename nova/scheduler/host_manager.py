@@ -52,6 +52,16 @@ host_manager_opts = [
     cfg.ListOpt('scheduler_weight_classes',
                 default=['nova.scheduler.weights.all_weighers'],
                 help='Which weight class names to use for weighing hosts'),
+    cfg.BoolOpt('scheduler_host_state_cache',
+                default=False,
+                help='Keep host states in memory between scheduling '
+                     'requests and only refresh the compute nodes that '
+                     'changed since the previous request'),
+    cfg.IntOpt('scheduler_host_state_resync_interval',
+               default=600,
+               help='Interval in seconds between full reloads of all '
+                    'compute nodes when scheduler_host_state_cache is '
+                    'enabled'),
     ]
 
 CONF = cfg.CONF
@@ -261,6 +271,10 @@ class HostManager(object):
         # { (host, hypervisor_hostname) : { <service> : { cap k : v }}}
         self.service_states = {}
         self.host_state_map = {}
+        # { compute_node_id : (host, hypervisor_hostname) }
+        self.compute_node_keys = {}
+        self._last_host_state_sync = None
+        self._last_full_host_state_sync = None
         self.filter_handler = filters.HostFilterHandler()
         self.filter_classes = self.filter_handler.get_matching_classes(
                 CONF.scheduler_available_filters)
@@ -391,42 +405,87 @@ class HostManager(object):
         capab_copy["timestamp"] = timeutils.utcnow()  # Reported time
         self.service_states[state_key] = capab_copy
 
-    def get_all_host_states(self, context):
-        """Returns a list of HostStates that represents all the hosts
-        the HostManager knows about. Also, each of the consumable resources
-        in HostState are pre-populated and adjusted based on data in the db.
-        """
+    def _update_host_state_from_compute(self, compute):
+        """Create or refresh the HostState for a compute node.
 
-        # Get resource usage across the available compute nodes:
+        Returns the (host, node) key of the HostState, or None if the
+        compute node has no service.
+        """
+        service = compute['service']
+        if not service:
+            LOG.warn(_("No service for compute ID %s") % compute['id'])
+            return None
+        host = service['host']
+        node = compute.get('hypervisor_hostname')
+        state_key = (host, node)
+        capabilities = self.service_states.get(state_key, None)
+        host_state = self.host_state_map.get(state_key)
+        if host_state:
+            host_state.update_capabilities(capabilities,
+                                           dict(service.iteritems()))
+        else:
+            host_state = self.host_state_cls(host, node,
+                    capabilities=capabilities,
+                    service=dict(service.iteritems()))
+            self.host_state_map[state_key] = host_state
+        host_state.update_from_compute_node(compute)
+        self.compute_node_keys[compute['id']] = state_key
+        return state_key
+
+    def _remove_host_state(self, state_key):
+        host, node = state_key
+        LOG.info(_("Removing dead compute node %(host)s:%(node)s "
+                   "from scheduler") % {'host': host, 'node': node})
+        del self.host_state_map[state_key]
+
+    def _sync_all_host_states(self, context):
+        """Load every compute node and rebuild the host state map."""
         compute_nodes = db.compute_node_get_all(context)
+        self.compute_node_keys = {}
         seen_nodes = set()
         for compute in compute_nodes:
-            service = compute['service']
-            if not service:
-                LOG.warn(_("No service for compute ID %s") % compute['id'])
-                continue
-            host = service['host']
-            node = compute.get('hypervisor_hostname')
-            state_key = (host, node)
-            capabilities = self.service_states.get(state_key, None)
-            host_state = self.host_state_map.get(state_key)
-            if host_state:
-                host_state.update_capabilities(capabilities,
-                                               dict(service.iteritems()))
-            else:
-                host_state = self.host_state_cls(host, node,
-                        capabilities=capabilities,
-                        service=dict(service.iteritems()))
-                self.host_state_map[state_key] = host_state
-            host_state.update_from_compute_node(compute)
-            seen_nodes.add(state_key)
+            state_key = self._update_host_state_from_compute(compute)
+            if state_key:
+                seen_nodes.add(state_key)
 
         # remove compute nodes from host_state_map if they are not active
         dead_nodes = set(self.host_state_map.keys()) - seen_nodes
         for state_key in dead_nodes:
-            host, node = state_key
-            LOG.info(_("Removing dead compute node %(host)s:%(node)s "
-                       "from scheduler") % {'host': host, 'node': node})
-            del self.host_state_map[state_key]
+            self._remove_host_state(state_key)
+
+    def _sync_changed_host_states(self, context, since):
+        """Refresh only the compute nodes changed since the last sync."""
+        compute_nodes = db.compute_node_get_all_changed_since(context, since)
+        for compute in compute_nodes:
+            if compute.get('deleted'):
+                state_key = self.compute_node_keys.pop(compute['id'], None)
+                if state_key in self.host_state_map:
+                    self._remove_host_state(state_key)
+                continue
+            self._update_host_state_from_compute(compute)
+
+    def get_all_host_states(self, context):
+        """Returns a list of HostStates that represents all the hosts
+        the HostManager knows about. Also, each of the consumable resources
+        in HostState are pre-populated and adjusted based on data in the db.
+
+        With scheduler_host_state_cache enabled only compute nodes changed
+        since the previous call are fetched, and a full reload happens every
+        scheduler_host_state_resync_interval seconds.
+        """
+        # Take the timestamp before querying so that rows written while the
+        # query runs are picked up by the next sync.
+        now = timeutils.utcnow()
+        if (CONF.scheduler_host_state_cache and
+                self._last_host_state_sync is not None and
+                not timeutils.is_older_than(
+                    self._last_full_host_state_sync,
+                    CONF.scheduler_host_state_resync_interval)):
+            self._sync_changed_host_states(context,
+                                           self._last_host_state_sync)
+        else:
+            self._sync_all_host_states(context)
+            self._last_full_host_state_sync = now
+        self._last_host_state_sync = now
 
         return self.host_state_map.itervalues()
@@ -0,0 +1,98 @@
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Columnar view of HostStates used to filter and weigh all hosts at once.
+
+Filters implementing host_table_passes() and weighers implementing
+_weigh_host_table() are run as NumPy array operations over a HostTable
+instead of once per host.  Other filters and weighers are still run on the
+individual HostStates.
+"""
+
+from oslo.config import cfg
+
+from nova.openstack.common.gettextutils import _
+from nova.openstack.common import log as logging
+
+numpy = None
+try:
+    import numpy
+except ImportError:
+    pass
+
+host_table_opts = [
+    cfg.BoolOpt('scheduler_use_host_table',
+                default=False,
+                help='Run the filters and weighers which support it as '
+                     'vectorized operations over a table of all hosts '
+                     'instead of once per host. Requires numpy'),
+    ]
+
+CONF = cfg.CONF
+CONF.register_opts(host_table_opts)
+
+LOG = logging.getLogger(__name__)
+
+
+def is_enabled():
+    """Return True if filters and weighers should use a HostTable."""
+    if not CONF.scheduler_use_host_table:
+        return False
+    if numpy is None:
+        LOG.warn(_('scheduler_use_host_table is set but numpy is not '
+                   'available, falling back to per host filtering'))
+        return False
+    return True
+
+
+class HostTable(object):
+    """A list of HostStates along with NumPy arrays of their attributes.
+
+    Columns are built from the HostStates the first time they are asked
+    for and are kept in step with the host list by select().
+    """
+
+    def __init__(self, host_states):
+        self.host_states = list(host_states)
+        self._columns = {}
+
+    def __len__(self):
+        return len(self.host_states)
+
+    def column(self, name):
+        """Return an array with the value of attribute `name` per host."""
+        if name not in self._columns:
+            self._columns[name] = numpy.fromiter(
+                    (getattr(host_state, name)
+                     for host_state in self.host_states),
+                    dtype=float, count=len(self.host_states))
+        return self._columns[name]
+
+    def select(self, mask):
+        """Return a new HostTable of the hosts where mask is True."""
+        indexes = numpy.flatnonzero(mask)
+        table = HostTable([self.host_states[i] for i in indexes])
+        for name, values in self._columns.iteritems():
+            table._columns[name] = values[indexes]
+        return table
+
+    def select_host_states(self, host_states):
+        """Return a new HostTable of the hosts in host_states."""
+        selected = set(id(host_state) for host_state in host_states)
+        mask = numpy.fromiter((id(host_state) in selected
+                               for host_state in self.host_states),
+                              dtype=bool, count=len(self.host_states))
+        return self.select(mask)
@@ -57,7 +57,7 @@ QUOTAS = quota.QUOTAS
 class SchedulerManager(manager.Manager):
     """Chooses a host to run instances on."""
 
-    RPC_API_VERSION = '2.7'
+    RPC_API_VERSION = '2.8'
 
     def __init__(self, scheduler_driver=None, *args, **kwargs):
         if not scheduler_driver:
@@ -288,3 +288,9 @@ class SchedulerManager(manager.Manager):
         dests = self.driver.select_destinations(context, request_spec,
             filter_properties)
         return jsonutils.to_primitive(dests)
+
+    def get_request_stats(self, context):
+        """Returns the time spent in the phases, filters and weighers of
+        the requests handled by this scheduler.
+        """
+        return jsonutils.to_primitive(self.driver.get_request_stats())
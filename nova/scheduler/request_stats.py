@@ -0,0 +1,180 @@
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Where the time of scheduling requests goes.
+
+A RequestStats records the time spent in each phase, filter and weigher of
+one scheduling request, the number of hosts going in and out of each filter
+and the number of database queries the request issued.  SchedulerStats adds
+up the RequestStats of every request since the scheduler started.
+"""
+
+import contextlib
+import time
+
+from oslo.config import cfg
+import sqlalchemy
+
+from nova.openstack.common.db.sqlalchemy import session as db_session
+from nova.openstack.common import local
+
+request_stats_opts = [
+    cfg.BoolOpt('scheduler_request_stats',
+                default=False,
+                help='Record the time spent in every phase, filter and '
+                     'weigher of scheduling requests and the database '
+                     'queries they issue. A scheduler.request.stats '
+                     'notification is sent for every request and the '
+                     'totals are reported by "nova-manage scheduler '
+                     'stats"'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(request_stats_opts)
+
+# The engine whose queries are counted
+_ENGINE = None
+
+
+def is_enabled():
+    return CONF.scheduler_request_stats
+
+
+def get_current():
+    """Return the RequestStats of the request of this greenthread, if it is
+    being timed.
+    """
+    return getattr(local.store, 'request_stats', None)
+
+
+def _count_query(*args):
+    request_stats = get_current()
+    if request_stats is not None:
+        request_stats.db_queries += 1
+
+
+def _listen_for_queries():
+    global _ENGINE
+    engine = db_session.get_engine()
+    if engine is not _ENGINE:
+        sqlalchemy.event.listen(engine, 'after_cursor_execute',
+                                _count_query)
+        _ENGINE = engine
+
+
+@contextlib.contextmanager
+def timed(phase):
+    """Add the time spent in the block to a phase of the current request,
+    if it is being timed.
+    """
+    request_stats = get_current()
+    if request_stats is None:
+        yield
+        return
+    start = time.time()
+    try:
+        yield
+    finally:
+        request_stats.add_phase(phase, time.time() - start)
+
+
+class RequestStats(object):
+    """Time spent in a single scheduling request."""
+
+    def __init__(self):
+        self.start = time.time()
+        self.elapsed = None
+        self.phases = {}
+        self.filters = {}
+        self.weighers = {}
+        self.db_queries = 0
+
+    def __enter__(self):
+        """Make this the current request of the greenthread until it is
+        done, recording its filters, weighers and database queries.
+        """
+        _listen_for_queries()
+        local.store.request_stats = self
+        return self
+
+    def __exit__(self, *exc_info):
+        del local.store.request_stats
+        self.elapsed = time.time() - self.start
+
+    def add_phase(self, phase, elapsed):
+        self.phases[phase] = self.phases.get(phase, 0.0) + elapsed
+
+    def add_filter(self, name, elapsed, hosts_in, hosts_out):
+        stats = self.filters.setdefault(name, {'calls': 0, 'time': 0.0,
+                                               'hosts_in': 0,
+                                               'hosts_out': 0})
+        stats['calls'] += 1
+        stats['time'] += elapsed
+        stats['hosts_in'] += hosts_in
+        stats['hosts_out'] += hosts_out
+
+    def add_weigher(self, name, elapsed, hosts):
+        stats = self.weighers.setdefault(name, {'calls': 0, 'time': 0.0,
+                                                'hosts': 0})
+        stats['calls'] += 1
+        stats['time'] += elapsed
+        stats['hosts'] += hosts
+
+    def to_dict(self):
+        return {'elapsed': self.elapsed,
+                'phases': self.phases,
+                'filters': self.filters,
+                'weighers': self.weighers,
+                'db_queries': self.db_queries}
+
+
+class SchedulerStats(object):
+    """Totals of the requests handled by a scheduler."""
+
+    def __init__(self):
+        self.requests = 0
+        self.elapsed = 0.0
+        self.max_elapsed = 0.0
+        self.db_queries = 0
+        self.phases = {}
+        self.filters = {}
+        self.weighers = {}
+
+    @staticmethod
+    def _add_counters(totals, counters):
+        for name, values in counters.iteritems():
+            total = totals.setdefault(name, dict.fromkeys(values, 0))
+            for key, value in values.iteritems():
+                total[key] += value
+
+    def add(self, request_stats):
+        self.requests += 1
+        self.elapsed += request_stats.elapsed
+        self.max_elapsed = max(self.max_elapsed, request_stats.elapsed)
+        self.db_queries += request_stats.db_queries
+        for phase, elapsed in request_stats.phases.iteritems():
+            self.phases[phase] = self.phases.get(phase, 0.0) + elapsed
+        self._add_counters(self.filters, request_stats.filters)
+        self._add_counters(self.weighers, request_stats.weighers)
+
+    def to_dict(self):
+        return {'requests': self.requests,
+                'elapsed': self.elapsed,
+                'max_elapsed': self.max_elapsed,
+                'db_queries': self.db_queries,
+                'phases': self.phases,
+                'filters': self.filters,
+                'weighers': self.weighers}
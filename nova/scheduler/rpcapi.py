@@ -21,6 +21,7 @@ Client side of the scheduler manager RPC API.
 from oslo.config import cfg
 
 from nova.openstack.common import jsonutils
+from nova.openstack.common import rpc
 import nova.openstack.common.rpc.proxy
 
 rpcapi_opts = [
@@ -69,6 +70,7 @@ class SchedulerAPI(nova.openstack.common.rpc.proxy.RpcProxy):
         handle the version_cap being set to 2.6.
 
         2.7 - Add select_destinations()
+        2.8 - Add get_request_stats()
     '''
 
     #
@@ -141,3 +143,10 @@ class SchedulerAPI(nova.openstack.common.rpc.proxy.RpcProxy):
                 request_spec=request_spec,
                 filter_properties=filter_properties),
                 version='2.6')
+
+    def get_request_stats(self, ctxt, host=None):
+        topic = None
+        if host:
+            topic = rpc.queue_get_for(ctxt, self.topic, host)
+        return self.call(ctxt, self.make_msg('get_request_stats'),
+                topic=topic, version='2.8')
@@ -17,8 +17,12 @@
 Scheduler host weights
 """
 
+import time
+
 from oslo.config import cfg
 
+from nova.openstack.common import local
+from nova.scheduler import host_table
 from nova import weights
 
 CONF = cfg.CONF
@@ -37,7 +41,13 @@ class WeighedHost(weights.WeighedObject):
 
 class BaseHostWeigher(weights.BaseWeigher):
     """Base class for host weights."""
-    pass
+
+    def _weigh_host_table(self, host_table, weight_properties):
+        """Override in a subclass to return an array with the weight of
+        every host in a HostTable.  Returning None means the weigher can
+        only weigh hosts one at a time.
+        """
+        return None
 
 
 class HostWeightHandler(weights.BaseWeightHandler):
@@ -46,6 +56,45 @@ class HostWeightHandler(weights.BaseWeightHandler):
     def __init__(self):
         super(HostWeightHandler, self).__init__(BaseHostWeigher)
 
+    def get_weighed_objects(self, weigher_classes, obj_list,
+            weighing_properties):
+        """Return a sorted (highest score first) list of WeighedHosts."""
+        if not host_table.is_enabled():
+            return super(HostWeightHandler, self).get_weighed_objects(
+                    weigher_classes, obj_list, weighing_properties)
+
+        if not obj_list:
+            return []
+
+        table = host_table.HostTable(obj_list)
+        totals = host_table.numpy.zeros(len(table))
+        request_stats = getattr(local.store, 'request_stats', None)
+        host_weighers = []
+        for weigher_cls in weigher_classes:
+            weigher = weigher_cls()
+            start = time.time()
+            table_weights = weigher._weigh_host_table(table,
+                                                      weighing_properties)
+            if table_weights is None:
+                host_weighers.append(weigher)
+                continue
+            totals += weigher._weight_multiplier() * table_weights
+            if request_stats is not None:
+                request_stats.add_weigher(weigher_cls.__name__,
+                                          time.time() - start, len(table))
+
+        weighed_objs = [self.object_class(obj, float(weight))
+                        for obj, weight in zip(table.host_states, totals)]
+        for weigher in host_weighers:
+            start = time.time()
+            weigher.weigh_objects(weighed_objs, weighing_properties)
+            if request_stats is not None:
+                request_stats.add_weigher(weigher.__class__.__name__,
+                                          time.time() - start,
+                                          len(weighed_objs))
+
+        return sorted(weighed_objs, key=lambda x: x.weight, reverse=True)
+
 
 def all_weighers():
     """Return a list of weight plugin classes found in this directory."""
@@ -24,17 +24,116 @@ from nova.servicegroup import api
 from nova import utils
 
 
+db_driver_opts = [
+    cfg.IntOpt('servicegroup_db_cache_ttl',
+               default=0,
+               help='Number of seconds the db servicegroup driver keeps the '
+                    'last heartbeats of all services in memory before '
+                    'loading them again, 0 disables the cache. This bounds '
+                    'how stale the answers may be, so it should be well '
+                    'below service_down_time'),
+    ]
+
 CONF = cfg.CONF
+CONF.register_opts(db_driver_opts)
 CONF.import_opt('service_down_time', 'nova.service')
 
 LOG = logging.getLogger(__name__)
 
 
+def _last_heartbeat(service_ref):
+    last_heartbeat = service_ref['updated_at'] or service_ref['created_at']
+    if isinstance(last_heartbeat, basestring):
+        # NOTE(russellb) If this service_ref came in over rpc via
+        # conductor, then the timestamp will be a string and needs to be
+        # converted back to a datetime.
+        last_heartbeat = timeutils.parse_strtime(last_heartbeat)
+    return last_heartbeat
+
+
+class LivenessCache(object):
+    """The last heartbeats of all services, loaded with a single query.
+
+    The heartbeats are loaded again once they are older than
+    servicegroup_db_cache_ttl, and the heartbeats reported by this
+    process are recorded as they are sent.  Whether each service is
+    disabled is kept along, so that disabled services are not listed as
+    members of their topic.
+    """
+
+    def __init__(self, conductor_api):
+        self.conductor_api = conductor_api
+        self._heartbeats = {}
+        self._loaded_at = None
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    def age(self):
+        """Return the number of seconds since the heartbeats were loaded."""
+        if self._loaded_at is None:
+            return None
+        return utils.total_seconds(timeutils.utcnow() - self._loaded_at)
+
+    def _load_if_stale(self):
+        age = self.age()
+        if age is not None and age <= CONF.servicegroup_db_cache_ttl:
+            return
+        ctxt = context.get_admin_context()
+        services = self.conductor_api.service_get_all(ctxt)
+        self._heartbeats = dict(((service['topic'], service['host']),
+                                 (_last_heartbeat(service),
+                                  service['disabled']))
+                                for service in services)
+        self._loaded_at = timeutils.utcnow()
+        self.loads += 1
+        LOG.debug(_('DB_Driver: loaded the heartbeats of %(count)d services, '
+                    'the previous ones were %(age)s seconds old'),
+                  {'count': len(self._heartbeats), 'age': age})
+
+    def update(self, service_ref):
+        """Record a heartbeat reported by this process."""
+        key = (service_ref['topic'], service_ref['host'])
+        self._heartbeats[key] = (_last_heartbeat(service_ref),
+                                 service_ref['disabled'])
+
+    def get_heartbeat(self, topic, host):
+        self._load_if_stale()
+        last_heartbeat, _disabled = self._heartbeats.get((topic, host),
+                                                         (None, None))
+        if last_heartbeat is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return last_heartbeat
+
+    def get_heartbeats(self, topic):
+        """Return the (host, last heartbeat) of every enabled service of a
+        topic, like service_get_all_by_topic() returns them.
+        """
+        self._load_if_stale()
+        self.hits += 1
+        return [(host, last_heartbeat)
+                for (service_topic, host), (last_heartbeat, disabled)
+                in self._heartbeats.iteritems()
+                if service_topic == topic and not disabled]
+
+    def get_stats(self):
+        return {'age': self.age(),
+                'services': len(self._heartbeats),
+                'hits': self.hits,
+                'misses': self.misses,
+                'loads': self.loads}
+
+
 class DbDriver(api.ServiceGroupDriver):
 
     def __init__(self, *args, **kwargs):
         self.db_allowed = kwargs.get('db_allowed', True)
         self.conductor_api = conductor.API(use_local=self.db_allowed)
+        self.cache = None
+        if CONF.servicegroup_db_cache_ttl > 0:
+            self.cache = LivenessCache(self.conductor_api)
 
     def join(self, member_id, group_id, service=None):
         """Join the given service with it's group."""
@@ -55,12 +154,18 @@ class DbDriver(api.ServiceGroupDriver):
         """Moved from nova.utils
         Check whether a service is up based on last heartbeat.
         """
-        last_heartbeat = service_ref['updated_at'] or service_ref['created_at']
-        if isinstance(last_heartbeat, basestring):
-            # NOTE(russellb) If this service_ref came in over rpc via
-            # conductor, then the timestamp will be a string and needs to be
-            # converted back to a datetime.
-            last_heartbeat = timeutils.parse_strtime(last_heartbeat)
+        if self.cache is not None and 'topic' in service_ref:
+            # A heartbeat newer than the one of service_ref may have been
+            # loaded already, but one older than it is not enough to tell
+            # that the service is down.
+            last_heartbeat = self.cache.get_heartbeat(service_ref['topic'],
+                                                      service_ref['host'])
+            if (last_heartbeat is not None and
+                    self._is_recent(last_heartbeat)):
+                return True
+        return self._is_recent(_last_heartbeat(service_ref))
+
+    def _is_recent(self, last_heartbeat):
         # Timestamps in DB are UTC.
         elapsed = utils.total_seconds(timeutils.utcnow() - last_heartbeat)
         LOG.debug('DB_Driver.is_up last_heartbeat = %(lhb)s elapsed = %(el)s',
@@ -72,6 +177,11 @@ class DbDriver(api.ServiceGroupDriver):
         Returns ALL members of the given group
         """
         LOG.debug(_('DB_Driver: get_all members of the %s group') % group_id)
+        if self.cache is not None:
+            return [host for host, last_heartbeat
+                    in self.cache.get_heartbeats(group_id)
+                    if self._is_recent(last_heartbeat)]
+
         rs = []
         ctxt = context.get_admin_context()
         services = self.conductor_api.service_get_all_by_topic(ctxt, group_id)
@@ -90,6 +200,8 @@ class DbDriver(api.ServiceGroupDriver):
 
             service.service_ref = self.conductor_api.service_update(ctxt,
                     service.service_ref, state_catalog)
+            if self.cache is not None:
+                self.cache.update(service.service_ref)
 
             # TODO(termie): make this pattern be more elegant.
             if getattr(service, 'model_disconnected', False):
@@ -31,6 +31,7 @@ if hasattr(boto.connection, 'HTTPResponse'):
 else:
     import httplib
 import fixtures
+import mox
 import webob
 
 from nova.api import auth
@@ -39,6 +40,7 @@ from nova.api.ec2 import apirequest
 from nova.api.ec2 import ec2utils
 from nova import block_device
 from nova import context
+from nova import db
 from nova import exception
 from nova.openstack.common import timeutils
 from nova import test
@@ -211,6 +213,50 @@ class Ec2utilsTestCase(test.TestCase):
         self.assertThat(block_device.mappings_prepend_dev(mappings),
                         matchers.DictListMatches(expected_result))
 
+    def test_lru_cache(self):
+        cache = ec2utils.LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(1, cache.get('a'))
+        cache.set('c', 3)
+        self.assertEqual(2, len(cache))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(3, cache.get('c'))
+
+    def test_get_int_ids_from_instance_uuids(self):
+        uuid1 = '00000000-0000-0000-0000-000000000001'
+        uuid2 = '00000000-0000-0000-0000-000000000002'
+        ec2utils.reset_cache()
+        self.addCleanup(ec2utils.reset_cache)
+        self.mox.StubOutWithMock(db, 'ec2_instance_ids_get_or_create')
+        db.ec2_instance_ids_get_or_create(
+                mox.IgnoreArg(), mox.SameElementsAs([uuid1, uuid2])
+                ).AndReturn({uuid1: 1, uuid2: 2})
+        self.mox.ReplayAll()
+
+        self.assertEqual({uuid1: 1, uuid2: 2},
+                         ec2utils.get_int_ids_from_instance_uuids(
+                                [uuid1, uuid2, None]))
+        # The mappings are served from the cache afterwards, both ways
+        self.assertEqual({uuid1: 1},
+                         ec2utils.get_int_ids_from_instance_uuids([uuid1]))
+        self.assertEqual('i-00000002', ec2utils.id_to_ec2_inst_id(uuid2))
+        self.assertEqual(uuid1, ec2utils.ec2_inst_id_to_uuid(
+                context.get_admin_context(), 'i-00000001'))
+
+    def test_memoize_without_lru_cache(self):
+        self.flags(ec2_id_mapping_cache_size=0)
+        ec2utils.reset_cache()
+        self.addCleanup(ec2utils.reset_cache)
+        self.mox.StubOutWithMock(db, 'get_volume_uuid_by_ec2_id')
+        db.get_volume_uuid_by_ec2_id(mox.IgnoreArg(), 3).AndReturn('uuid3')
+        self.mox.ReplayAll()
+
+        self.assertEqual('uuid3', ec2utils.ec2_vol_id_to_uuid('vol-00000003'))
+        self.assertEqual('uuid3', ec2utils.ec2_vol_id_to_uuid('vol-00000003'))
+        self.assertEqual(0, len(ec2utils._get_lru_cache()))
+
 
 class ApiEc2TestCase(test.TestCase):
     """Unit test for the cloud controller on an EC2 API."""
@@ -71,6 +71,10 @@ def fake_get_no_host_availability_zone(context, host):
     return None
 
 
+def fake_get_hosts_availability_zones(context, hosts):
+    return dict((host, host) for host in hosts)
+
+
 class ExtendedServerAttributesTest(test.TestCase):
     content_type = 'application/json'
     prefix = 'OS-EXT-AZ:'
@@ -83,6 +87,8 @@ class ExtendedServerAttributesTest(test.TestCase):
         self.stubs.Set(compute.api.API, 'get_all', fake_compute_get_all)
         self.stubs.Set(availability_zones, 'get_host_availability_zone',
                        fake_get_host_availability_zone)
+        self.stubs.Set(availability_zones, 'get_hosts_availability_zones',
+                       fake_get_hosts_availability_zones)
 
         self.flags(
             osapi_compute_extension=[
@@ -459,6 +459,19 @@ def fake_instance_get_all_by_filters(num_servers=5, **kwargs):
     return _return_servers
 
 
+def fake_instance_get_all_columns_by_filters(num_servers=5, **kwargs):
+    return_servers = fake_instance_get_all_by_filters(num_servers, **kwargs)
+
+    def _return_columns(context, filters, columns, limit=None, marker=None,
+                        **kwargs):
+        columns = set(columns) | set(['uuid'])
+        servers = return_servers(context, filters, limit=limit,
+                                 marker=marker)
+        return [dict((key, value) for key, value in server.iteritems()
+                     if key in columns) for server in servers]
+    return _return_columns
+
+
 def stub_instance(id, user_id=None, project_id=None, host=None,
                   node=None, vm_state=None, task_state=None,
                   reservation_id="", uuid=FAKE_UUID, image_ref="10",
@@ -97,6 +97,19 @@ class RequestTest(test.TestCase):
                  'uuid1': instances[1],
                  'uuid2': instances[2]})
 
+    def test_cache_and_retrieve_bdms(self):
+        request = wsgi.Request.blank('/foo')
+        self.assertEqual(request.get_db_bdms('uuid0'), None)
+        request.cache_db_bdms({'uuid0': [{'volume_id': 'vol0'}],
+                               'uuid1': []})
+        request.cache_db_bdms({'uuid2': [{'volume_id': 'vol2'}]})
+        self.assertEqual(request.get_db_bdms('uuid0'),
+                         [{'volume_id': 'vol0'}])
+        self.assertEqual(request.get_db_bdms('uuid1'), [])
+        self.assertEqual(request.get_db_bdms('uuid2'),
+                         [{'volume_id': 'vol2'}])
+        self.assertEqual(request.get_db_bdms('uuid3'), None)
+
 
 class ActionDispatcherTest(test.TestCase):
     def test_dispatch(self):
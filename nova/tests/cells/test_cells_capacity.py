@@ -0,0 +1,102 @@
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For cell capacities
+"""
+
+import random
+
+import testtools
+
+from nova.cells import capacity
+from nova import test
+
+
+def _compute_hosts(rand, count):
+    compute_hosts = {}
+    for i in range(count):
+        total_ram_mb = rand.choice([4096, 32768, 131072])
+        total_disk_mb = rand.choice([100, 500, 2000]) * 1024
+        compute_hosts['host%d' % i] = {
+                'free_ram_mb': rand.randint(-1024, total_ram_mb),
+                'free_disk_mb': rand.randint(-10, total_disk_mb / 1024) * 1024,
+                'total_ram_mb': total_ram_mb,
+                'total_disk_mb': total_disk_mb}
+    return compute_hosts
+
+
+def _instance_types():
+    # The same sizes twice, and a size of 0
+    return [{'memory_mb': memory_mb, 'root_gb': root_gb, 'ephemeral_gb': 0}
+            for memory_mb, root_gb in [(0, 0), (512, 1), (2048, 20),
+                                       (8192, 80), (512, 1), (3000, 7)]]
+
+
+@testtools.skipIf(capacity.numpy is None, "numpy not available")
+class CapacityTableTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(CapacityTableTestCase, self).setUp()
+        self.rand = random.Random(42)
+        self.table = capacity.CapacityTable()
+
+    def _assert_refresh(self, compute_hosts, instance_types, reserve_level):
+        self.assertEqual(
+                capacity.get_capacities(compute_hosts, instance_types,
+                                        reserve_level),
+                self.table.refresh(compute_hosts, instance_types,
+                                   reserve_level))
+
+    def test_refresh(self):
+        compute_hosts = _compute_hosts(self.rand, 50)
+        for reserve_level in (0.0, 0.1, 0.5, 1.0):
+            self._assert_refresh(compute_hosts, _instance_types(),
+                                 reserve_level)
+
+    def test_refresh_changed_hosts(self):
+        compute_hosts = _compute_hosts(self.rand, 50)
+        instance_types = _instance_types()
+        self._assert_refresh(compute_hosts, instance_types, 0.1)
+        self.assertEqual(50, self.table.rows_computed)
+
+        self._assert_refresh(compute_hosts, instance_types, 0.1)
+        self.assertEqual(50, self.table.rows_computed)
+
+        compute_hosts['host3']['free_ram_mb'] -= 2048
+        compute_hosts['host7']['free_disk_mb'] = 0
+        self._assert_refresh(compute_hosts, instance_types, 0.1)
+        self.assertEqual(52, self.table.rows_computed)
+
+    def test_refresh_rebuilds(self):
+        compute_hosts = _compute_hosts(self.rand, 10)
+        instance_types = _instance_types()
+        self._assert_refresh(compute_hosts, instance_types, 0.1)
+
+        del compute_hosts['host5']
+        self._assert_refresh(compute_hosts, instance_types, 0.1)
+        self.assertEqual(19, self.table.rows_computed)
+
+        instance_types.pop()
+        self._assert_refresh(compute_hosts, instance_types, 0.1)
+        self.assertEqual(28, self.table.rows_computed)
+
+        self._assert_refresh(compute_hosts, instance_types, 0.2)
+        self.assertEqual(37, self.table.rows_computed)
+
+    def test_is_enabled(self):
+        self.assertFalse(capacity.is_enabled())
+        self.flags(vectorized_capacity=True, group='cells')
+        self.assertTrue(capacity.is_enabled())
+        self.stubs.Set(capacity, 'numpy', None)
+        self.assertFalse(capacity.is_enabled())
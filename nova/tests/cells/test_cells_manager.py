@@ -23,6 +23,7 @@ from oslo.config import cfg
 from nova.cells import messaging
 from nova.cells import utils as cells_utils
 from nova import context
+from nova import exception
 from nova.openstack.common import rpc
 from nova.openstack.common import timeutils
 from nova import test
@@ -428,6 +429,20 @@ class CellsManagerClassTestCase(test.TestCase):
                 hypervisor_match='fake-match')
         self.assertEqual(expected_response, response)
 
+    def test_compute_node_get_all_partial(self):
+        self.flags(broadcast_cell_timeout=10, group='cells')
+        responses = [messaging.Response('path!to!cell0',
+                                        [dict(id=1)], False),
+                     messaging.Response('path!to!cell1',
+                                        exception.CellTimeout(), True)]
+        self.mox.StubOutWithMock(self.msg_runner,
+                                 'compute_node_get_all')
+        self.msg_runner.compute_node_get_all(self.ctxt,
+                hypervisor_match=None).AndReturn(responses)
+        self.mox.ReplayAll()
+        response = self.cells_manager.compute_node_get_all(self.ctxt)
+        self.assertEqual([dict(id='path!to!cell0@1')], response)
+
     def test_compute_node_stats(self):
         raw_resp1 = {'key1': 1, 'key2': 2}
         raw_resp2 = {'key2': 1, 'key3': 2}
@@ -15,6 +15,8 @@
 Tests For Cells Messaging module
 """
 
+from eventlet import greenthread
+import mox
 from oslo.config import cfg
 
 from nova.cells import messaging
@@ -1359,6 +1361,85 @@ class CellsBroadcastMethodsTestCase(test.TestCase):
 
         self.src_msg_runner.instance_update_at_top(self.ctxt, fake_instance)
 
+    def test_instance_update_batch_at_top(self):
+        self.flags(instance_update_batch_interval=2, group='cells')
+        sends = []
+        self.stubs.Set(greenthread, 'spawn_after',
+                       lambda seconds, func: sends.append((seconds, func)))
+
+        batches = []
+
+        def fake_instance_update_batch(ctxt, updates):
+            batches.append(sorted(updates,
+                                  key=lambda update: update['instance_uuid']))
+            return {'uuid2': exception.InstanceNotFound(instance_id='uuid2'),
+                    'uuid3': exception.UnexpectedVMStateError(
+                        actual='active', expected=['building', None])}
+
+        # To show these should not be called in src/mid-level cell
+        self.mox.StubOutWithMock(self.src_db_inst, 'instance_update')
+        self.mox.StubOutWithMock(self.mid_db_inst, 'instance_update_batch')
+        self.stubs.Set(self.tgt_db_inst, 'instance_update_batch',
+                       fake_instance_update_batch)
+        self.mox.StubOutWithMock(self.tgt_db_inst, 'instance_create')
+        self.mox.StubOutWithMock(self.tgt_db_inst,
+                                 'instance_info_cache_update')
+        self.tgt_db_inst.instance_create(mox.IgnoreArg(), mox.IgnoreArg())
+        self.tgt_db_inst.instance_info_cache_update(mox.IgnoreArg(), 'uuid2',
+                                                    {'other': 'moo'})
+        self.mox.ReplayAll()
+
+        self.src_msg_runner.instance_update_at_top(
+                self.ctxt, {'uuid': 'uuid1', 'vm_state': vm_states.BUILDING,
+                            'host': 'host1'})
+        self.src_msg_runner.instance_update_at_top(
+                self.ctxt, {'uuid': 'uuid2', 'id': 2,
+                            'info_cache': {'id': 1, 'other': 'moo'}})
+        self.src_msg_runner.instance_update_at_top(
+                self.ctxt, {'uuid': 'uuid1', 'vm_state': vm_states.ACTIVE})
+        self.src_msg_runner.instance_update_at_top(
+                self.ctxt, {'uuid': 'uuid3', 'vm_state': vm_states.BUILDING})
+        self.assertEqual([(2, self.src_msg_runner._send_instance_updates)],
+                         sends)
+        self.assertEqual([], batches)
+
+        self.src_msg_runner._send_instance_updates()
+
+        expected_cell_name = 'api-cell!child-cell2!grandchild-cell1'
+        self.assertEqual([[{'instance_uuid': 'uuid1',
+                            'values': {'uuid': 'uuid1',
+                                       'vm_state': vm_states.ACTIVE,
+                                       'host': 'host1',
+                                       'cell_name': expected_cell_name},
+                            'info_cache': None},
+                           {'instance_uuid': 'uuid2',
+                            'values': {'uuid': 'uuid2',
+                                       'cell_name': expected_cell_name},
+                            'info_cache': {'other': 'moo'}},
+                           {'instance_uuid': 'uuid3',
+                            'values': {'uuid': 'uuid3',
+                                       'vm_state': vm_states.BUILDING,
+                                       'expected_vm_state': [
+                                           vm_states.BUILDING, None],
+                                       'cell_name': expected_cell_name},
+                            'info_cache': None}]], batches)
+        self.assertEqual({}, self.src_msg_runner.pending_instance_updates)
+
+    def test_instance_destroy_at_top_drops_pending_update(self):
+        self.flags(instance_update_batch_interval=2, group='cells')
+        self.stubs.Set(greenthread, 'spawn_after',
+                       lambda seconds, func: None)
+        self.mox.StubOutWithMock(self.tgt_db_inst, 'instance_destroy')
+        self.tgt_db_inst.instance_destroy(self.ctxt, 'fake_uuid',
+                                          update_cells=False)
+        self.mox.ReplayAll()
+
+        self.src_msg_runner.instance_update_at_top(
+                self.ctxt, {'uuid': 'fake_uuid', 'host': 'fake_host'})
+        self.src_msg_runner.instance_destroy_at_top(self.ctxt,
+                                                    {'uuid': 'fake_uuid'})
+        self.assertEqual({}, self.src_msg_runner.pending_instance_updates)
+
     def test_instance_destroy_at_top(self):
         fake_instance = {'uuid': 'fake_uuid'}
 
@@ -1609,6 +1690,71 @@ class CellsBroadcastMethodsTestCase(test.TestCase):
                     ('api-cell', [1, 2])]
         self.assertEqual(expected, response_values)
 
+    def test_compute_node_get_all_streamed(self):
+        self.flags(broadcast_cell_timeout=10, group='cells')
+        # Reset this, as this is a broadcast down.
+        self._setup_attrs(up=False)
+
+        ctxt = self.ctxt.elevated()
+
+        self.mox.StubOutWithMock(self.src_db_inst, 'compute_node_get_all')
+        self.mox.StubOutWithMock(self.mid_db_inst, 'compute_node_get_all')
+        self.mox.StubOutWithMock(self.tgt_db_inst, 'compute_node_get_all')
+
+        self.src_db_inst.compute_node_get_all(ctxt).AndReturn([1, 2])
+        self.mid_db_inst.compute_node_get_all(ctxt).AndReturn([3])
+        self.tgt_db_inst.compute_node_get_all(ctxt).AndReturn([4, 5])
+
+        self.mox.ReplayAll()
+
+        responses = self.src_msg_runner.compute_node_get_all(ctxt)
+        response_values = [(resp.cell_name, resp.value_or_raise())
+                           for resp in responses]
+        expected = [('api-cell!child-cell2!grandchild-cell1', [4, 5]),
+                    ('api-cell!child-cell2', [3]),
+                    ('api-cell', [1, 2])]
+        self.assertEqual(expected, response_values)
+
+        src_stats = self.src_msg_runner.get_broadcast_stats()
+        self.assertEqual(['child-cell2'], src_stats.keys())
+        self.assertEqual(1, src_stats['child-cell2']['responses'])
+        self.assertEqual(0, src_stats['child-cell2']['timeouts'])
+        self.assertTrue(src_stats['child-cell2']['bytes'] > 0)
+        mid_stats = self.mid_msg_runner.get_broadcast_stats()
+        self.assertEqual(1, mid_stats['grandchild-cell1']['responses'])
+        self.assertTrue(src_stats['child-cell2']['bytes'] >
+                        mid_stats['grandchild-cell1']['bytes'])
+
+    def test_compute_node_get_all_streamed_timeout(self):
+        self.flags(broadcast_cell_timeout=0.2, group='cells')
+        # Reset this, as this is a broadcast down.
+        self._setup_attrs(up=False)
+
+        ctxt = self.ctxt.elevated()
+        # The grandchild cell never gets the message
+        grandchild = self.mid_msg_runner.state_manager.get_child_cell(
+                'grandchild-cell1')
+        self.stubs.Set(grandchild, 'send_message', lambda message: None)
+
+        self.mox.StubOutWithMock(self.src_db_inst, 'compute_node_get_all')
+        self.mox.StubOutWithMock(self.mid_db_inst, 'compute_node_get_all')
+        self.src_db_inst.compute_node_get_all(ctxt).AndReturn([1, 2])
+        self.mid_db_inst.compute_node_get_all(ctxt).AndReturn([3])
+        self.mox.ReplayAll()
+
+        responses = self.src_msg_runner.compute_node_get_all(ctxt)
+        responses = dict((resp.cell_name, resp) for resp in responses)
+        self.assertEqual(3, len(responses))
+        self.assertEqual([1, 2], responses['api-cell'].value_or_raise())
+        self.assertEqual([3],
+                         responses['api-cell!child-cell2'].value_or_raise())
+        self.assertRaises(exception.CellTimeout,
+                responses['api-cell!child-cell2!grandchild-cell1'].
+                value_or_raise)
+        mid_stats = self.mid_msg_runner.get_broadcast_stats()
+        self.assertEqual(1, mid_stats['grandchild-cell1']['timeouts'])
+        self.assertEqual(0, mid_stats['grandchild-cell1']['responses'])
+
     def test_compute_node_get_all_with_hyp_match(self):
         # Reset this, as this is a broadcast down.
         self._setup_attrs(up=False)
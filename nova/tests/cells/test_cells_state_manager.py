@@ -16,6 +16,9 @@
 Tests For CellStateManager
 """
 
+import testtools
+
+from nova.cells import capacity
 from nova.cells import state
 from nova import db
 from nova.db.sqlalchemy import models
@@ -132,6 +135,20 @@ class TestCellsStateManager(test.TestCase):
         return my_state.capacities
 
 
+@testtools.skipIf(capacity.numpy is None, "numpy not available")
+class TestCellsStateManagerVectorized(TestCellsStateManager):
+    def setUp(self):
+        super(TestCellsStateManagerVectorized, self).setUp()
+        self.flags(vectorized_capacity=True, group='cells')
+
+    def test_capacity_table_kept(self):
+        state_manager = self._get_state_manager()
+        table = state_manager._capacity_table
+        state_manager._update_our_capacity()
+        self.assertIs(table, state_manager._capacity_table)
+        self.assertEqual(len(FAKE_COMPUTES), table.rows_computed)
+
+
 class TestCellsGetCapacity(TestCellsStateManager):
     def setUp(self):
         super(TestCellsGetCapacity, self).setUp()
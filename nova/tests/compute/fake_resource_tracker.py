@@ -24,7 +24,7 @@ class FakeResourceTracker(resource_tracker.ResourceTracker):
     def _create(self, context, values):
         self.compute_node = values
 
-    def _update(self, context, values, prune_stats=False):
+    def _update(self, context, values, prune_stats=False, heartbeat=False):
         self.compute_node.update(values)
 
     def _get_service(self, context):
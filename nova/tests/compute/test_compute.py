@@ -5100,20 +5100,33 @@ class ComputeTestCase(BaseTestCase):
 
     def test_sync_power_states(self):
         ctxt = self.context.elevated()
-        self._create_fake_instance({'host': self.compute.host})
-        self._create_fake_instance({'host': self.compute.host})
+        instance1 = self._create_fake_instance({'host': self.compute.host})
+        instance2 = self._create_fake_instance({'host': self.compute.host})
+        self._create_fake_instance({'host': self.compute.host,
+                                    'task_state': task_states.REBOOTING})
         self.mox.StubOutWithMock(self.compute.driver, 'get_info')
-        self.mox.StubOutWithMock(self.compute, '_sync_instance_power_state')
-        self.compute.driver.get_info(mox.IgnoreArg()).AndReturn(
-            {'state': power_state.RUNNING})
-        self.compute._sync_instance_power_state(ctxt, mox.IgnoreArg(),
-                                                power_state.RUNNING)
-        self.compute.driver.get_info(mox.IgnoreArg()).AndReturn(
-            {'state': power_state.SHUTDOWN})
-        self.compute._sync_instance_power_state(ctxt, mox.IgnoreArg(),
-                                                power_state.SHUTDOWN)
+        self.mox.StubOutWithMock(self.compute.driver, 'get_power_states')
+
+        def _check_instances(instances):
+            return (sorted(inst['uuid'] for inst in instances) ==
+                    sorted([instance1['uuid'], instance2['uuid']]))
+
+        self.compute.driver.get_power_states(
+            mox.Func(_check_instances)).AndReturn(
+                {instance1['uuid']: power_state.SHUTDOWN})
         self.mox.ReplayAll()
+
+        synced = {}
+
+        def fake_sync_instance_power_state(context, db_instance,
+                                           vm_power_state):
+            synced[db_instance['uuid']] = vm_power_state
+
+        self.stubs.Set(self.compute, '_sync_instance_power_state',
+                       fake_sync_instance_power_state)
         self.compute._sync_power_states(ctxt)
+        self.assertEqual({instance1['uuid']: power_state.SHUTDOWN,
+                          instance2['uuid']: power_state.NOSTATE}, synced)
 
     def _test_lifecycle_event(self, lifecycle_event, power_state):
         instance = self._create_fake_instance()
@@ -6550,6 +6563,17 @@ class ComputeAPITestCase(BaseTestCase):
         db.instance_destroy(c, instance2['uuid'])
         db.instance_destroy(c, instance3['uuid'])
 
+    def test_get_all_with_columns(self):
+        # Test loading only some columns of the instances.
+        c = context.get_admin_context()
+        instance1 = self._create_fake_instance({'display_name': 'woot'})
+        self._create_fake_instance({'display_name': 'not-woot'})
+
+        instances = self.compute_api.get_all(c,
+                search_opts={'name': '^woo.*'}, columns=['display_name'])
+        self.assertEqual([{'uuid': instance1['uuid'],
+                           'display_name': 'woot'}], instances)
+
     def test_get_all_by_multiple_options_at_once(self):
         # Test searching by multiple options at once.
         c = context.get_admin_context()
@@ -8014,6 +8038,28 @@ class ComputeAPITestCase(BaseTestCase):
         self.assertEqual(expected,
                          self.compute_api.get_instance_bdms({}, instance))
 
+    def test_get_instances_bdms(self):
+        bdms = [{'instance_uuid': 'uuid1', 'device_name': 'vda'},
+                {'instance_uuid': 'uuid2', 'device_name': 'vda'},
+                {'instance_uuid': 'uuid1', 'device_name': 'vdb'}]
+        self.mox.StubOutWithMock(self.compute_api.db,
+                       'block_device_mapping_get_all_by_instance_uuids')
+        self.compute_api.db.block_device_mapping_get_all_by_instance_uuids(
+                {}, mox.SameElementsAs(['uuid1', 'uuid2', 'uuid3'])
+                ).AndReturn(bdms)
+        self.mox.StubOutWithMock(block_device, 'legacy_mapping')
+        block_device.legacy_mapping([bdms[0], bdms[2]]).InAnyOrder(
+                ).AndReturn('legacy1')
+        block_device.legacy_mapping([bdms[1]]).InAnyOrder(
+                ).AndReturn('legacy2')
+        block_device.legacy_mapping([]).InAnyOrder().AndReturn('legacy3')
+        self.mox.ReplayAll()
+
+        instances = [{'uuid': 'uuid1'}, {'uuid': 'uuid2'}, {'uuid': 'uuid3'}]
+        self.assertEqual({'uuid1': 'legacy1', 'uuid2': 'legacy2',
+                          'uuid3': 'legacy3'},
+                         self.compute_api.get_instances_bdms({}, instances))
+
 
 def fake_rpc_method(context, topic, msg, do_cast=True):
     pass
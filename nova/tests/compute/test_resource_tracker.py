@@ -939,3 +939,85 @@ class OrphanTestCase(BaseTrackerTestCase):
         orphans = self.tracker._find_orphaned_instances()
 
         self.assertEqual(2, len(orphans))
+
+
+class IncrementalTrackerTestCase(BaseTrackerTestCase):
+
+    def setUp(self):
+        self.written = []
+        self.audits = 0
+        super(IncrementalTrackerTestCase, self).setUp()
+        self.flags(resource_tracker_incremental=True,
+                   resource_tracker_audit_interval=600)
+        # forget the initial audit done by the base class:
+        self.written = []
+        self.audits = 0
+
+    def _fake_compute_node_update(self, ctx, compute_node_id, values,
+            prune_stats=False):
+        self.written.append((dict(values), prune_stats))
+        return super(IncrementalTrackerTestCase,
+                     self)._fake_compute_node_update(ctx, compute_node_id,
+                                                     values, prune_stats)
+
+    def _fake_instance_get_all_by_host_and_node(self, context, host, nodename):
+        self.audits += 1
+        return super(IncrementalTrackerTestCase,
+                     self)._fake_instance_get_all_by_host_and_node(
+                             context, host, nodename)
+
+    def test_update_without_changes(self):
+        # only updated_at is written, by the DB API:
+        self.tracker.update_available_resource(self.context)
+        self.assertEqual(0, self.audits)
+        self.assertEqual([({}, False)], self.written)
+
+    def test_audit_without_changes(self):
+        self.addCleanup(timeutils.clear_time_override)
+        timeutils.set_time_override(self.tracker.last_audit)
+        timeutils.advance_time_seconds(601)
+
+        self.tracker.update_available_resource(self.context)
+        self.assertEqual(1, self.audits)
+        self.assertEqual([({}, False)], self.written)
+
+    def test_update_capacity_change(self):
+        self.tracker.driver.memory_mb += 1
+        self.tracker.update_available_resource(self.context)
+        self.assertEqual(0, self.audits)
+        self.assertEqual([({'memory_mb': FAKE_VIRT_MEMORY_MB + 1,
+                            'free_ram_mb': FAKE_VIRT_MEMORY_MB + 1}, False)],
+                         self.written)
+
+    def test_claim_writes_changes(self):
+        instance = self._fake_instance(memory_mb=3, root_gb=1,
+                                       ephemeral_gb=1, task_state=None)
+        self.tracker.instance_claim(self.context, instance, self.limits)
+        self._assert(3 + FAKE_VIRT_MEMORY_OVERHEAD, 'memory_mb_used')
+        self._assert(2, 'local_gb_used')
+
+        self.assertEqual(1, len(self.written))
+        values, prune_stats = self.written[0]
+        self.assertFalse(prune_stats)
+        self.assertNotIn('memory_mb', values)
+        self.assertNotIn('cpu_info', values)
+        self.assertEqual(3 + FAKE_VIRT_MEMORY_OVERHEAD,
+                         values['memory_mb_used'])
+        self.assertEqual(1, values['running_vms'])
+        self.assertEqual(1, values['stats']['num_instances'])
+
+        # usage is kept from the claim until the next audit:
+        self.tracker.update_available_resource(self.context)
+        self.assertEqual(0, self.audits)
+        self.assertEqual(2, len(self.written))
+        self.assertEqual(({}, False), self.written[1])
+        self._assert(3 + FAKE_VIRT_MEMORY_OVERHEAD, 'memory_mb_used')
+
+    def test_audit_after_interval(self):
+        self.addCleanup(timeutils.clear_time_override)
+        timeutils.set_time_override(self.tracker.last_audit)
+        timeutils.advance_time_seconds(601)
+
+        self.tracker.update_available_resource(self.context)
+        self.assertEqual(1, self.audits)
+        self.assertEqual(timeutils.utcnow(), self.tracker.last_audit)
@@ -327,6 +327,16 @@ class _BaseTestCase(object):
             self.context, fake_inst, legacy=False)
         self.assertEqual(result, 'fake-result')
 
+    def test_block_device_mapping_get_all_by_instance_uuids(self):
+        self.mox.StubOutWithMock(
+            db, 'block_device_mapping_get_all_by_instance_uuids')
+        db.block_device_mapping_get_all_by_instance_uuids(
+            self.context, ['uuid1', 'uuid2']).AndReturn(['fake-result'])
+        self.mox.ReplayAll()
+        result = self.conductor.block_device_mapping_get_all_by_instance_uuids(
+            self.context, ['uuid1', 'uuid2'], legacy=False)
+        self.assertEqual(result, ['fake-result'])
+
     def test_instance_get_active_by_window_joined(self):
         self.mox.StubOutWithMock(db, 'instance_get_active_by_window_joined')
         db.instance_get_active_by_window_joined(self.context, 'fake-begin',
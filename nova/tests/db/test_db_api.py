@@ -374,6 +374,33 @@ class AggregateDBApiTestCase(test.TestCase):
                                                key='good')
         self.assertFalse('good' in r2)
 
+    def test_aggregate_metadata_get_all_by_hosts(self):
+        ctxt = context.get_admin_context()
+        values2 = {'name': 'fake_aggregate12'}
+        values3 = {'name': 'fake_aggregate23'}
+        a2_hosts = ['foo1.openstack.org', 'foo2.openstack.org']
+        a2_metadata = {'good': 'value12', 'bad': 'badvalue12'}
+        a3_hosts = ['foo2.openstack.org', 'foo3.openstack.org']
+        a3_metadata = {'good': 'value23'}
+        _create_aggregate_with_hosts(context=ctxt, values=values2,
+                hosts=a2_hosts, metadata=a2_metadata)
+        _create_aggregate_with_hosts(context=ctxt, values=values3,
+                hosts=a3_hosts, metadata=a3_metadata)
+        r1 = db.aggregate_metadata_get_all_by_hosts(ctxt)
+        self.assertEqual(set(['foo1.openstack.org', 'foo2.openstack.org',
+                              'foo3.openstack.org']), set(r1.keys()))
+        self.assertEqual({'good': set(['value12']),
+                          'bad': set(['badvalue12'])},
+                         r1['foo1.openstack.org'])
+        self.assertEqual({'good': set(['value12', 'value23']),
+                          'bad': set(['badvalue12'])},
+                         r1['foo2.openstack.org'])
+        self.assertEqual({'good': set(['value23'])},
+                         r1['foo3.openstack.org'])
+        for host in r1:
+            self.assertEqual(
+                    db.aggregate_metadata_get_by_host(ctxt, host), r1[host])
+
     def test_aggregate_host_get_by_metadata_key(self):
         ctxt = context.get_admin_context()
         values2 = {'name': 'fake_aggregate12'}
@@ -1521,6 +1548,67 @@ class InstanceTestCase(test.TestCase, ModelsObjectComparatorMixin):
                                                  'soft_deleted': True})
         self._assertEqualListsOfInstances([inst2, inst3], result)
 
+    def test_instance_get_all_columns_by_filters(self):
+        inst1 = self.create_instance_with_args(display_name='inst1',
+                                               vm_state=vm_states.ACTIVE)
+        self.create_instance_with_args(display_name='inst2', host='h2',
+                                       vm_state=vm_states.ACTIVE)
+        inst3 = self.create_instance_with_args(display_name='inst3',
+                                               vm_state=vm_states.ACTIVE)
+        db.instance_destroy(self.ctxt, inst3['uuid'])
+        result = db.instance_get_all_columns_by_filters(self.ctxt,
+                {'host': 'h1', 'deleted': False}, ['display_name'])
+        self.assertEqual([{'uuid': inst1['uuid'],
+                           'display_name': 'inst1'}], result)
+
+    def test_instance_get_all_columns_by_filters_side_tables(self):
+        inst = self.create_instance_with_args()
+        db.instance_add_security_group(self.ctxt, inst['uuid'],
+                db.security_group_create(self.ctxt, {'name': 'sg1'})['id'])
+        result = db.instance_get_all_columns_by_filters(self.ctxt, {},
+                ['uuid', 'host'], columns_to_join=['metadata',
+                                                   'system_metadata',
+                                                   'info_cache',
+                                                   'security_groups'])
+        self.assertEqual(1, len(result))
+        self.assertEqual('h1', result[0]['host'])
+        self.assertEqual(self.sample_data['metadata'],
+                         utils.metadata_to_dict(result[0]['metadata']))
+        self.assertEqual(self.sample_data['system_metadata'],
+                         utils.metadata_to_dict(result[0]['system_metadata']))
+        self.assertEqual(inst['uuid'],
+                         result[0]['info_cache']['instance_uuid'])
+        self.assertEqual(['sg1'],
+                         [sg['name'] for sg in result[0]['security_groups']])
+
+    def test_instance_get_all_columns_by_filters_paginate(self):
+        instances = [self.create_instance_with_args(display_name='inst%d' % i)
+                     for i in range(5)]
+        pages = []
+        marker = None
+        while True:
+            page = db.instance_get_all_columns_by_filters(self.ctxt, {},
+                    ['display_name'], sort_key='display_name',
+                    sort_dir='asc', limit=2, marker=marker)
+            if not page:
+                break
+            pages.append([inst['display_name'] for inst in page])
+            marker = page[-1]['uuid']
+        self.assertEqual([['inst0', 'inst1'], ['inst2', 'inst3'], ['inst4']],
+                         pages)
+
+        page = db.instance_get_all_columns_by_filters(self.ctxt, {},
+                ['display_name'], sort_key='display_name', sort_dir='desc',
+                limit=2, marker=instances[2]['uuid'])
+        self.assertEqual(['inst1', 'inst0'],
+                         [inst['display_name'] for inst in page])
+
+    def test_instance_get_all_columns_by_filters_bad_marker(self):
+        self.assertRaises(exception.MarkerNotFound,
+                          db.instance_get_all_columns_by_filters,
+                          self.ctxt, {}, ['display_name'],
+                          marker='fake-uuid')
+
     def test_instance_get_all_by_host_and_node_no_join(self):
         instance = self.create_instance_with_args()
         result = db.instance_get_all_by_host_and_node(self.ctxt, 'h1', 'n1')
@@ -1559,6 +1647,40 @@ class InstanceTestCase(test.TestCase, ModelsObjectComparatorMixin):
                     db.instance_update, self.ctxt, instance['uuid'],
                     {'host': 'h1', 'expected_vm_state': ('spam', 'bar')})
 
+    def test_instance_update_batch(self):
+        inst1 = self.create_instance_with_args(vm_state='building')
+        inst2 = self.create_instance_with_args(vm_state='active')
+        inst3 = self.create_instance_with_args(vm_state='building')
+        missing_uuid = 'aaaaaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa'
+        updates = [
+            {'instance_uuid': inst1['uuid'],
+             'values': {'vm_state': 'active', 'host': 'h2',
+                        'expected_vm_state': ['building', None]},
+             'info_cache': {'network_info': '[1]'}},
+            {'instance_uuid': inst2['uuid'],
+             'values': {'vm_state': 'building', 'host': 'h2',
+                        'expected_vm_state': ['building', None]}},
+            {'instance_uuid': missing_uuid, 'values': {'host': 'h2'}},
+            {'instance_uuid': inst3['uuid'],
+             'values': {'metadata': {'mkey1': 'new'}}}]
+
+        failed = db.instance_update_batch(self.ctxt, updates)
+
+        self.assertEqual(set([inst2['uuid'], missing_uuid]), set(failed))
+        self.assertIsInstance(failed[inst2['uuid']],
+                              exception.UnexpectedVMStateError)
+        self.assertIsInstance(failed[missing_uuid],
+                              exception.InstanceNotFound)
+        inst1 = db.instance_get_by_uuid(self.ctxt, inst1['uuid'])
+        self.assertEqual('active', inst1['vm_state'])
+        self.assertEqual('h2', inst1['host'])
+        self.assertEqual('[1]', inst1['info_cache']['network_info'])
+        inst2 = db.instance_get_by_uuid(self.ctxt, inst2['uuid'])
+        self.assertEqual('active', inst2['vm_state'])
+        self.assertEqual('h1', inst2['host'])
+        self.assertEqual({'mkey1': 'new'},
+                         db.instance_metadata_get(self.ctxt, inst3['uuid']))
+
     def test_instance_update_with_instance_uuid(self):
         # test instance_update() works when an instance UUID is passed.
         ctxt = context.get_admin_context()
@@ -2925,6 +3047,53 @@ class FixedIPTestCase(BaseInstanceTypeTestCase):
         ips_list = db.fixed_ips_by_virtual_interface(self.ctxt, vif.id)
         self.assertEquals(0, len(ips_list))
 
+    def test_instance_addresses_get_by_filter(self):
+        instance_uuid = self._create_instance()
+        vif = db.virtual_interface_create(
+            self.ctxt, dict(instance_uuid=instance_uuid))
+        fixed_ip = db.fixed_ip_create(self.ctxt, dict(
+            virtual_interface_id=vif.id, address='192.168.1.5'))
+        db.fixed_ip_create(self.ctxt, dict(
+            virtual_interface_id=vif.id, address='192.168.10.5'))
+        db.floating_ip_create(self.ctxt, dict(address='10.0.0.5',
+                                              fixed_ip_id=fixed_ip['id']))
+        # Not on the virtual interface of an instance
+        db.fixed_ip_create(self.ctxt, dict(address='192.168.1.6'))
+
+        def _get(**kwargs):
+            return [(ip['instance_uuid'], ip['address'], ip['fixed_address'])
+                    for ip in db.instance_addresses_get_by_filter(self.ctxt,
+                                                                  **kwargs)]
+
+        self.assertEqual([(instance_uuid, '192.168.1.5', None)],
+                         _get(fixed_address='192.168.1.5'))
+        self.assertEqual([(instance_uuid, '192.168.1.5', None),
+                          (instance_uuid, '192.168.10.5', None)],
+                         _get(address_like='192.168.1%'))
+        self.assertEqual([(instance_uuid, '192.168.1.5', None),
+                          (instance_uuid, '192.168.10.5', None),
+                          (instance_uuid, '10.0.0.5', '192.168.1.5')],
+                         _get(address_like='1%.5'))
+        self.assertEqual([(instance_uuid, '10.0.0.5', '192.168.1.5')],
+                         _get(address='10.0.0.5'))
+        self.assertEqual([], _get())
+
+    def test_instance_addresses_get_by_filter_exact_column(self):
+        columns = []
+
+        def fake_address_column(column):
+            columns.append(column)
+            return column
+
+        self.stubs.Set(sqlalchemy_api, '_address_column', fake_address_column)
+        db.instance_addresses_get_by_filter(self.ctxt,
+                                            fixed_address='192.168.1.5',
+                                            address='10.0.0.5')
+        self.assertEqual([], columns)
+        db.instance_addresses_get_by_filter(self.ctxt, address_like='10.%')
+        self.assertEqual([models.FixedIp.address, models.FloatingIp.address],
+                         columns)
+
     def create_fixed_ip(self, **params):
         default_params = {'address': '192.168.0.1'}
         default_params.update(params)
@@ -4108,6 +4277,28 @@ class BlockDeviceMappingTestCase(test.TestCase):
         bmd = db.block_device_mapping_get_all_by_instance(self.ctxt, uuid2)
         self.assertEqual(len(bmd), 2)
 
+    def test_block_device_mapping_get_all_by_instance_uuids(self):
+        uuid1 = self.instance['uuid']
+        uuid2 = db.instance_create(self.ctxt, {})['uuid']
+        uuid3 = db.instance_create(self.ctxt, {})['uuid']
+
+        bmds_values = [{'instance_uuid': uuid1,
+                        'device_name': 'first'},
+                       {'instance_uuid': uuid2,
+                        'device_name': 'second'},
+                       {'instance_uuid': uuid3,
+                        'device_name': 'third'}]
+
+        for bdm in bmds_values:
+            self._create_bdm(bdm)
+
+        bmds = db.block_device_mapping_get_all_by_instance_uuids(
+            self.ctxt, [uuid1, uuid2])
+        self.assertEqual(['first', 'second'],
+                         sorted(bmd['device_name'] for bmd in bmds))
+        self.assertEqual([], db.block_device_mapping_get_all_by_instance_uuids(
+            self.ctxt, []))
+
     def test_block_device_mapping_destroy(self):
         bdm = self._create_bdm({})
         db.block_device_mapping_destroy(self.ctxt, bdm['id'])
@@ -5020,6 +5211,33 @@ class ComputeNodeTestCase(test.TestCase, ModelsObjectComparatorMixin):
         new_stats = self._stats_as_dict(node['stats'])
         self._stats_equal(self.stats, new_stats)
 
+    def test_compute_node_get_all_changed_since(self):
+        before = timeutils.utcnow() - datetime.timedelta(seconds=10)
+        nodes = db.compute_node_get_all_changed_since(self.ctxt, before)
+        self.assertEqual(1, len(nodes))
+        self.assertEqual(self.item['id'], nodes[0]['id'])
+        self.assertEqual('host1', nodes[0]['service']['host'])
+
+        after = timeutils.utcnow() + datetime.timedelta(seconds=10)
+        nodes = db.compute_node_get_all_changed_since(self.ctxt, after)
+        self.assertEqual([], nodes)
+
+    def test_compute_node_get_all_changed_since_service_update(self):
+        since = timeutils.utcnow() + datetime.timedelta(seconds=10)
+        db.service_update(self.ctxt, self.service['id'],
+                          {'updated_at': since +
+                                         datetime.timedelta(seconds=1)})
+        nodes = db.compute_node_get_all_changed_since(self.ctxt, since)
+        self.assertEqual(1, len(nodes))
+        self.assertEqual(self.item['id'], nodes[0]['id'])
+
+    def test_compute_node_get_all_changed_since_includes_deleted(self):
+        since = timeutils.utcnow() - datetime.timedelta(seconds=10)
+        db.compute_node_delete(self.ctxt, self.item['id'])
+        nodes = db.compute_node_get_all_changed_since(self.ctxt, since)
+        self.assertEqual(1, len(nodes))
+        self.assertTrue(nodes[0]['deleted'])
+
     def test_compute_node_get(self):
         compute_node_id = self.item['id']
         node = db.compute_node_get(self.ctxt, compute_node_id)
@@ -5730,6 +5948,34 @@ class Ec2TestCase(test.TestCase):
                           db.get_instance_uuid_by_ec2_id,
                           self.ctxt, 100500)
 
+    def _test_ec2_ids_get_or_create(self, create, get_or_create):
+        ref = create(self.ctxt, 'fake-uuid1')
+        self.assertEqual({}, get_or_create(self.ctxt, []))
+
+        ec2_ids = get_or_create(self.ctxt, ['fake-uuid1', 'fake-uuid2',
+                                            'fake-uuid3'])
+        self.assertEqual(['fake-uuid1', 'fake-uuid2', 'fake-uuid3'],
+                         sorted(ec2_ids))
+        self.assertEqual(ref['id'], ec2_ids['fake-uuid1'])
+        self.assertEqual(3, len(set(ec2_ids.values())))
+        # The created mappings are stable
+        self.assertEqual(ec2_ids, get_or_create(self.ctxt, ec2_ids.keys()))
+
+    def test_ec2_instance_ids_get_or_create(self):
+        self._test_ec2_ids_get_or_create(db.ec2_instance_create,
+                                         db.ec2_instance_ids_get_or_create)
+        self.assertEqual('fake-uuid2', db.get_instance_uuid_by_ec2_id(
+                self.ctxt, db.get_ec2_instance_id_by_uuid(self.ctxt,
+                                                          'fake-uuid2')))
+
+    def test_ec2_volume_ids_get_or_create(self):
+        self._test_ec2_ids_get_or_create(db.ec2_volume_create,
+                                         db.ec2_volume_ids_get_or_create)
+
+    def test_ec2_snapshot_ids_get_or_create(self):
+        self._test_ec2_ids_get_or_create(db.ec2_snapshot_create,
+                                         db.ec2_snapshot_ids_get_or_create)
+
 
 class ArchiveTestCase(test.TestCase):
 
@@ -15,6 +15,8 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import re
+
 from oslo.config import cfg
 
 from nova.compute import api as compute_api
@@ -152,6 +154,37 @@ class FakeNetworkManager(network_manager.NetworkManager):
             return [ip for ip in self.fixed_ips
                     if ip['virtual_interface_id'] == vif_id]
 
+        def instance_addresses_get_by_filter(self, context,
+                                             fixed_address=None,
+                                             address=None,
+                                             address_like=None):
+            def _matches(ip_address, exact_addresses):
+                if ip_address in exact_addresses:
+                    return True
+                if address_like is None:
+                    return False
+                pattern = address_like.replace('.', '\\.').\
+                        replace('_', '.').replace('%', '.*')
+                return re.match(pattern + '$', ip_address) is not None
+
+            vifs = dict((vif['id'], vif) for vif in self.vifs)
+            fixed_ips = dict((ip['id'], ip) for ip in self.fixed_ips)
+            data = []
+            for ip in self.fixed_ips:
+                if _matches(ip['address'], [fixed_address, address]):
+                    vif = vifs[ip['virtual_interface_id']]
+                    data.append({'instance_uuid': vif['instance_uuid'],
+                                 'address': ip['address'],
+                                 'fixed_address': None})
+            for ip in self.floating_ips:
+                if _matches(ip['address'], [address]):
+                    fixed_ip = fixed_ips[ip['fixed_ip_id']]
+                    vif = vifs[fixed_ip['virtual_interface_id']]
+                    data.append({'instance_uuid': vif['instance_uuid'],
+                                 'address': ip['address'],
+                                 'fixed_address': fixed_ip['address']})
+            return data
+
         def fixed_ip_disassociate(self, context, address):
             return True
 
@@ -18,6 +18,7 @@
 import calendar
 import os
 
+from eventlet import greenthread
 import mox
 from oslo.config import cfg
 
@@ -310,6 +311,67 @@ class LinuxNetworkTestCase(test.TestCase):
 
         self.driver.update_dhcp(self.context, "eth0", networks[0])
 
+    def test_update_dhcp_batched(self):
+        self.flags(dhcp_update_batch_interval=2)
+        batcher = linux_net.DhcpUpdateBatcher(2)
+        self.stubs.Set(linux_net, '_DHCP_UPDATE_BATCHER', batcher)
+        flushes = []
+        self.stubs.Set(greenthread, 'spawn_after',
+                       lambda seconds, func, *args: flushes.append(
+                           (seconds, func, args)))
+        calls = []
+        self.stubs.Set(linux_net, 'get_dhcp_hosts',
+                       lambda context, network_ref: 'hosts')
+        self.stubs.Set(linux_net, 'write_to_file',
+                       lambda path, contents: calls.append('write'))
+        self.stubs.Set(linux_net, 'restart_dhcp',
+                       lambda context, dev, network_ref: calls.append(
+                           'restart'))
+        self.stubs.Set(linux_net, '_dnsmasq_running', lambda dev: True)
+
+        for i in range(3):
+            self.driver.update_dhcp(self.context, 'eth0', networks[0])
+        self.assertEqual([(2, batcher._flush, ('eth0',))], flushes)
+        self.assertEqual([], calls)
+
+        batcher._flush('eth0')
+        self.assertEqual(['write', 'restart'], calls)
+        self.assertEqual({'updates': 3, 'flushes': 1, 'unchanged': 0,
+                          'discarded': 0, 'coalesced': 2},
+                         linux_net.get_dhcp_update_stats())
+
+        # The hosts did not change, so the host file is left alone
+        self.driver.update_dhcp(self.context, 'eth0', networks[0])
+        batcher._flush('eth0')
+        self.assertEqual(['write', 'restart'], calls)
+        self.assertEqual({'updates': 4, 'flushes': 2, 'unchanged': 1,
+                          'discarded': 0, 'coalesced': 2},
+                         linux_net.get_dhcp_update_stats())
+
+    def test_kill_dhcp_discards_batched_update(self):
+        batcher = linux_net.DhcpUpdateBatcher(2)
+        self.stubs.Set(linux_net, '_DHCP_UPDATE_BATCHER', batcher)
+        self.stubs.Set(greenthread, 'spawn_after',
+                       lambda seconds, func, *args: None)
+        self.stubs.Set(linux_net, '_dnsmasq_pid_for', lambda dev: None)
+        self.stubs.Set(linux_net, '_remove_dnsmasq_accept_rules',
+                       lambda dev: None)
+        self.stubs.Set(linux_net, '_remove_dhcp_mangle_rule',
+                       lambda dev: None)
+        self.stubs.Set(linux_net, 'restart_dhcp',
+                       lambda context, dev, network_ref: self.fail(
+                           'dnsmasq restarted after being killed'))
+        batcher._hosts['eth0'] = 'hosts'
+
+        batcher.update(self.context, 'eth0', networks[0])
+        self.driver.kill_dhcp('eth0')
+        batcher._flush('eth0')
+        self.assertEqual({}, batcher._pending)
+        self.assertEqual({}, batcher._hosts)
+        self.assertEqual({'updates': 1, 'flushes': 0, 'unchanged': 0,
+                          'discarded': 1, 'coalesced': 0},
+                         batcher.get_stats())
+
     def test_get_dhcp_hosts_for_nw00(self):
         self.flags(use_single_default_gateway=True)
 
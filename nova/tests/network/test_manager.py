@@ -1536,6 +1536,28 @@ class CommonNetworkTestCase(test.TestCase):
                 None, None, None]
         self.assertTrue(manager.create_networks(*args))
 
+    def test_ip_filter_to_sql(self):
+        self.assertEqual(('10.0.0.1', None),
+                         network_manager._ip_filter_to_sql(r'^10\.0\.0\.1$'))
+        self.assertEqual((None, '10_0_0_1%'),
+                         network_manager._ip_filter_to_sql('10.0.0.1'))
+        self.assertEqual((None, '10.0_'),
+                         network_manager._ip_filter_to_sql(r'^10\.0.$'))
+        self.assertEqual((None, 'fe80::%'),
+                         network_manager._ip_filter_to_sql('fe80::'))
+        self.assertEqual((None, '172_16_0%'),
+                         network_manager._ip_filter_to_sql('172.16.0.*'))
+        self.assertEqual((None, '10.0.%'),
+                         network_manager._ip_filter_to_sql(r'10\.0\.1?$'))
+        self.assertEqual((None, '10.0.0.1%'),
+                         network_manager._ip_filter_to_sql(r'10\.0\.0\.1+'))
+        self.assertEqual((None, '10%'),
+                         network_manager._ip_filter_to_sql(r'10\d'))
+        self.assertEqual((None, '%'),
+                         network_manager._ip_filter_to_sql(r'10\d|20'))
+        self.assertEqual((None, '%'),
+                         network_manager._ip_filter_to_sql(r'10\.(0|1)'))
+
     def test_get_instance_uuids_by_ip_regex(self):
         manager = fake_network.FakeNetworkManager()
         _vifs = manager.db.virtual_interface_get_all(None)
@@ -25,9 +25,11 @@ from nova.conductor import api as conductor_api
 from nova import context
 from nova import db
 from nova import exception
+from nova.openstack.common.notifier import api as notifier
 from nova.scheduler import driver
 from nova.scheduler import filter_scheduler
 from nova.scheduler import host_manager
+from nova.scheduler import request_stats
 from nova.scheduler import utils as scheduler_utils
 from nova.scheduler import weights
 from nova.tests.scheduler import fakes
@@ -513,6 +515,106 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         # one host should be chose
         self.assertEqual(len(hosts), 1)
 
+    def _schedule_instances(self, num_instances, sched=None):
+        if sched is None:
+            sched = fakes.FakeFilterScheduler()
+        fake_context = context.RequestContext('user', 'project',
+                is_admin=True)
+        self.stubs.Set(db, 'compute_node_get_all',
+                       lambda context: fakes.COMPUTE_NODES)
+
+        instance_properties = {'project_id': 1,
+                               'root_gb': 1,
+                               'memory_mb': 512,
+                               'ephemeral_gb': 0,
+                               'vcpus': 1,
+                               'os_type': 'Linux'}
+        request_spec = {'num_instances': num_instances,
+                        'instance_type': instance_properties,
+                        'instance_properties': instance_properties}
+        hosts = sched._schedule(fake_context, request_spec, {})
+        return [(host.obj.host, host.weight) for host in hosts]
+
+    def test_schedule_heap_placement_matches_sort(self):
+        self.flags(scheduler_default_filters=['RamFilter'],
+                   ram_allocation_ratio=1.0,
+                   scheduler_host_subset_size=1)
+        self.flags(scheduler_heap_placement=False)
+        expected = self._schedule_instances(30)
+        self.flags(scheduler_heap_placement=True)
+        result = self._schedule_instances(30)
+
+        # Only 25 instances of 512MB fit on the fake hosts
+        self.assertEqual(25, len(result))
+        self.assertEqual(expected, result)
+        self.assertEqual(('host4', 8192), result[0])
+
+    def test_schedule_heap_placement_host_pool(self):
+        self.flags(scheduler_default_filters=['RamFilter'],
+                   ram_allocation_ratio=1.0,
+                   scheduler_host_subset_size=3,
+                   scheduler_heap_placement=True)
+        result = self._schedule_instances(10)
+        self.assertEqual(10, len(result))
+
+    def test_schedule_filter_early_stop(self):
+        self.flags(scheduler_default_filters=['RamFilter'],
+                   ram_allocation_ratio=1.0,
+                   scheduler_adaptive_filters=True)
+        self.assertEqual([('host4', 8192), ('host4', 7680)],
+                         self._schedule_instances(2))
+
+        self.flags(scheduler_filter_early_stop=True)
+        weighed = []
+
+        def fake_get_weighed_hosts(_self, hosts, weight_properties):
+            weighed.append(len(hosts))
+            return orig_get_weighed_hosts(_self, hosts, weight_properties)
+
+        orig_get_weighed_hosts = host_manager.HostManager.get_weighed_hosts
+        self.stubs.Set(host_manager.HostManager, 'get_weighed_hosts',
+                       fake_get_weighed_hosts)
+        self.assertEqual(2, len(self._schedule_instances(2)))
+        self.assertEqual([2, 2], weighed)
+
+    def test_schedule_request_stats(self):
+        self.flags(scheduler_default_filters=['RamFilter'],
+                   ram_allocation_ratio=1.0,
+                   scheduler_request_stats=True)
+        self.stubs.Set(request_stats, '_listen_for_queries', lambda: None)
+        notifications = []
+
+        def fake_notify(context, publisher_id, event_type, priority,
+                        payload):
+            notifications.append((event_type, payload))
+
+        self.stubs.Set(notifier, 'notify', fake_notify)
+
+        sched = fakes.FakeFilterScheduler()
+        self._schedule_instances(2, sched)
+        self._schedule_instances(30, sched)
+
+        self.assertEqual(['scheduler.request.stats'] * 2,
+                         [event_type for event_type, payload in
+                          notifications])
+        payload = notifications[0][1]
+        self.assertEqual(2, payload['num_instances'])
+        self.assertEqual(set(['get_all_host_states', 'filtering',
+                              'weighing', 'consume']),
+                         set(payload['phases']))
+        self.assertEqual({'calls': 2, 'hosts_in': 8, 'hosts_out': 8},
+                         dict((key, value) for key, value in
+                              payload['filters']['RamFilter'].items()
+                              if key != 'time'))
+        self.assertEqual(['RAMWeigher'], payload['weighers'].keys())
+
+        stats = sched.get_request_stats()
+        self.assertEqual(2, stats['requests'])
+        self.assertTrue(stats['max_elapsed'] <= stats['elapsed'])
+        # Only 25 instances fit, the 26th finds no host left
+        self.assertEqual(28, stats['filters']['RamFilter']['calls'])
+        self.assertEqual(27, stats['weighers']['RAMWeigher']['calls'])
+
     def test_schedule_chooses_best_host(self):
         """If scheduler_host_subset_size is 1, the largest host with greatest
         weight should be returned.
@@ -17,6 +17,7 @@ Tests For Scheduler Host Filters.
 
 import httplib
 
+import mox
 from oslo.config import cfg
 import stubout
 
@@ -44,6 +45,86 @@ class TestBogusFilter(object):
     pass
 
 
+class FakeOddHostFilter(filters.BaseHostFilter):
+    """Passes the hosts with an odd number in their name."""
+    hosts_seen = []
+
+    def host_passes(self, host_state, filter_properties):
+        self.hosts_seen.append(host_state.host)
+        return int(host_state.host[4:]) % 2 == 1
+
+
+class FakeAllHostsFilter(filters.BaseHostFilter):
+    """Passes every host."""
+    hosts_seen = []
+
+    def host_passes(self, host_state, filter_properties):
+        self.hosts_seen.append(host_state.host)
+        return True
+
+
+class AdaptiveHostFilterHandlerTestCase(test.NoDBTestCase):
+    """Test case for the adaptive host filter pipeline."""
+
+    def setUp(self):
+        super(AdaptiveHostFilterHandlerTestCase, self).setUp()
+        self.filter_handler = filters.HostFilterHandler()
+        self.hosts = [fakes.FakeHostState('host%d' % i, 'node',
+                                          {'free_ram_mb': 512 * i,
+                                           'total_usable_ram_mb': 4096,
+                                           'num_io_ops': 10 - i})
+                      for i in xrange(1, 10)]
+        self.filter_properties = {'instance_type': {'memory_mb': 1024}}
+        self.stubs.Set(FakeOddHostFilter, 'hosts_seen', [])
+        self.stubs.Set(FakeAllHostsFilter, 'hosts_seen', [])
+
+    def _filter_hosts(self, filter_classes, adaptive):
+        self.flags(scheduler_adaptive_filters=adaptive)
+        return self.filter_handler.get_filtered_objects(filter_classes,
+                iter(self.hosts), self.filter_properties)
+
+    def test_same_hosts_as_configured_order(self):
+        filter_classes = self.filter_handler.get_matching_classes(
+                ['nova.scheduler.filters.ram_filter.RamFilter',
+                 'nova.scheduler.filters.io_ops_filter.IoOpsFilter'])
+        self.flags(ram_allocation_ratio=1.0, max_io_ops_per_host=5)
+        filter_classes.append(FakeOddHostFilter)
+
+        expected = self._filter_hosts(filter_classes, False)
+        for i in xrange(3):
+            self.assertEqual(expected,
+                             self._filter_hosts(filter_classes, True))
+        self.assertEqual(['host7', 'host9'],
+                         [host.host for host in expected])
+        self.assertEqual(set(['RamFilter', 'IoOpsFilter',
+                              'FakeOddHostFilter']),
+                         set(self.filter_handler.filter_costs))
+
+    def test_selective_filters_run_first(self):
+        filter_classes = [FakeAllHostsFilter, FakeOddHostFilter]
+        self._filter_hosts(filter_classes, True)
+        self.assertEqual(9, len(FakeAllHostsFilter.hosts_seen))
+        self.assertEqual(1.0,
+                self.filter_handler.filter_costs['FakeAllHostsFilter'][1])
+
+        FakeAllHostsFilter.hosts_seen[:] = []
+        FakeOddHostFilter.hosts_seen[:] = []
+        result = self._filter_hosts(filter_classes, True)
+        self.assertEqual(['host1', 'host3', 'host5', 'host7', 'host9'],
+                         [host.host for host in result])
+        self.assertEqual(9, len(FakeOddHostFilter.hosts_seen))
+        self.assertEqual(['host1', 'host3', 'host5', 'host7', 'host9'],
+                         FakeAllHostsFilter.hosts_seen)
+
+    def test_host_candidate_limit(self):
+        self.filter_properties['host_candidate_limit'] = 2
+        result = self._filter_hosts([FakeOddHostFilter], True)
+        self.assertEqual(['host1', 'host3'],
+                         [host.host for host in result])
+        self.assertEqual(['host1', 'host2', 'host3'],
+                         FakeOddHostFilter.hosts_seen)
+
+
 class ExtraSpecsOpsTestCase(test.NoDBTestCase):
     def _do_extra_specs_ops_test(self, value, req, matches):
         assertion = self.assertTrue if matches else self.assertFalse
@@ -398,6 +479,26 @@ class HostFiltersTestCase(test.NoDBTestCase):
 
         self.assertFalse(filt_cls.host_passes(host, filter_properties))
 
+    def test_affinity_same_filter_queries_once(self):
+        filt_cls = self.class_map['SameHostFilter']()
+        hosts = [fakes.FakeHostState('host%s' % i, 'node1', {})
+                 for i in xrange(1, 4)]
+        instance_uuid = 'fake-uuid'
+
+        filter_properties = {'context': self.context.elevated(),
+                             'scheduler_hints': {
+                                'same_host': [instance_uuid], }}
+
+        self.mox.StubOutWithMock(filt_cls.compute_api, 'get_all')
+        filt_cls.compute_api.get_all(filter_properties['context'],
+                                     {'uuid': [instance_uuid],
+                                      'deleted': False}).AndReturn(
+                                              [{'host': 'host2'}])
+        self.mox.ReplayAll()
+
+        result = list(filt_cls.filter_all(hosts, filter_properties))
+        self.assertEqual([hosts[1]], result)
+
     def test_affinity_simple_cidr_filter_passes(self):
         filt_cls = self.class_map['SimpleCIDRAffinityFilter']()
         host = fakes.FakeHostState('host1', 'node1', {})
@@ -477,6 +578,28 @@ class HostFiltersTestCase(test.NoDBTestCase):
                            params={'host': 'fake_host', 'instance_type_id': 2})
         self.assertFalse(filt_cls.host_passes(host, filter_properties))
 
+    def test_aggregate_metadata_loaded_once_per_request(self):
+        filt_cls = self.class_map['AggregateMultiTenancyIsolation']()
+        self._create_aggregate_with_host(name='fake1',
+                metadata={'filter_tenant_id': 'my_tenantid'},
+                hosts=['host1'])
+        filter_properties = {'context': self.context,
+                             'request_spec': {
+                                 'instance_properties': {
+                                     'project_id': 'other_tenantid'}}}
+        host1 = fakes.FakeHostState('host1', 'compute', {})
+        host2 = fakes.FakeHostState('host2', 'compute', {})
+
+        self.mox.StubOutWithMock(db, 'aggregate_metadata_get_by_host')
+        self.mox.StubOutWithMock(db, 'aggregate_metadata_get_all_by_hosts')
+        db.aggregate_metadata_get_all_by_hosts(mox.IgnoreArg()).AndReturn(
+                {'host1': {'filter_tenant_id': set(['my_tenantid'])}})
+        self.mox.ReplayAll()
+
+        self.assertFalse(filt_cls.host_passes(host1, filter_properties))
+        self.assertTrue(filt_cls.host_passes(host2, filter_properties))
+        self.assertIn('aggregate_metadata', filter_properties)
+
     def test_aggregate_type_filter(self):
         self._stub_service_is_up(True)
         filt_cls = self.class_map['AggregateTypeAffinityFilter']()
@@ -569,6 +692,8 @@ class HostFiltersTestCase(test.NoDBTestCase):
         self._create_aggregate_with_host(name='fake_aggregate',
                 hosts=['host1'],
                 metadata={'ram_allocation_ratio': '2.0'})
+        # Aggregate metadata is loaded once per request
+        filter_properties.pop('aggregate_metadata')
         # True: use ratio from aggregates
         self.assertTrue(filt_cls.host_passes(host, filter_properties))
         self.assertEqual(1024 * 2.0, host.limits['memory_mb'])
@@ -1415,6 +1540,8 @@ class HostFiltersTestCase(test.NoDBTestCase):
         self._create_aggregate_with_host(name='fake_aggregate',
                 hosts=['host1'],
                 metadata={'cpu_allocation_ratio': '3'})
+        # Aggregate metadata is loaded once per request
+        filter_properties.pop('aggregate_metadata')
         # True: use ratio from aggregates
         self.assertTrue(filt_cls.host_passes(host, filter_properties))
         self.assertEqual(4 * 3, host.limits['vcpu'])
@@ -416,6 +416,78 @@ class HostManagerChangedNodesTestCase(test.NoDBTestCase):
         self.assertEqual(len(host_states_map), 0)
 
 
+class HostManagerHostStateCacheTestCase(test.NoDBTestCase):
+    """Test case for HostManager with scheduler_host_state_cache enabled."""
+
+    def setUp(self):
+        super(HostManagerHostStateCacheTestCase, self).setUp()
+        self.flags(scheduler_host_state_cache=True,
+                   scheduler_host_state_resync_interval=600)
+        self.host_manager = host_manager.HostManager()
+        self.addCleanup(timeutils.clear_time_override)
+
+    def test_get_all_host_states_fetches_changed_nodes(self):
+        context = 'fake_context'
+        start = timeutils.utcnow()
+        timeutils.set_time_override(start)
+
+        self.mox.StubOutWithMock(db, 'compute_node_get_all')
+        self.mox.StubOutWithMock(db, 'compute_node_get_all_changed_since')
+        db.compute_node_get_all(context).AndReturn(fakes.COMPUTE_NODES)
+        changed = dict(fakes.COMPUTE_NODES[0], free_ram_mb=256)
+        db.compute_node_get_all_changed_since(context, start).AndReturn(
+                [changed])
+        self.mox.ReplayAll()
+
+        self.host_manager.get_all_host_states(context)
+        timeutils.advance_time_seconds(10)
+        self.host_manager.get_all_host_states(context)
+        host_states_map = self.host_manager.host_state_map
+        self.assertEqual(len(host_states_map), 4)
+        self.assertEqual(host_states_map[('host1', 'node1')].free_ram_mb,
+                         256)
+        self.assertEqual(host_states_map[('host2', 'node2')].free_ram_mb,
+                         1024)
+
+    def test_get_all_host_states_removes_deleted_nodes(self):
+        context = 'fake_context'
+        start = timeutils.utcnow()
+        timeutils.set_time_override(start)
+
+        self.mox.StubOutWithMock(db, 'compute_node_get_all')
+        self.mox.StubOutWithMock(db, 'compute_node_get_all_changed_since')
+        db.compute_node_get_all(context).AndReturn(fakes.COMPUTE_NODES)
+        deleted = dict(fakes.COMPUTE_NODES[3], deleted=4, service=None)
+        db.compute_node_get_all_changed_since(context, start).AndReturn(
+                [deleted])
+        self.mox.ReplayAll()
+
+        self.host_manager.get_all_host_states(context)
+        timeutils.advance_time_seconds(10)
+        self.host_manager.get_all_host_states(context)
+        host_states_map = self.host_manager.host_state_map
+        self.assertEqual(len(host_states_map), 3)
+        self.assertNotIn(('host4', 'node4'), host_states_map)
+
+    def test_get_all_host_states_full_resync(self):
+        context = 'fake_context'
+        timeutils.set_time_override()
+
+        self.mox.StubOutWithMock(db, 'compute_node_get_all')
+        self.mox.StubOutWithMock(db, 'compute_node_get_all_changed_since')
+        db.compute_node_get_all(context).AndReturn(fakes.COMPUTE_NODES)
+        running_nodes = [n for n in fakes.COMPUTE_NODES
+                         if n.get('hypervisor_hostname') != 'node4']
+        db.compute_node_get_all(context).AndReturn(running_nodes)
+        self.mox.ReplayAll()
+
+        self.host_manager.get_all_host_states(context)
+        timeutils.advance_time_seconds(601)
+        self.host_manager.get_all_host_states(context)
+        host_states_map = self.host_manager.host_state_map
+        self.assertEqual(len(host_states_map), 3)
+
+
 class HostStateTestCase(test.NoDBTestCase):
     """Test case for HostState class."""
 
@@ -0,0 +1,134 @@
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the vectorized HostTable filter and weigher engine.
+"""
+
+from oslo.config import cfg
+import testtools
+
+from nova.scheduler import filters
+from nova.scheduler import host_table
+from nova.scheduler import weights
+from nova import test
+from nova.tests.scheduler import fakes
+
+CONF = cfg.CONF
+CONF.import_opt('cpu_allocation_ratio', 'nova.scheduler.filters.core_filter')
+CONF.import_opt('disk_allocation_ratio', 'nova.scheduler.filters.disk_filter')
+CONF.import_opt('max_instances_per_host',
+                'nova.scheduler.filters.num_instances_filter')
+CONF.import_opt('max_io_ops_per_host', 'nova.scheduler.filters.io_ops_filter')
+CONF.import_opt('ram_allocation_ratio', 'nova.scheduler.filters.ram_filter')
+
+
+class FakeOddHostFilter(filters.BaseHostFilter):
+    """A per host filter that only passes hosts with odd names."""
+
+    def host_passes(self, host_state, filter_properties):
+        return int(host_state.host[-1]) % 2 == 1
+
+
+@testtools.skipIf(host_table.numpy is None, "numpy not available")
+class HostTableTestCase(test.NoDBTestCase):
+    """Test case for the HostTable based filter and weigher handlers."""
+
+    def setUp(self):
+        super(HostTableTestCase, self).setUp()
+        self.filter_handler = filters.HostFilterHandler()
+        self.weight_handler = weights.HostWeightHandler()
+        self.filter_properties = {'instance_type': {'memory_mb': 1024,
+                                                    'root_gb': 10,
+                                                    'ephemeral_gb': 0,
+                                                    'vcpus': 2}}
+
+    def _get_hosts(self):
+        hosts = []
+        for i in xrange(1, 10):
+            hosts.append(fakes.FakeHostState('host%s' % i, 'node', {
+                    'free_ram_mb': 512 * i,
+                    'total_usable_ram_mb': 4096,
+                    'free_disk_mb': 4096 * i,
+                    'total_usable_disk_gb': 40,
+                    'vcpus_total': i % 4,
+                    'vcpus_used': i % 3,
+                    'num_instances': i,
+                    'num_io_ops': 10 - i}))
+        return hosts
+
+    def _filter_hosts(self, filter_names, use_host_table):
+        self.flags(scheduler_use_host_table=use_host_table)
+        filter_classes = self.filter_handler.get_matching_classes(
+                filter_names)
+        hosts = self._get_hosts()
+        result = self.filter_handler.get_filtered_objects(filter_classes,
+                hosts, self.filter_properties)
+        return [(host.host, host.limits) for host in result]
+
+    def test_builtin_filters_match_per_host_filters(self):
+        self.flags(max_instances_per_host=8, max_io_ops_per_host=8,
+                   ram_allocation_ratio=1.0, disk_allocation_ratio=1.0,
+                   cpu_allocation_ratio=1.0)
+        for filter_name in ['ram_filter.RamFilter',
+                            'core_filter.CoreFilter',
+                            'disk_filter.DiskFilter',
+                            'num_instances_filter.NumInstancesFilter',
+                            'io_ops_filter.IoOpsFilter']:
+            filter_names = ['nova.scheduler.filters.' + filter_name]
+            expected = self._filter_hosts(filter_names, False)
+            result = self._filter_hosts(filter_names, True)
+            self.assertEqual(expected, result)
+            self.assertTrue(0 < len(result) < 9)
+
+    def test_chained_filters_with_per_host_fallback(self):
+        filter_names = ['nova.scheduler.filters.ram_filter.RamFilter',
+                        'nova.tests.scheduler.test_host_table.'
+                        'FakeOddHostFilter',
+                        'nova.scheduler.filters.io_ops_filter.IoOpsFilter']
+        expected = self._filter_hosts(filter_names, False)
+        result = self._filter_hosts(filter_names, True)
+        self.assertEqual(expected, result)
+        self.assertEqual(['host3', 'host5', 'host7', 'host9'],
+                         [host for host, limits in result])
+
+    def test_ram_weigher_matches_per_host_weigher(self):
+        weight_classes = self.weight_handler.get_matching_classes(
+                ['nova.scheduler.weights.ram.RAMWeigher'])
+
+        self.flags(scheduler_use_host_table=False)
+        expected = self.weight_handler.get_weighed_objects(weight_classes,
+                self._get_hosts(), {})
+        self.flags(scheduler_use_host_table=True)
+        result = self.weight_handler.get_weighed_objects(weight_classes,
+                self._get_hosts(), {})
+
+        self.assertEqual([(h.obj.host, h.weight) for h in expected],
+                         [(h.obj.host, h.weight) for h in result])
+        self.assertEqual('host9', result[0].obj.host)
+        self.assertEqual(512 * 9, result[0].weight)
+
+    def test_host_table_select(self):
+        hosts = self._get_hosts()
+        table = host_table.HostTable(hosts)
+        self.assertEqual(512.0, table.column('free_ram_mb')[0])
+
+        table = table.select(table.column('num_instances') > 6)
+        self.assertEqual(hosts[6:], table.host_states)
+        self.assertEqual([512.0 * 7, 512.0 * 8, 512.0 * 9],
+                         list(table.column('free_ram_mb')))
+
+        table = table.select_host_states([hosts[8]])
+        self.assertEqual([hosts[8]], table.host_states)
+        self.assertEqual([512.0 * 9], list(table.column('free_ram_mb')))
@@ -0,0 +1,68 @@
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the timing of scheduling requests.
+"""
+
+from nova import context
+from nova import db
+from nova.scheduler import request_stats
+from nova import test
+
+
+class RequestStatsTestCase(test.TestCase):
+    def test_db_queries(self):
+        ctxt = context.get_admin_context()
+        with request_stats.RequestStats() as stats:
+            db.service_get_all(ctxt)
+            db.compute_node_get_all(ctxt)
+        db.service_get_all(ctxt)
+
+        self.assertEqual(2, stats.db_queries)
+        self.assertTrue(stats.elapsed >= 0)
+
+    def test_timed(self):
+        with request_stats.timed('filtering'):
+            pass
+        with request_stats.RequestStats() as stats:
+            with request_stats.timed('weighing'):
+                pass
+        self.assertEqual(['weighing'], stats.phases.keys())
+        self.assertIsNone(request_stats.get_current())
+
+    def test_scheduler_stats(self):
+        totals = request_stats.SchedulerStats()
+        for elapsed in (0.5, 1.5):
+            stats = request_stats.RequestStats()
+            stats.add_phase('filtering', elapsed)
+            stats.add_filter('RamFilter', elapsed, 10, 4)
+            stats.add_weigher('RAMWeigher', elapsed, 4)
+            stats.db_queries = 3
+            stats.elapsed = elapsed
+            totals.add(stats)
+
+        self.assertEqual({'requests': 2,
+                          'elapsed': 2.0,
+                          'max_elapsed': 1.5,
+                          'db_queries': 6,
+                          'phases': {'filtering': 2.0},
+                          'filters': {'RamFilter': {'calls': 2,
+                                                    'time': 2.0,
+                                                    'hosts_in': 20,
+                                                    'hosts_out': 8}},
+                          'weighers': {'RAMWeigher': {'calls': 2,
+                                                      'time': 2.0,
+                                                      'hosts': 8}}},
+                         totals.to_dict())
@@ -92,3 +92,18 @@ class SchedulerRpcAPITestCase(test.NoDBTestCase):
                 request_spec='fake_request_spec',
                 filter_properties='fake_prop',
                 version='2.7')
+
+    def test_get_request_stats(self):
+        self._test_scheduler_api('get_request_stats', rpc_method='call',
+                version='2.8')
+
+    def test_get_request_stats_from_host(self):
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        rpcapi = scheduler_rpcapi.SchedulerAPI()
+        self.mox.StubOutWithMock(rpc, 'call')
+        rpc.call(ctxt, '%s.fake_host' % CONF.scheduler_topic,
+                 {'method': 'get_request_stats', 'args': {},
+                  'namespace': None, 'version': '2.8'}, None).AndReturn('foo')
+        self.mox.ReplayAll()
+        self.assertEqual('foo', rpcapi.get_request_stats(ctxt,
+                                                         host='fake_host'))
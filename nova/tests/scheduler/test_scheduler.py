@@ -454,6 +454,10 @@ class SchedulerManagerTestCase(test.NoDBTestCase):
                           self.manager.select_hosts,
                           self.context, {}, {})
 
+    def test_get_request_stats(self):
+        self.assertEqual(0, self.manager.get_request_stats(
+                self.context)['requests'])
+
 
 class SchedulerTestCase(test.NoDBTestCase):
     """Test case for base scheduler driver class."""
@@ -141,3 +141,60 @@ class DBServiceGroupTestCase(test.TestCase):
         self.mox.ReplayAll()
         result = self.servicegroup_api.service_is_up(service)
         self.assertFalse(result)
+
+    def test_liveness_cache(self):
+        self.useFixture(test.TimeOverride())
+        self.flags(servicegroup_db_cache_ttl=10)
+        servicegroup.API._driver = None
+        self.servicegroup_api = servicegroup.API()
+        driver = servicegroup.API._driver
+
+        for host in ('host1', 'host2'):
+            db.service_create(self._ctx, {'host': host,
+                                          'binary': self._binary,
+                                          'topic': self._topic})
+        db.service_create(self._ctx, {'host': 'host3',
+                                      'binary': 'nova-other',
+                                      'topic': 'other'})
+        service_ref = db.service_get_by_args(self._ctx, 'host1',
+                                             self._binary)
+
+        self.assertEqual(['host1', 'host2'],
+                         sorted(self.servicegroup_api.get_all(self._topic)))
+        # Once the heartbeats are stale the services are down, until
+        # host1 reports its state again
+        timeutils.advance_time_seconds(self.down_time + 1)
+        self.assertEqual([], self.servicegroup_api.get_all(self._topic))
+        self.assertFalse(self.servicegroup_api.service_is_up(service_ref))
+
+        stale_ref = dict(service_ref.iteritems())
+        service_ref['updated_at'] = timeutils.utcnow()
+        driver.cache.update(service_ref)
+        self.assertEqual(['host1'], self.servicegroup_api.get_all(self._topic))
+        self.assertTrue(self.servicegroup_api.service_is_up(stale_ref))
+        self.assertEqual(1, driver.cache.get_stats()['loads'])
+
+        # The heartbeats are loaded again once they are older than the ttl
+        timeutils.advance_time_seconds(10)
+        self.assertEqual([], self.servicegroup_api.get_all(self._topic))
+        stats = driver.cache.get_stats()
+        self.assertEqual(2, stats['loads'])
+        self.assertEqual(3, stats['services'])
+        self.assertEqual(0, stats['age'])
+
+    def test_liveness_cache_skips_disabled(self):
+        self.flags(servicegroup_db_cache_ttl=10)
+        servicegroup.API._driver = None
+        self.servicegroup_api = servicegroup.API()
+
+        for host in ('host1', 'host2'):
+            db.service_create(self._ctx, {'host': host,
+                                          'binary': self._binary,
+                                          'topic': self._topic})
+        service_ref = db.service_get_by_args(self._ctx, 'host2',
+                                             self._binary)
+        db.service_update(self._ctx, service_ref['id'], {'disabled': True})
+
+        self.assertEqual(['host1'], self.servicegroup_api.get_all(self._topic))
+        # A disabled service is still up, as without the cache
+        self.assertTrue(self.servicegroup_api.service_is_up(service_ref))
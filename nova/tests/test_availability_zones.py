@@ -218,3 +218,58 @@ class AvailabilityZoneTestCases(test.TestCase):
 
         self.assertEqual(self.availability_zone,
                 az.get_instance_availability_zone(self.context, fake_inst))
+
+    def test_get_hosts_availability_zones(self):
+        service = self._create_service_with_topic('compute', self.host)
+        self._add_to_aggregate(service, self.agg)
+
+        self.assertEqual({}, az.get_hosts_availability_zones(self.context,
+                                                             []))
+        self.assertEqual({self.host: self.availability_zone,
+                          'other-host': self.default_az},
+                         az.get_hosts_availability_zones(self.context,
+                                [self.host, 'other-host', self.host]))
+
+    def test_get_hosts_availability_zones_cached(self):
+        self.flags(availability_zone_map_ttl=600)
+        az._reset_cache()
+        self.addCleanup(az._reset_cache)
+        service = self._create_service_with_topic('compute', self.host)
+        self._add_to_aggregate(service, self.agg)
+
+        calls = []
+        orig_get = db.aggregate_host_get_by_metadata_key
+
+        def fake_get(context, key):
+            calls.append(key)
+            return orig_get(context, key)
+
+        self.stubs.Set(db, 'aggregate_host_get_by_metadata_key', fake_get)
+
+        self.assertEqual(self.availability_zone,
+                az.get_host_availability_zone(self.context, self.host))
+        self._delete_from_aggregate(service, self.agg)
+        # The map is only reloaded once it's invalidated
+        self.assertEqual({self.host: self.availability_zone},
+                         az.get_hosts_availability_zones(self.context,
+                                                         [self.host]))
+        self.assertEqual(1, len(calls))
+        az.reset_zone_map()
+        self.assertEqual({self.host: self.default_az},
+                         az.get_hosts_availability_zones(self.context,
+                                                         [self.host]))
+        self.assertEqual(2, len(calls))
+
+    def test_get_instances_availability_zones(self):
+        host = 'host170'
+        service = self._create_service_with_topic('compute', host)
+        self._add_to_aggregate(service, self.agg)
+        inst1 = fakes.stub_instance(1, host=host)
+        inst2 = fakes.stub_instance(2, host=self.host)
+        inst3 = fakes.stub_instance(3, host='')
+
+        self.assertEqual({inst1['uuid']: self.availability_zone,
+                          inst2['uuid']: self.default_az,
+                          inst3['uuid']: None},
+                         az.get_instances_availability_zones(self.context,
+                                [inst1, inst2, inst3]))
@@ -253,3 +253,69 @@ class IptablesManagerTestCase(test.TestCase):
                                                self.manager.ipv4['filter'],
                                                'filter')
         self.assertEqual(current_lines, new_lines)
+
+    def test_top_rules_keep_counters(self):
+        current_lines = [line.replace('[0:0] -A FORWARD -j nova-filter-top',
+                                      '[5:10] -A FORWARD -j nova-filter-top')
+                         for line in self.sample_filter]
+        new_lines = self.manager._modify_rules(current_lines,
+                                               self.manager.ipv4['filter'],
+                                               'filter')
+        self.assertTrue('[5:10] -A FORWARD -j nova-filter-top' in new_lines)
+        self.assertFalse('[0:0] -A FORWARD -j nova-filter-top' in new_lines)
+
+    def _apply(self):
+        calls = []
+
+        def fake_execute(*cmd, **kwargs):
+            calls.append((cmd, kwargs.get('process_input')))
+            if cmd[0] == 'iptables-save':
+                return '\n'.join(self.sample_filter + self.sample_nat), None
+            return '', None
+
+        self.manager.execute = fake_execute
+        self.manager._apply()
+        return calls
+
+    def test_apply_incremental(self):
+        self.flags(iptables_incremental_apply=True, use_ipv6=False)
+        table = self.manager.ipv4['nat']
+
+        calls = self._apply()
+        self.assertEqual([('iptables-save', '-c'), ('iptables-restore', '-c')],
+                         [cmd for cmd, process_input in calls])
+
+        table.add_rule('float-snat', '-s 10.0.0.1 -j SNAT --to 10.10.10.10')
+        calls = self._apply()
+        self.assertEqual([(('iptables-restore', '-c', '--noflush'),
+                           '*nat\n'
+                           ':%(bn)s-float-snat - [0:0]\n'
+                           '[0:0] -A %(bn)s-float-snat -s 10.0.0.1 '
+                           '-j SNAT --to 10.10.10.10\n'
+                           'COMMIT' % {'bn': self.binary_name})], calls)
+
+        self.assertEqual([], self._apply())
+
+        table.add_chain('test')
+        table.add_rule('snat', '-j $test')
+        self._apply()
+        table.remove_chain('test')
+        calls = self._apply()
+        self.assertEqual(1, len(calls))
+        process_input = calls[0][1].split('\n')
+        self.assertTrue(':%s-test - [0:0]' % self.binary_name in
+                        process_input)
+        self.assertTrue(':%s-snat - [0:0]' % self.binary_name in
+                        process_input)
+        self.assertEqual(['-X %s-test' % self.binary_name, 'COMMIT'],
+                         process_input[-2:])
+
+    def test_apply_incremental_shared_chain_changed(self):
+        self.flags(iptables_incremental_apply=True, use_ipv6=False)
+        self._apply()
+
+        self.manager.ipv4['filter'].add_rule('FORWARD', '-j ACCEPT',
+                                             wrap=False)
+        calls = self._apply()
+        self.assertEqual([('iptables-save', '-c'), ('iptables-restore', '-c')],
+                         [cmd for cmd, process_input in calls])
@@ -18,8 +18,16 @@
 Unit Tests for nova.manager
 """
 
+import datetime
+
+import eventlet
+
+from nova import context
 from nova import manager
+from nova.openstack.common import periodic_task
+from nova.openstack.common import timeutils
 from nova import test
+from nova import utils
 
 
 class ManagerTestCase(test.TestCase):
@@ -33,3 +41,95 @@ class ManagerTestCase(test.TestCase):
 
         self.assertEqual(len(dispatch.callbacks), 3)
         self.assertTrue(api in dispatch.callbacks)
+
+
+class FakeManager(manager.Manager):
+    def __init__(self, *args, **kwargs):
+        super(FakeManager, self).__init__(*args, **kwargs)
+        self.calls = []
+        self.slow_done = eventlet.event.Event()
+
+    @periodic_task.periodic_task
+    def fast_task(self, context):
+        self.calls.append('fast_task')
+
+    @periodic_task.periodic_task
+    def slow_task(self, context):
+        self.calls.append('slow_task')
+        self.slow_done.wait()
+
+    @periodic_task.periodic_task
+    def failing_task(self, context):
+        raise test.TestingException()
+
+
+class SpacedManager(manager.Manager):
+    @periodic_task.periodic_task(spacing=10, run_immediately=True)
+    def spaced_task(self, context):
+        pass
+
+
+class PeriodicTaskSchedulerTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(PeriodicTaskSchedulerTestCase, self).setUp()
+        self.flags(periodic_tasks_parallel=True)
+        self.context = context.get_admin_context()
+
+    def test_slow_task_does_not_block_others(self):
+        m = FakeManager()
+        m.periodic_tasks(self.context)
+        eventlet.sleep(0)
+        self.assertEqual(['fast_task', 'slow_task'], sorted(m.calls))
+
+        # slow_task is still running, so only fast_task runs again
+        m.periodic_tasks(self.context)
+        eventlet.sleep(0)
+        self.assertEqual(['fast_task', 'fast_task', 'slow_task'],
+                         sorted(m.calls))
+
+        m.slow_done.send()
+        eventlet.sleep(0)
+        stats = m.get_periodic_task_stats()
+        self.assertEqual(2, stats['fast_task']['runs'])
+        self.assertEqual(0, stats['fast_task']['overruns'])
+        self.assertEqual(1, stats['slow_task']['runs'])
+        self.assertEqual(1, stats['slow_task']['overruns'])
+        self.assertEqual(2, stats['failing_task']['runs'])
+        self.assertEqual(2, stats['failing_task']['failures'])
+        self.assertEqual(2, stats['fast_task']['histogram']['<=0.1'])
+        self.assertEqual(0, stats['fast_task']['histogram']['>300'])
+
+    def test_raise_on_error_runs_serially(self):
+        m = FakeManager()
+        m.slow_done.send()
+        self.assertRaises(test.TestingException, m.periodic_tasks,
+                          self.context, raise_on_error=True)
+        self.assertEqual({}, m.get_periodic_task_stats())
+
+    def test_spacing_follows_deadlines(self):
+        self.useFixture(test.TimeOverride())
+        self.spawned = []
+        self.stubs.Set(utils, 'spawn_n',
+                       lambda func, *args: self.spawned.append(args[1]))
+        m = SpacedManager()
+        start = timeutils.utcnow()
+
+        self.assertEqual(10, m.periodic_tasks(self.context))
+        self.assertEqual(start, m._periodic_last_run['spaced_task'])
+        running = m._get_periodic_task_scheduler()._running
+        running.clear()
+
+        # Noticed late, the next run is still due 10 seconds after the
+        # previous one was due
+        timeutils.advance_time_seconds(13)
+        m.periodic_tasks(self.context)
+        self.assertEqual(start + datetime.timedelta(seconds=10),
+                         m._periodic_last_run['spaced_task'])
+
+        # Unless more than a whole period was missed
+        running.clear()
+        timeutils.advance_time_seconds(30)
+        m.periodic_tasks(self.context)
+        self.assertEqual(timeutils.utcnow(),
+                         m._periodic_last_run['spaced_task'])
+        self.assertEqual(['spaced_task'] * 3, self.spawned)
@@ -16,14 +16,17 @@
 #    under the License.
 
 import fixtures
+import mox
 import StringIO
 import sys
 
 from nova.cmd import manage
+from nova.compute import flavors
 from nova import context
 from nova import db
 from nova import exception
 from nova.openstack.common.gettextutils import _
+from nova.scheduler import rpcapi as scheduler_rpcapi
 from nova import test
 from nova.tests.db import fakes as db_fakes
 
@@ -58,6 +61,20 @@ class FixedIpCommandsTestCase(test.TestCase):
         self.commands.list()
         self.assertTrue(sys.stdout.getvalue().find('192.168.0.100') != -1)
 
+    def test_list_with_instance(self):
+        db.instance_create(context.get_admin_context(),
+                           {'uuid': db_fakes.fixed_ip_fields['instance_uuid'],
+                            'hostname': 'fake-hostname',
+                            'host': 'fake-host'})
+        self.useFixture(fixtures.MonkeyPatch('sys.stdout',
+                                             StringIO.StringIO()))
+        self.commands.list()
+        output = sys.stdout.getvalue()
+        self.assertIn('192.168.0.100', output)
+        self.assertIn('fake-hostname', output)
+        self.assertIn('fake-host', output)
+        self.assertNotIn('WARNING', output)
+
     def test_list_just_one_host(self):
         def fake_fixed_ip_get_by_host(*args, **kwargs):
             return [db_fakes.fixed_ip_fields]
@@ -384,6 +401,38 @@ class ProjectCommandsTestCase(test.TestCase):
         self.assertEqual(2, self.commands.quota('admin', 'volumes1', '10'))
 
 
+class VmCommandsTestCase(test.TestCase):
+    def setUp(self):
+        super(VmCommandsTestCase, self).setUp()
+        self.commands = manage.VmCommands()
+        ctxt = context.get_admin_context()
+        flavor = flavors.get_flavor_by_name('m1.tiny')
+        for name, host in (('vm1', 'host1'), ('vm2', 'host2')):
+            db.instance_create(ctxt, {
+                    'display_name': name,
+                    'host': host,
+                    'vm_state': 'active',
+                    'launch_index': 0,
+                    'system_metadata': flavors.save_flavor_info({}, flavor)})
+
+    def test_list(self):
+        self.useFixture(fixtures.MonkeyPatch('sys.stdout',
+                                             StringIO.StringIO()))
+        self.commands.list()
+        result = sys.stdout.getvalue()
+        self.assertTrue('vm1' in result)
+        self.assertTrue('vm2' in result)
+        self.assertTrue('m1.tiny' in result)
+
+    def test_list_just_one_host(self):
+        self.useFixture(fixtures.MonkeyPatch('sys.stdout',
+                                             StringIO.StringIO()))
+        self.commands.list('host1')
+        result = sys.stdout.getvalue()
+        self.assertTrue('vm1' in result)
+        self.assertFalse('vm2' in result)
+
+
 class DBCommandsTestCase(test.TestCase):
     def setUp(self):
         super(DBCommandsTestCase, self).setUp()
@@ -403,3 +452,32 @@ class ServiceCommandsTestCase(test.TestCase):
 
     def test_service_disable_invalid_params(self):
         self.assertEqual(2, self.commands.disable('nohost', 'noservice'))
+
+
+class SchedulerCommandsTestCase(test.TestCase):
+    def setUp(self):
+        super(SchedulerCommandsTestCase, self).setUp()
+        self.commands = manage.SchedulerCommands()
+        self.useFixture(fixtures.MonkeyPatch('sys.stdout',
+                                             StringIO.StringIO()))
+
+    def test_stats(self):
+        stats = {'requests': 4, 'elapsed': 2.0, 'max_elapsed': 1.0,
+                 'db_queries': 8, 'phases': {'filtering': 1.5},
+                 'filters': {'RamFilter': {'calls': 4, 'time': 1.2,
+                                           'hosts_in': 400,
+                                           'hosts_out': 40}},
+                 'weighers': {'RAMWeigher': {'calls': 4, 'time': 0.2,
+                                             'hosts': 40}}}
+        self.mox.StubOutWithMock(scheduler_rpcapi.SchedulerAPI,
+                                 'get_request_stats')
+        scheduler_rpcapi.SchedulerAPI.get_request_stats(
+                mox.IgnoreArg(), host='fake_host').AndReturn(stats)
+        self.mox.ReplayAll()
+
+        self.commands.stats(host='fake_host')
+        output = sys.stdout.getvalue()
+        self.assertIn('average: 500.0ms', output)
+        self.assertIn('db queries per request: 2.0', output)
+        self.assertIn('RamFilter', output)
+        self.assertIn('RAMWeigher', output)
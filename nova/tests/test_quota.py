@@ -1751,6 +1751,32 @@ class DbQuotaDriverTestCase(test.TestCase):
                 ])
         self.assertEqual(result, ['resv-1', 'resv-2', 'resv-3'])
 
+    def test_reserve_conditional(self):
+        def fake_quota_reserve_conditional(context, resources, quotas,
+                                           user_quotas, deltas, expire,
+                                           until_refresh, max_age,
+                                           project_id=None, user_id=None,
+                                           retries=3):
+            self.calls.append(('quota_reserve_conditional', expire, retries))
+            return ['resv-1']
+
+        self._stub_get_project_quotas()
+        self._stub_quota_reserve()
+        self.stubs.Set(db, 'quota_reserve_conditional',
+                       fake_quota_reserve_conditional)
+        self.flags(quota_conditional_reserve=True,
+                   quota_conditional_reserve_retries=5)
+        expire = timeutils.utcnow() + datetime.timedelta(seconds=120)
+        result = self.driver.reserve(FakeContext('test_project', 'test_class'),
+                                     quota.QUOTAS._resources,
+                                     dict(instances=2), expire=expire)
+
+        self.assertEqual(self.calls, [
+                'get_project_quotas',
+                ('quota_reserve_conditional', expire, 5),
+                ])
+        self.assertEqual(result, ['resv-1'])
+
     def test_usage_reset(self):
         calls = []
 
@@ -2402,6 +2428,82 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
                 ])
 
 
+class QuotaReserveConditionalTestCase(test.TestCase):
+    def setUp(self):
+        super(QuotaReserveConditionalTestCase, self).setUp()
+        self.context = context.get_admin_context()
+        self.expire = timeutils.utcnow() + datetime.timedelta(seconds=3600)
+        self.resources = {
+            'instances': quota.ReservableResource('instances',
+                                                  '_sync_instances'),
+            'cores': quota.ReservableResource('cores', '_sync_instances'),
+            }
+        self.quotas = dict(instances=5, cores=10)
+        for resource, in_use in (('instances', 2), ('cores', 4)):
+            sqa_api._quota_usage_create(self.context, 'project1', 'user1',
+                                        resource, in_use, 0, None)
+
+    def _reserve(self, deltas, quotas=None, user_quotas=None, **kwargs):
+        return sqa_api.quota_reserve_conditional(self.context,
+                self.resources, quotas or self.quotas,
+                user_quotas or self.quotas, deltas, self.expire, 0, 0,
+                project_id='project1', user_id='user1', **kwargs)
+
+    def _get_usages(self, user_id='user1'):
+        return dict((row.resource, (row.in_use, row.reserved)) for row in
+                    sqa_api.model_query(self.context, sqa_models.QuotaUsage).
+                    filter_by(user_id=user_id))
+
+    def test_reserve(self):
+        self.mox.StubOutWithMock(sqa_api, 'quota_reserve')
+        self.mox.ReplayAll()
+
+        result = self._reserve(dict(instances=2, cores=4))
+
+        self.assertEqual(2, len(result))
+        self.assertEqual(dict(instances=(2, 2), cores=(4, 4)),
+                         self._get_usages())
+        deltas = dict((res['resource'], res['delta']) for res in
+                      [db.reservation_get(self.context, uuid)
+                       for uuid in result])
+        self.assertEqual(dict(instances=2, cores=4), deltas)
+
+    def test_reserve_reduction(self):
+        result = self._reserve(dict(instances=-1, cores=-2))
+
+        self.assertEqual(2, len(result))
+        self.assertEqual(dict(instances=(2, 0), cores=(4, 0)),
+                         self._get_usages())
+
+    def test_reserve_over_user_quota(self):
+        self.assertRaises(exception.OverQuota, self._reserve,
+                          dict(instances=1, cores=7))
+        self.assertEqual(dict(instances=(2, 0), cores=(4, 0)),
+                         self._get_usages())
+
+    def test_reserve_over_project_quota(self):
+        sqa_api._quota_usage_create(self.context, 'project1', 'user2',
+                                    'instances', 2, 1, None)
+        self.assertRaises(exception.OverQuota, self._reserve,
+                          dict(instances=1, cores=1), retries=2)
+        self.assertEqual(dict(instances=(2, 0), cores=(4, 0)),
+                         self._get_usages())
+
+    def test_reserve_unlimited(self):
+        self._reserve(dict(instances=10), user_quotas=dict(instances=-1))
+        self.assertEqual((2, 10), self._get_usages()['instances'])
+
+    def test_reserve_missing_usage_uses_quota_reserve(self):
+        self.mox.StubOutWithMock(sqa_api, 'quota_reserve')
+        sqa_api.quota_reserve(self.context, self.resources, self.quotas,
+                              self.quotas, dict(ram=1), self.expire, 0, 0,
+                              project_id='project1',
+                              user_id='user1').AndReturn(['resv-1'])
+        self.mox.ReplayAll()
+
+        self.assertEqual(['resv-1'], self._reserve(dict(ram=1)))
+
+
 class NoopQuotaDriverTestCase(test.TestCase):
     def setUp(self):
         super(NoopQuotaDriverTestCase, self).setUp()
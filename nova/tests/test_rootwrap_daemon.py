@@ -0,0 +1,128 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for nova-rootwrap-daemon and its client."""
+
+import os
+import shutil
+import socket
+import tempfile
+import threading
+
+from nova.openstack.common import processutils
+from nova.openstack.common.rootwrap import cmd
+from nova.openstack.common.rootwrap import wrapper
+from nova import rootwrap_daemon
+from nova import test
+from nova import utils
+
+
+class FakeRootwrapConfig(object):
+    exec_dirs = ['/bin', '/usr/bin']
+    use_syslog = False
+
+
+class RootwrapDaemonTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(RootwrapDaemonTestCase, self).setUp()
+        socket_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, socket_dir)
+        self.socket_path = os.path.join(socket_dir,
+                                        rootwrap_daemon.SOCKET_NAME)
+
+        filters = [wrapper.build_filter('CommandFilter', '/bin/echo', 'root'),
+                   wrapper.build_filter('CommandFilter', '/bin/cat', 'root')]
+        self.server = rootwrap_daemon.RootwrapServer(self.socket_path,
+                                                     FakeRootwrapConfig(),
+                                                     filters, os.getuid())
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.client = utils.RootwrapDaemonClient('/fake/rootwrap.conf')
+        self.starts = 0
+
+        def fake_start_daemon():
+            self.starts += 1
+            self.client._socket_path = self.socket_path
+
+        self.stubs.Set(self.client, '_start_daemon', fake_start_daemon)
+
+    def test_execute(self):
+        self.assertEqual((0, 'foo bar\n', ''),
+                         self.client.execute(['echo', 'foo', 'bar']))
+        self.assertEqual((0, '\x00\xff', ''),
+                         self.client.execute(['cat'], '\x00\xff'))
+        self.assertEqual(1, self.starts)
+
+    def test_execute_unauthorized(self):
+        returncode, stdout, stderr = self.client.execute(['rm', '-rf', '/'])
+        self.assertEqual(cmd.RC_UNAUTHORIZED, returncode)
+        self.assertIn('Unauthorized command: rm -rf /', stderr)
+
+    def test_execute_restarts_daemon(self):
+        self.client._socket_path = self.socket_path + '.gone'
+        self.assertEqual((0, 'foo\n', ''), self.client.execute(['echo',
+                                                                'foo']))
+        self.assertEqual(1, self.starts)
+
+    def test_execute_command_exception(self):
+        def fake_run_command(userargs, process_input=None):
+            raise OSError('fake error')
+
+        self.stubs.Set(self.server, 'run_command', fake_run_command)
+        returncode, stdout, stderr = self.client.execute(['echo', 'foo'])
+        self.assertEqual(rootwrap_daemon.RC_EXCEPTION, returncode)
+        self.assertIn('fake error', stderr)
+
+    def test_execute_daemon_dies(self):
+        self.client._socket_path = self.socket_path
+        self.client._process = self.mox.CreateMockAnything()
+        self.client._process.stdin = self.mox.CreateMockAnything()
+        self.client._process.stdin.close()
+        self.client._process.wait().AndReturn(0)
+        self.mox.ReplayAll()
+
+        # The daemon closes the connection without answering
+        client_sock, daemon_sock = socket.socketpair()
+        daemon_sock.close()
+        self.stubs.Set(self.client, '_connect',
+                       lambda: (client_sock, self.socket_path))
+
+        self.assertRaises(processutils.ProcessExecutionError,
+                          self.client.execute, ['echo', 'foo'])
+        self.assertEqual(None, self.client._socket_path)
+        self.assertEqual(None, self.client._process)
+
+    def test_utils_execute(self):
+        self.flags(use_rootwrap_daemon=True)
+        self.stubs.Set(utils, '_ROOTWRAP_DAEMON_CLIENT', self.client)
+        self.stubs.Set(os, 'geteuid', lambda: 1000)
+
+        self.assertEqual(('foo\n', ''),
+                         utils.execute('echo', 'foo', run_as_root=True))
+        self.assertEqual(('bar', ''),
+                         utils.execute('cat', process_input='bar',
+                                       run_as_root=True))
+        exc = self.assertRaises(processutils.ProcessExecutionError,
+                                utils.execute, 'ls', run_as_root=True)
+        self.assertEqual(cmd.RC_UNAUTHORIZED, exc.exit_code)
+        stdout, stderr = utils.execute('ls', run_as_root=True,
+                                       check_exit_code=False)
+        self.assertEqual('', stdout)
+        self.assertIn('Unauthorized command: ls', stderr)
@@ -90,6 +90,14 @@ VIR_DOMAIN_AFFECT_CURRENT = 0
 VIR_DOMAIN_AFFECT_LIVE = 1
 VIR_DOMAIN_AFFECT_CONFIG = 2
 
+VIR_DOMAIN_STATS_STATE = 1
+VIR_DOMAIN_STATS_BALLOON = 4
+VIR_DOMAIN_STATS_VCPU = 8
+VIR_DOMAIN_STATS_INTERFACE = 16
+VIR_DOMAIN_STATS_BLOCK = 32
+
+VIR_CONNECT_GET_ALL_DOMAINS_STATS_ACTIVE = 1
+
 VIR_CPU_COMPARE_ERROR = -1
 VIR_CPU_COMPARE_INCOMPATIBLE = 0
 VIR_CPU_COMPARE_IDENTICAL = 1
@@ -276,6 +284,10 @@ class Domain(object):
                 if mac is not None:
                     nic_info['mac'] = mac.get('address')
 
+                target = nic.find('./target')
+                if target is not None:
+                    nic_info['target_dev'] = target.get('dev')
+
                 source = nic.find('./source')
                 if source is not None:
                     if nic_info['type'] == 'network':
@@ -385,12 +397,16 @@ class Domain(object):
 
         nics = ''
         for nic in self._def['devices']['nics']:
+            target = ''
+            if nic.get('target_dev'):
+                target = "<target dev='%s'/>" % nic['target_dev']
             nics += '''<interface type='%(type)s'>
       <mac address='%(mac)s'/>
       <source %(type)s='%(source)s'/>
+      %(target)s
       <address type='pci' domain='0x0000' bus='0x00' slot='0x03'
                function='0x0'/>
-    </interface>''' % nic
+    </interface>''' % dict(nic, target=target)
 
         return '''<domain type='kvm'>
   <name>%(name)s</name>
@@ -887,6 +903,47 @@ class Connection(object):
     def listDefinedDomains(self):
         return []
 
+    def listAllDomains(self, flags=0):
+        return self._vms.values()
+
+    def getAllDomainStats(self, stats=0, flags=0):
+        result = []
+        for dom in self._vms.values():
+            if (flags & VIR_CONNECT_GET_ALL_DOMAINS_STATS_ACTIVE and
+                    not dom.isActive()):
+                continue
+            record = {}
+            if stats & VIR_DOMAIN_STATS_STATE:
+                record.update({'state.state': dom._state, 'state.reason': 0})
+            if stats & VIR_DOMAIN_STATS_BALLOON:
+                record['balloon.current'] = dom.info()[2]
+            if stats & VIR_DOMAIN_STATS_VCPU:
+                vcpus = dom.vcpus()[0]
+                record['vcpu.current'] = len(vcpus)
+                for i, vcpu in enumerate(vcpus):
+                    record['vcpu.%d.time' % i] = vcpu[2]
+            if stats & VIR_DOMAIN_STATS_BLOCK:
+                disks = dom._def['devices'].get('disks', [])
+                record['block.count'] = len(disks)
+                for i, disk in enumerate(disks):
+                    record['block.%d.name' % i] = disk.get('target_dev')
+                    values = dom.blockStats(disk.get('target_dev'))
+                    for key, value in zip(('rd.reqs', 'rd.bytes', 'wr.reqs',
+                                           'wr.bytes', 'errs'), values):
+                        record['block.%d.%s' % (i, key)] = value
+            if stats & VIR_DOMAIN_STATS_INTERFACE:
+                nics = dom._def['devices'].get('nics', [])
+                record['net.count'] = len(nics)
+                for i, nic in enumerate(nics):
+                    record['net.%d.name' % i] = nic.get('target_dev')
+                    values = dom.interfaceStats(nic.get('target_dev'))
+                    for key, value in zip(('rx.bytes', 'rx.pkts', 'rx.errs',
+                                           'rx.drop', 'tx.bytes', 'tx.pkts',
+                                           'tx.errs', 'tx.drop'), values):
+                        record['net.%d.%s' % (i, key)] = value
+            result.append((dom, record))
+        return result
+
 
 def openReadOnly(uri):
     return Connection(uri, readonly=True)
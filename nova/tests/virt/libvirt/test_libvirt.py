@@ -44,12 +44,14 @@ from nova.openstack.common import importutils
 from nova.openstack.common import jsonutils
 from nova.openstack.common import loopingcall
 from nova.openstack.common import processutils
+from nova.openstack.common import timeutils
 from nova.openstack.common import uuidutils
 from nova import test
 from nova.tests import fake_network
 import nova.tests.image.fake
 from nova.tests import matchers
 from nova.tests.virt.libvirt import fake_libvirt_utils
+from nova.tests.virt.libvirt import fakelibvirt
 from nova import utils
 from nova import version
 from nova.virt.disk import api as disk
@@ -1120,6 +1122,69 @@ class LibvirtConnTestCase(test.TestCase):
         # Only one defined domain should be listed
         self.assertEquals(len(instances), 1)
 
+    def _test_get_power_states(self, conn_class, gone_domain=False):
+        class FakeDomain(object):
+            def __init__(self, name, state):
+                self._name = name
+                self._state = state
+
+            def name(self):
+                return self._name
+
+            def info(self):
+                if self._state is None:
+                    raise libvirt.libvirtError('Domain not found')
+                return [self._state, 2048, 2048, 1, 0]
+
+        domains = [FakeDomain('instance-1', libvirt.VIR_DOMAIN_RUNNING),
+                   FakeDomain('instance-2', libvirt.VIR_DOMAIN_SHUTOFF),
+                   FakeDomain('unknown', libvirt.VIR_DOMAIN_RUNNING)]
+        if gone_domain:
+            domains.insert(1, FakeDomain('instance-3', None))
+        self.stubs.Set(libvirt_driver.LibvirtDriver, '_conn',
+                       conn_class(domains))
+        self.stubs.Set(libvirt_driver.LibvirtDriver, 'get_info',
+                       lambda *a: self.fail('get_info should not be called'))
+
+        conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        instances = [{'name': 'instance-1', 'uuid': 'uuid1'},
+                     {'name': 'instance-2', 'uuid': 'uuid2'},
+                     {'name': 'instance-3', 'uuid': 'uuid3'}]
+        self.assertEqual({'uuid1': power_state.RUNNING,
+                          'uuid2': power_state.SHUTDOWN},
+                         conn.get_power_states(instances))
+
+    def test_get_power_states_all_domain_stats(self):
+        class FakeConn(object):
+            def __init__(self, domains):
+                self.domains = domains
+
+            def getAllDomainStats(self, stats, flags=0):
+                return [(dom, {'state.state': dom._state})
+                        for dom in self.domains]
+
+        self._test_get_power_states(FakeConn)
+
+    def test_get_power_states_list_all_domains(self):
+        class FakeConn(object):
+            def __init__(self, domains):
+                self.domains = domains
+
+            def listAllDomains(self, flags=0):
+                return self.domains
+
+        self._test_get_power_states(FakeConn)
+
+    def test_get_power_states_list_all_domains_gone(self):
+        class FakeConn(object):
+            def __init__(self, domains):
+                self.domains = domains
+
+            def listAllDomains(self, flags=0):
+                return self.domains
+
+        self._test_get_power_states(FakeConn, gone_domain=True)
+
     def test_list_instances_when_instance_deleted(self):
 
         def fake_lookup(instance_name):
@@ -3464,6 +3529,141 @@ class LibvirtConnTestCase(test.TestCase):
         result = conn.get_disk_over_committed_size_total()
         self.assertEqual(result, 10653532160)
 
+    def test_disk_info_cache(self):
+        calls = []
+
+        def fake_get_disk_info(path, disk_type):
+            calls.append(path)
+            return os.path.getsize(path), 10737418240, 'backing'
+
+        self.stubs.Set(libvirt_driver, '_get_disk_info', fake_get_disk_info)
+        cache = libvirt_driver.DiskInfoCache()
+
+        with utils.tempdir() as tmpdir:
+            path1 = os.path.join(tmpdir, 'disk1')
+            path2 = os.path.join(tmpdir, 'disk2')
+            for path in (path1, path2):
+                with open(path, 'w') as f:
+                    f.write('data')
+
+            info = cache.get_disk_info(path1, 'qcow2')
+            self.assertEqual((4, 10737418240, 'backing'), info)
+            self.assertEqual(info, cache.get_disk_info(path1, 'qcow2'))
+            cache.get_disk_info(path2, 'qcow2')
+            self.assertEqual([path1, path2], calls)
+            self.assertEqual((1, 2), (cache.hits, cache.misses))
+
+            # a changed disk is looked up again:
+            with open(path1, 'a') as f:
+                f.write('more data')
+            self.assertEqual(13, cache.get_disk_info(path1, 'qcow2')[0])
+            self.assertEqual([path1, path2, path1], calls)
+
+            # disks not looked up since the last prune are dropped:
+            cache.prune()
+            cache.get_disk_info(path1, 'qcow2')
+            cache.prune()
+            cache.get_disk_info(path2, 'qcow2')
+            self.assertEqual([path1, path2, path1, path2], calls)
+            self.assertEqual((2, 4), (cache.hits, cache.misses))
+
+    def _create_stats_connection(self):
+        xml = """
+            <domain type='kvm'>
+                <name>%s</name>
+                <uuid>%s</uuid>
+                <memory>%d</memory>
+                <vcpu>%d</vcpu>
+                <os>
+                    <type arch='x86_64'>hvm</type>
+                </os>
+                <devices>
+                    <disk type='file' device='disk'>
+                        <driver name='qemu' type='raw'/>
+                        <source file='filename'/>
+                        <target dev='vda' bus='virtio'/>
+                    </disk>
+                    <interface type='bridge'>
+                        <mac address='52:54:00:a4:38:38'/>
+                        <source bridge='br100'/>
+                        <target dev='vnet0'/>
+                    </interface>
+                </devices>
+            </domain>
+            """
+        libvirt_conn = fakelibvirt.Connection('qemu:///system', False)
+        libvirt_conn.createXML(xml % ('instance-1', uuidutils.generate_uuid(),
+                                      1048576, 2), 0)
+        libvirt_conn.createXML(xml % ('instance-2', uuidutils.generate_uuid(),
+                                      2097152, 4), 0)
+        libvirt_conn.defineXML(xml % ('instance-3', uuidutils.generate_uuid(),
+                                      2097152, 8))
+        return libvirt_conn
+
+    def test_domain_stats_snapshot(self):
+        self.flags(libvirt_domain_stats_ttl=60)
+        libvirt_conn = self._create_stats_connection()
+        self.stubs.Set(libvirt_driver.LibvirtDriver, '_conn', libvirt_conn)
+        conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+
+        calls = []
+        orig_get_all_domain_stats = libvirt_conn.getAllDomainStats
+
+        def fake_get_all_domain_stats(stats, flags=0):
+            calls.append(stats)
+            return orig_get_all_domain_stats(stats, flags)
+
+        self.stubs.Set(libvirt_conn, 'getAllDomainStats',
+                       fake_get_all_domain_stats)
+        self.stubs.Set(libvirt_conn, 'lookupByID',
+                       lambda *a: self.fail('lookupByID should not be called'))
+
+        self.assertEqual(6, conn.get_vcpu_used())
+        self.assertEqual(libvirt_conn.lookupByName('instance-1').blockStats(
+                             'vda'),
+                         list(conn.block_stats('instance-1', 'vda')))
+        self.assertEqual(
+            libvirt_conn.lookupByName('instance-2').interfaceStats('vnet0'),
+            list(conn.interface_stats('instance-2', 'vnet0')))
+        diags = conn.get_diagnostics({'name': 'instance-2'})
+        self.assertEqual(120405L, diags['cpu3_time'])
+        self.assertEqual(34, diags['vda_errors'])
+        self.assertEqual(3, diags['vnet0_tx_drop'])
+        self.assertEqual(1, len(calls))
+
+        # the snapshot is collected again once it is too old:
+        self.addCleanup(timeutils.clear_time_override)
+        timeutils.set_time_override(timeutils.utcnow())
+        timeutils.advance_time_seconds(61)
+        self.assertEqual(6, conn.get_vcpu_used())
+        self.assertEqual(2, len(calls))
+
+    def test_domain_stats_snapshot_without_all_domain_stats(self):
+        class OldConnection(object):
+            def __init__(self, libvirt_conn):
+                self.libvirt_conn = libvirt_conn
+
+            def __getattr__(self, name):
+                if name == 'getAllDomainStats':
+                    raise AttributeError(name)
+                return getattr(self.libvirt_conn, name)
+
+        self.flags(libvirt_domain_stats_ttl=60)
+        libvirt_conn = self._create_stats_connection()
+        self.stubs.Set(libvirt_driver.LibvirtDriver, '_conn', libvirt_conn)
+        conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        expected = conn._domain_stats._collect()
+        self.assertEqual(['instance-1', 'instance-2'], sorted(expected))
+
+        self.stubs.Set(libvirt_driver.LibvirtDriver, '_conn',
+                       OldConnection(libvirt_conn))
+        domains = conn._domain_stats._collect()
+        # NOTE: fakelibvirt numbers domains differently in ID() and
+        # listDomainsID(), so the ids are left out of the comparison.
+        for stats in expected.values() + domains.values():
+            del stats['id']
+        self.assertEqual(expected, domains)
+
     def test_cpu_info(self):
         conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), True)
 
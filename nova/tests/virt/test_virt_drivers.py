@@ -474,6 +474,15 @@ class _VirtDriverTestCase(_FakeDriverBackendTestCase):
                           self.connection.get_info,
                           {'name': 'I just made this name up'})
 
+    @catch_notimplementederror
+    def test_get_power_states(self):
+        instance_ref, network_info = self._get_running_instance()
+        unknown = {'name': 'I just made this name up', 'uuid': 'fake-uuid'}
+        states = self.connection.get_power_states([instance_ref, unknown])
+        self.assertEqual(
+            {instance_ref['uuid']:
+                self.connection.get_info(instance_ref)['state']}, states)
+
     @catch_notimplementederror
     def test_get_diagnostics(self):
         instance_ref, network_info = self._get_running_instance()
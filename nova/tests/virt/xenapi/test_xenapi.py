@@ -392,6 +392,14 @@ class XenAPIVMTestCase(stubs.XenAPITestBase):
         self.assertEqual(len(uuids), len(instance_uuids))
         self.assertEqual(set(uuids), set(instance_uuids))
 
+    def test_get_power_states(self):
+        instance = self._create_instance(1)
+        self.mox.StubOutWithMock(self.conn._vmops, 'get_info')
+        self.mox.ReplayAll()
+        unknown = {'name': 'unknown', 'uuid': 'fake-uuid'}
+        states = self.conn.get_power_states([instance, unknown])
+        self.assertEqual({instance['uuid']: power_state.RUNNING}, states)
+
     def test_get_rrd_server(self):
         self.flags(xenapi_connection_url='myscheme://myaddress/')
         server_info = vm_utils._get_rrd_server()
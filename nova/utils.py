@@ -37,6 +37,8 @@ import time
 from xml.sax import saxutils
 
 import eventlet
+from eventlet.green import subprocess
+from eventlet import semaphore
 import netaddr
 
 from oslo.config import cfg
@@ -50,6 +52,7 @@ from nova.openstack.common import log as logging
 from nova.openstack.common import processutils
 from nova.openstack.common.rpc import common as rpc_common
 from nova.openstack.common import timeutils
+from nova import rootwrap_daemon
 
 notify_decorator = 'nova.openstack.common.notifier.api.notify_decorator'
 
@@ -76,6 +79,12 @@ utils_opts = [
                default="/etc/nova/rootwrap.conf",
                help='Path to the rootwrap configuration file to use for '
                     'running commands as root'),
+    cfg.BoolOpt('use_rootwrap_daemon',
+                default=False,
+                help='Run the commands which need root through a long '
+                     'running nova-rootwrap-daemon, started on first use, '
+                     'rather than through sudo nova-rootwrap for every '
+                     'command'),
     cfg.StrOpt('tempdir',
                default=None,
                help='Explicitly specify the temporary working directory'),
@@ -156,9 +165,148 @@ def vpn_ping(address, port, timeout=0.05, session_id=None):
         return server_sess
 
 
+class RootwrapDaemonClient(object):
+    """Runs commands as root through a nova-rootwrap-daemon.
+
+    The daemon is started with sudo the first time a command is run, and
+    again whenever it can't be reached anymore. It exits by itself once
+    the process which started it is gone.
+    """
+
+    def __init__(self, rootwrap_config):
+        self.rootwrap_config = rootwrap_config
+        self._process = None
+        self._socket_path = None
+        self._lock = semaphore.Semaphore()
+
+    def _start_daemon(self):
+        cmd = ['sudo', 'nova-rootwrap-daemon', self.rootwrap_config]
+        LOG.info(_('Starting %s'), ' '.join(cmd))
+        self._process = subprocess.Popen(cmd,
+                                         stdin=subprocess.PIPE,
+                                         stdout=subprocess.PIPE,
+                                         close_fds=True)
+        socket_path = self._process.stdout.readline().strip()
+        if not socket_path:
+            raise processutils.ProcessExecutionError(
+                    exit_code=self._process.wait(), cmd=' '.join(cmd),
+                    description=_('Failed to start nova-rootwrap-daemon'))
+        self._socket_path = socket_path
+
+    def _stop_daemon(self, socket_path):
+        with self._lock:
+            # Another greenthread may have restarted it already
+            if self._socket_path != socket_path:
+                return
+            self._socket_path = None
+            if self._process is not None:
+                # Closing its stdin makes the daemon exit, then sudo is
+                # reaped so it doesn't linger as a zombie
+                self._process.stdin.close()
+                self._process.wait()
+                self._process = None
+
+    def _connect(self):
+        with self._lock:
+            if self._socket_path is None:
+                self._start_daemon()
+            socket_path = self._socket_path
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(socket_path)
+        except socket.error:
+            sock.close()
+            self._stop_daemon(socket_path)
+            raise
+        return sock, socket_path
+
+    def execute(self, cmd, process_input=None):
+        """Run a command as root.
+
+        Returns the exit code, stdout and stderr of the command.
+        """
+        try:
+            sock, socket_path = self._connect()
+        except socket.error:
+            LOG.warn(_('nova-rootwrap-daemon is gone, restarting it'))
+            sock, socket_path = self._connect()
+        try:
+            rootwrap_daemon.send_message(sock, {
+                'cmd': cmd,
+                'stdin': rootwrap_daemon.encode_output(process_input)})
+            response = rootwrap_daemon.recv_message(sock)
+        except (EOFError, socket.error) as exc:
+            # The daemon died while running the command, the next one
+            # starts a new daemon
+            self._stop_daemon(socket_path)
+            raise processutils.ProcessExecutionError(
+                    cmd=' '.join(cmd),
+                    description=_('nova-rootwrap-daemon died: %s') % exc)
+        finally:
+            sock.close()
+        return (response['returncode'],
+                rootwrap_daemon.decode_output(response['stdout']),
+                rootwrap_daemon.decode_output(response['stderr']))
+
+
+_ROOTWRAP_DAEMON_CLIENT = None
+
+
+def _get_rootwrap_daemon_client():
+    global _ROOTWRAP_DAEMON_CLIENT
+    if _ROOTWRAP_DAEMON_CLIENT is None:
+        _ROOTWRAP_DAEMON_CLIENT = RootwrapDaemonClient(CONF.rootwrap_config)
+    return _ROOTWRAP_DAEMON_CLIENT
+
+
+def _execute_with_rootwrap_daemon(*cmd, **kwargs):
+    """Run a command as root with the same semantics as execute()."""
+    process_input = kwargs.pop('process_input', None)
+    check_exit_code = kwargs.pop('check_exit_code', [0])
+    ignore_exit_code = False
+    delay_on_retry = kwargs.pop('delay_on_retry', True)
+    attempts = kwargs.pop('attempts', 1)
+    kwargs.pop('run_as_root')
+
+    if isinstance(check_exit_code, bool):
+        ignore_exit_code = not check_exit_code
+        check_exit_code = [0]
+    elif isinstance(check_exit_code, int):
+        check_exit_code = [check_exit_code]
+
+    if kwargs:
+        raise processutils.UnknownArgumentError(_('Got unknown keyword args '
+                                                  'to utils.execute: %r') %
+                                                kwargs)
+
+    cmd = map(str, cmd)
+    client = _get_rootwrap_daemon_client()
+    while attempts > 0:
+        attempts -= 1
+        try:
+            LOG.debug(_('Running cmd (rootwrap daemon): %s'), ' '.join(cmd))
+            returncode, stdout, stderr = client.execute(cmd, process_input)
+            if returncode:
+                LOG.debug(_('Result was %s') % returncode)
+                if not ignore_exit_code and returncode not in check_exit_code:
+                    raise processutils.ProcessExecutionError(
+                            exit_code=returncode, stdout=stdout,
+                            stderr=stderr, cmd=' '.join(cmd))
+            return stdout, stderr
+        except processutils.ProcessExecutionError:
+            if not attempts:
+                raise
+            LOG.debug(_('%r failed. Retrying.'), cmd)
+            if delay_on_retry:
+                eventlet.sleep(random.randint(20, 200) / 100.0)
+
+
 def execute(*cmd, **kwargs):
     """Convenience wrapper around oslo's execute() method."""
     if 'run_as_root' in kwargs and not 'root_helper' in kwargs:
+        if (kwargs['run_as_root'] and CONF.use_rootwrap_daemon and
+                os.geteuid() != 0):
+            return _execute_with_rootwrap_daemon(*cmd, **kwargs)
         kwargs['root_helper'] = 'sudo nova-rootwrap %s' % CONF.rootwrap_config
     return processutils.execute(*cmd, **kwargs)
 
@@ -26,6 +26,7 @@ import sys
 
 from oslo.config import cfg
 
+from nova import exception
 from nova.openstack.common.gettextutils import _
 from nova.openstack.common import importutils
 from nova.openstack.common import log as logging
@@ -156,6 +157,25 @@ class ComputeDriver(object):
         # TODO(Vek): Need to pass context in for access to auth_token
         raise NotImplementedError()
 
+    def get_power_states(self, instances):
+        """Return the power state of each of the given instances.
+
+        Returns a dict mapping the uuid of each instance found on the
+        hypervisor to its power_state code.  Instances which are not found
+        are left out of the result.
+
+        This default implementation calls get_info() once per instance;
+        drivers which can list the state of all their virtual machines in
+        a single call should override it.
+        """
+        states = {}
+        for instance in instances:
+            try:
+                states[instance['uuid']] = self.get_info(instance)['state']
+            except exception.InstanceNotFound:
+                pass
+        return states
+
     def get_num_instances(self):
         """Return the total number of virtual machines.
 
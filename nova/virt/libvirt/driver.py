@@ -80,6 +80,7 @@ from nova.openstack.common import log as logging
 from nova.openstack.common import loopingcall
 from nova.openstack.common.notifier import api as notifier
 from nova.openstack.common import processutils
+from nova.openstack.common import timeutils
 from nova import utils
 from nova import version
 from nova.virt import configdrive
@@ -217,6 +218,18 @@ libvirt_opts = [
                 default=None,
                 help='Which pcpus can be used by vcpus of instance '
                      'e.g: "4-12,^8,15"'),
+    cfg.BoolOpt('libvirt_disk_info_cache',
+                default=False,
+                help='Cache the qemu-img info of instance disks, reusing it '
+                     'for as long as the inode, modification time and size '
+                     'of the disk file are unchanged'),
+    cfg.IntOpt('libvirt_domain_stats_ttl',
+               default=0,
+               help='Number of seconds for which the vcpu, memory, block '
+                    'and interface statistics of all domains, collected in '
+                    'a single pass, are used for resource reporting, block '
+                    'and interface stats and diagnostics. 0 looks up each '
+                    'domain for every request'),
     ]
 
 CONF = cfg.CONF
@@ -319,6 +332,8 @@ class LibvirtDriver(driver.ComputeDriver):
         self._wrapped_conn_lock = threading.Lock()
         self._caps = None
         self._vcpu_total = 0
+        self._disk_info_cache = DiskInfoCache()
+        self._domain_stats = DomainStatsSnapshot(self)
         self.read_only = read_only
         self.firewall_driver = firewall.load_driver(
             DEFAULT_FIREWALL_DRIVER,
@@ -2562,6 +2577,38 @@ class LibvirtDriver(driver.ComputeDriver):
                 'cpu_time': cpu_time,
                 'id': virt_dom.ID()}
 
+    def get_power_states(self, instances):
+        """Retrieve the power states of the given instances from a single
+        listing of all libvirt domains.
+
+        getAllDomainStats() returns the state of every domain in one call;
+        with older libvirt, listAllDomains() saves a lookup per instance.
+        """
+        if hasattr(self._conn, 'getAllDomainStats'):
+            domain_states = [
+                (dom.name(), stats['state.state']) for dom, stats in
+                self._conn.getAllDomainStats(libvirt.VIR_DOMAIN_STATS_STATE)]
+        elif hasattr(self._conn, 'listAllDomains'):
+            domain_states = []
+            for dom in self._conn.listAllDomains():
+                try:
+                    domain_states.append((dom.name(), dom.info()[0]))
+                except libvirt.libvirtError as ex:
+                    # The domain went away since it was listed
+                    LOG.debug(_('Skipping the power state of a domain: %s'),
+                              ex)
+        else:
+            return super(LibvirtDriver, self).get_power_states(instances)
+
+        uuids_by_name = dict((instance['name'], instance['uuid'])
+                             for instance in instances)
+        states = {}
+        for name, state in domain_states:
+            uuid = uuids_by_name.get(name)
+            if uuid is not None:
+                states[uuid] = LIBVIRT_POWER_STATE[state]
+        return states
+
     def _create_domain(self, xml=None, domain=None,
                        instance=None, launch_flags=0, power_on=True):
         """Create a domain.
@@ -2839,6 +2886,12 @@ class LibvirtDriver(driver.ComputeDriver):
         if CONF.libvirt_type == 'lxc':
             return total + 1
 
+        if CONF.libvirt_domain_stats_ttl > 0:
+            for stats in self._domain_stats.get_domains().itervalues():
+                if stats['vcpu_times'] is not None:
+                    total += len(stats['vcpu_times'])
+            return total
+
         dom_ids = self.list_instance_ids()
         for dom_id in dom_ids:
             try:
@@ -2872,13 +2925,7 @@ class LibvirtDriver(driver.ComputeDriver):
         idx3 = m.index('Cached:')
         if CONF.libvirt_type == 'xen':
             used = 0
-            for domain_id in self.list_instance_ids():
-                try:
-                    dom_mem = int(self._lookup_by_id(domain_id).info()[2])
-                except exception.InstanceNotFound:
-                    LOG.info(_("libvirt can't find a domain with id: %s")
-                             % domain_id)
-                    continue
+            for domain_id, dom_mem in self._get_domain_memory():
                 # skip dom0
                 if domain_id != 0:
                     used += dom_mem
@@ -3024,10 +3071,37 @@ class LibvirtDriver(driver.ComputeDriver):
 
         return vol_usage
 
+    def _get_domain_memory(self):
+        """Yield the id and memory, in KiB, of each running domain."""
+        if CONF.libvirt_domain_stats_ttl > 0:
+            for stats in self._domain_stats.get_domains().itervalues():
+                yield stats['id'], int(stats['memory'])
+            return
+
+        for domain_id in self.list_instance_ids():
+            try:
+                dom_mem = int(self._lookup_by_id(domain_id).info()[2])
+            except exception.InstanceNotFound:
+                LOG.info(_("libvirt can't find a domain with id: %s")
+                         % domain_id)
+                continue
+            yield domain_id, dom_mem
+
+    def _get_cached_domain_stats(self, instance_name):
+        """Return the statistics of a domain from the snapshot of all
+        domains, or None if they are not cached.
+        """
+        if CONF.libvirt_domain_stats_ttl > 0:
+            return self._domain_stats.get_domain(instance_name)
+
     def block_stats(self, instance_name, disk):
         """
         Note that this function takes an instance name.
         """
+        stats = self._get_cached_domain_stats(instance_name)
+        if stats is not None and disk in stats['block']:
+            return stats['block'][disk]
+
         try:
             domain = self._lookup_by_name(instance_name)
             return domain.blockStats(disk)
@@ -3046,6 +3120,10 @@ class LibvirtDriver(driver.ComputeDriver):
         """
         Note that this function takes an instance name.
         """
+        stats = self._get_cached_domain_stats(instance_name)
+        if stats is not None and interface in stats['interfaces']:
+            return stats['interfaces'][interface]
+
         domain = self._lookup_by_name(instance_name)
         return domain.interfaceStats(interface)
 
@@ -3683,18 +3761,16 @@ class LibvirtDriver(driver.ComputeDriver):
                             'volume'), {'path': path, 'target': target})
                 continue
 
-            # get the real disk size or
-            # raise a localized error if image is unavailable
-            dk_size = int(os.path.getsize(path))
-
             disk_type = driver_nodes[cnt].get('type')
+            if CONF.libvirt_disk_info_cache:
+                dk_size, virt_size, backing_file = \
+                    self._disk_info_cache.get_disk_info(path, disk_type)
+            else:
+                dk_size, virt_size, backing_file = _get_disk_info(path,
+                                                                  disk_type)
             if disk_type == "qcow2":
-                backing_file = libvirt_utils.get_disk_backing_file(path)
-                virt_size = disk.get_disk_size(path)
                 over_commit_size = int(virt_size) - dk_size
             else:
-                backing_file = ""
-                virt_size = 0
                 over_commit_size = 0
 
             disk_info.append({'type': disk_type,
@@ -3728,6 +3804,12 @@ class LibvirtDriver(driver.ComputeDriver):
                 pass
             # NOTE(gtt116): give change to do other task.
             greenthread.sleep(0)
+
+        if CONF.libvirt_disk_info_cache:
+            self._disk_info_cache.prune()
+            LOG.debug(_('Disk info cache: %(hits)d hits, %(misses)d misses'),
+                      {'hits': self._disk_info_cache.hits,
+                       'misses': self._disk_info_cache.misses})
         return disk_over_committed_size
 
     def unfilter_instance(self, instance, network_info):
@@ -3963,66 +4045,32 @@ class LibvirtDriver(driver.ComputeDriver):
         self._cleanup_resize(instance, network_info)
 
     def get_diagnostics(self, instance):
-        def get_io_devices(xml_doc):
-            """get the list of io devices from the xml document."""
-            result = {"volumes": [], "ifaces": []}
-            try:
-                doc = etree.fromstring(xml_doc)
-            except Exception:
-                return result
-            blocks = [('./devices/disk', 'volumes'),
-                ('./devices/interface', 'ifaces')]
-            for block, key in blocks:
-                section = doc.findall(block)
-                for node in section:
-                    for child in node.getchildren():
-                        if child.tag == 'target' and child.get('dev'):
-                            result[key].append(child.get('dev'))
-            return result
-
         domain = self._lookup_by_name(instance['name'])
+        stats = self._get_cached_domain_stats(instance['name'])
+        if stats is None:
+            stats = DomainStatsSnapshot.get_domain_stats(domain)
+
         output = {}
-        # get cpu time, might launch an exception if the method
-        # is not supported by the underlying hypervisor being
-        # used by libvirt
-        try:
-            cputime = domain.vcpus()[0]
-            for i in range(len(cputime)):
-                output["cpu" + str(i) + "_time"] = cputime[i][2]
-        except libvirt.libvirtError:
-            pass
+        # cpu times are missing if the method is not supported by the
+        # underlying hypervisor being used by libvirt
+        for i, cputime in enumerate(stats['vcpu_times'] or []):
+            output["cpu" + str(i) + "_time"] = cputime
         # get io status
-        xml = domain.XMLDesc(0)
-        dom_io = get_io_devices(xml)
-        for disk in dom_io["volumes"]:
-            try:
-                # blockStats might launch an exception if the method
-                # is not supported by the underlying hypervisor being
-                # used by libvirt
-                stats = domain.blockStats(disk)
-                output[disk + "_read_req"] = stats[0]
-                output[disk + "_read"] = stats[1]
-                output[disk + "_write_req"] = stats[2]
-                output[disk + "_write"] = stats[3]
-                output[disk + "_errors"] = stats[4]
-            except libvirt.libvirtError:
-                pass
-        for interface in dom_io["ifaces"]:
-            try:
-                # interfaceStats might launch an exception if the method
-                # is not supported by the underlying hypervisor being
-                # used by libvirt
-                stats = domain.interfaceStats(interface)
-                output[interface + "_rx"] = stats[0]
-                output[interface + "_rx_packets"] = stats[1]
-                output[interface + "_rx_errors"] = stats[2]
-                output[interface + "_rx_drop"] = stats[3]
-                output[interface + "_tx"] = stats[4]
-                output[interface + "_tx_packets"] = stats[5]
-                output[interface + "_tx_errors"] = stats[6]
-                output[interface + "_tx_drop"] = stats[7]
-            except libvirt.libvirtError:
-                pass
+        for disk, disk_stats in stats['block'].iteritems():
+            output[disk + "_read_req"] = disk_stats[0]
+            output[disk + "_read"] = disk_stats[1]
+            output[disk + "_write_req"] = disk_stats[2]
+            output[disk + "_write"] = disk_stats[3]
+            output[disk + "_errors"] = disk_stats[4]
+        for interface, if_stats in stats['interfaces'].iteritems():
+            output[interface + "_rx"] = if_stats[0]
+            output[interface + "_rx_packets"] = if_stats[1]
+            output[interface + "_rx_errors"] = if_stats[2]
+            output[interface + "_rx_drop"] = if_stats[3]
+            output[interface + "_tx"] = if_stats[4]
+            output[interface + "_tx_packets"] = if_stats[5]
+            output[interface + "_tx_errors"] = if_stats[6]
+            output[interface + "_tx_drop"] = if_stats[7]
         output["memory"] = domain.maxMemory()
         # memoryStats might launch an exception if the method
         # is not supported by the underlying hypervisor being
@@ -4059,6 +4107,188 @@ class LibvirtDriver(driver.ComputeDriver):
         self.firewall_driver.setup_basic_filtering(instance, nw_info)
 
 
+def _get_disk_info(path, disk_type):
+    """Return the size, virtual size and backing file of a disk file.
+
+    The virtual size and backing file are only looked up, with qemu-img,
+    for qcow2 disks.
+    """
+    # get the real disk size or
+    # raise a localized error if image is unavailable
+    dk_size = int(os.path.getsize(path))
+
+    if disk_type == "qcow2":
+        backing_file = libvirt_utils.get_disk_backing_file(path)
+        virt_size = disk.get_disk_size(path)
+    else:
+        backing_file = ""
+        virt_size = 0
+    return dk_size, virt_size, backing_file
+
+
+class DiskInfoCache(object):
+    """Cache of the disk information returned by _get_disk_info().
+
+    Entries are kept per path and only reused while the inode, modification
+    time and size of the file are unchanged, so qemu-img is only run again
+    for disks which were written to, resized or replaced.
+    """
+
+    def __init__(self):
+        self._cache = {}
+        self._seen = set()
+        self.hits = 0
+        self.misses = 0
+
+    def get_disk_info(self, path, disk_type):
+        st = os.stat(path)
+        key = (st.st_ino, st.st_mtime, st.st_size, disk_type)
+        self._seen.add(path)
+
+        entry = self._cache.get(path)
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        info = _get_disk_info(path, disk_type)
+        self._cache[path] = (key, info)
+        return info
+
+    def prune(self):
+        """Drop the entries of disks not looked up since the last prune."""
+        for path in set(self._cache) - self._seen:
+            del self._cache[path]
+        self._seen = set()
+
+
+class DomainStatsSnapshot(object):
+    """Statistics of all running libvirt domains, collected in one pass.
+
+    The vcpu, memory, block and interface counters of every domain are
+    gathered together, with a single getAllDomainStats() call when libvirt
+    supports it, and served until they are older than
+    libvirt_domain_stats_ttl seconds.
+    """
+
+    BLOCK_STATS = ('rd.reqs', 'rd.bytes', 'wr.reqs', 'wr.bytes', 'errs')
+    INTERFACE_STATS = ('rx.bytes', 'rx.pkts', 'rx.errs', 'rx.drop',
+                       'tx.bytes', 'tx.pkts', 'tx.errs', 'tx.drop')
+
+    def __init__(self, driver):
+        self.driver = driver
+        self._domains = {}
+        self._updated_at = None
+
+    def get_domains(self):
+        """Return the statistics of all running domains, keyed by name."""
+        if (self._updated_at is None or
+                timeutils.is_older_than(self._updated_at,
+                                        CONF.libvirt_domain_stats_ttl)):
+            self._domains = self._collect()
+            self._updated_at = timeutils.utcnow()
+        return self._domains
+
+    def get_domain(self, name):
+        """Return the statistics of a running domain, or None."""
+        return self.get_domains().get(name)
+
+    def _collect(self):
+        conn = self.driver._conn
+        if hasattr(conn, 'getAllDomainStats'):
+            return self._collect_all_domain_stats(conn)
+
+        domains = {}
+        for domain_id in self.driver.list_instance_ids():
+            try:
+                domain = self.driver._lookup_by_id(domain_id)
+                stats = self.get_domain_stats(domain)
+                stats['id'] = domain_id
+                stats['memory'] = domain.info()[2]
+                domains[domain.name()] = stats
+            except exception.InstanceNotFound:
+                LOG.info(_("libvirt can't find a domain with id: %s")
+                         % domain_id)
+                continue
+            # NOTE(gtt116): give change to do other task.
+            greenthread.sleep(0)
+        return domains
+
+    def _collect_all_domain_stats(self, conn):
+        domains = {}
+        for domain, raw in conn.getAllDomainStats(
+                libvirt.VIR_DOMAIN_STATS_BALLOON |
+                libvirt.VIR_DOMAIN_STATS_VCPU |
+                libvirt.VIR_DOMAIN_STATS_INTERFACE |
+                libvirt.VIR_DOMAIN_STATS_BLOCK,
+                libvirt.VIR_CONNECT_GET_ALL_DOMAINS_STATS_ACTIVE):
+            vcpu_times = None
+            if 'vcpu.current' in raw:
+                vcpu_times = [raw.get('vcpu.%d.time' % i, 0)
+                              for i in range(raw['vcpu.current'])]
+
+            memory = raw.get('balloon.current')
+            if memory is None:
+                memory = domain.info()[2]
+
+            domains[domain.name()] = {
+                'id': domain.ID(),
+                'memory': memory,
+                'vcpu_times': vcpu_times,
+                'block': self._get_device_stats(raw, 'block',
+                                                self.BLOCK_STATS),
+                'interfaces': self._get_device_stats(raw, 'net',
+                                                     self.INTERFACE_STATS),
+            }
+        return domains
+
+    @staticmethod
+    def _get_device_stats(raw, prefix, keys):
+        devices = {}
+        for i in range(raw.get('%s.count' % prefix, 0)):
+            name = raw.get('%s.%d.name' % (prefix, i))
+            if name:
+                devices[name] = tuple(raw.get('%s.%d.%s' % (prefix, i, key),
+                                              -1) for key in keys)
+        return devices
+
+    @staticmethod
+    def get_domain_stats(domain):
+        """Return the vcpu times and the block and interface counters of
+        a domain, looking them up one by one.
+        """
+        stats = {'vcpu_times': None, 'block': {}, 'interfaces': {}}
+        # vcpus(), blockStats() and interfaceStats() might launch an
+        # exception if the method is not supported by the underlying
+        # hypervisor being used by libvirt
+        try:
+            vcpus = domain.vcpus()
+            if vcpus is not None:
+                stats['vcpu_times'] = [vcpu[2] for vcpu in vcpus[0]]
+        except libvirt.libvirtError:
+            pass
+
+        xml = domain.XMLDesc(0)
+        try:
+            doc = etree.fromstring(xml)
+        except Exception:
+            return stats
+
+        devices = [('./devices/disk/target', 'block', domain.blockStats),
+                   ('./devices/interface/target', 'interfaces',
+                    domain.interfaceStats)]
+        for path, key, get_stats in devices:
+            for target in doc.findall(path):
+                dev = target.get('dev')
+                if not dev:
+                    continue
+                try:
+                    stats[key][dev] = tuple(get_stats(dev))
+                except libvirt.libvirtError:
+                    pass
+        return stats
+
+
 class HostState(object):
     """Manages information about the compute node through libvirt."""
     def __init__(self, driver):
@@ -1406,6 +1406,24 @@ class VMOps(object):
         vm_rec = self._session.call_xenapi("VM.get_record", vm_ref)
         return vm_utils.compile_info(vm_rec)
 
+    def get_power_states(self, instances):
+        """Return the power states of the given instances, fetching the
+        records of all VMs in a single call.
+        """
+        uuids_by_name = dict((instance['name'], instance['uuid'])
+                             for instance in instances)
+        states = {}
+        # NOTE: list_vms() only yields VMs resident on this host, which
+        # leaves out halted ones, so the records are filtered here.
+        for vm_ref, vm_rec in self._session.get_all_refs_and_recs('VM'):
+            if vm_rec["is_a_template"] or vm_rec["is_control_domain"]:
+                continue
+            uuid = uuids_by_name.get(vm_rec["name_label"])
+            if uuid is not None:
+                states[uuid] = vm_utils.XENAPI_POWER_STATE[
+                        vm_rec["power_state"]]
+        return states
+
     def get_diagnostics(self, instance):
         """Return data about VM diagnostics."""
         vm_ref = self._get_vm_opaque_ref(instance)
@@ -17,7 +17,10 @@
 Pluggable Weighing support
 """
 
+import time
+
 from nova import loadables
+from nova.openstack.common import local
 
 
 class WeighedObject(object):
@@ -64,8 +67,14 @@ class BaseWeightHandler(loadables.BaseLoader):
             return []
 
         weighed_objs = [self.object_class(obj, 0.0) for obj in obj_list]
+        request_stats = getattr(local.store, 'request_stats', None)
         for weigher_cls in weigher_classes:
             weigher = weigher_cls()
+            start = time.time()
             weigher.weigh_objects(weighed_objs, weighing_properties)
+            if request_stats is not None:
+                request_stats.add_weigher(weigher_cls.__name__,
+                                          time.time() - start,
+                                          len(weighed_objs))
 
         return sorted(weighed_objs, key=lambda x: x.weight, reverse=True)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Benchmark of the computation of the free capacity of a cell.
+
+Random compute nodes and instance types are generated and the capacities
+of the cell are computed with the per compute node loop, with a new
+CapacityTable and by refreshing a CapacityTable after a number of compute
+nodes changed.  The capacities of the three are checked to be identical
+and the time per refresh is reported for each:
+
+    ./tools/cells/capacity_benchmark.py --hosts 5000 --flavors 80 \\
+        --changed 50
+"""
+import argparse
+import random
+import sys
+import time
+
+from nova.cells import capacity
+
+
+def make_compute_hosts(rand, count):
+    compute_hosts = {}
+    for i in range(count):
+        total_ram_mb = rand.choice([32768, 65536, 131072, 262144])
+        total_disk_mb = rand.choice([500, 1000, 2000, 4000]) * 1024
+        compute_hosts['host%05d' % i] = {
+                'free_ram_mb': rand.randint(-2048, total_ram_mb),
+                'free_disk_mb': rand.randint(-20, total_disk_mb / 1024) * 1024,
+                'total_ram_mb': total_ram_mb,
+                'total_disk_mb': total_disk_mb}
+    return compute_hosts
+
+
+def make_instance_types(rand, count):
+    return [{'memory_mb': rand.choice([512, 1024, 2048, 4096, 8192, 16384]),
+             'root_gb': rand.choice([0, 10, 20, 40, 80]),
+             'ephemeral_gb': rand.choice([0, 0, 50, 100])}
+            for i in range(count)]
+
+
+def change_compute_hosts(rand, compute_hosts, count):
+    for host in rand.sample(sorted(compute_hosts), count):
+        values = compute_hosts[host]
+        values['free_ram_mb'] = rand.randint(0, values['total_ram_mb'])
+
+
+def timed(func, repeat):
+    start = time.time()
+    for i in range(repeat):
+        result = func()
+    return result, (time.time() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--hosts', type=int, default=5000,
+                        help='number of compute nodes in the cell')
+    parser.add_argument('--flavors', type=int, default=80,
+                        help='number of instance types')
+    parser.add_argument('--changed', type=int, default=50,
+                        help='number of compute nodes changing between '
+                             'refreshes')
+    parser.add_argument('--reserve-percent', type=float, default=10.0,
+                        help='percentage of every compute node kept free')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of refreshes to average')
+    args = parser.parse_args()
+
+    if capacity.numpy is None:
+        print("numpy is not available")
+        return 1
+
+    rand = random.Random(0)
+    compute_hosts = make_compute_hosts(rand, args.hosts)
+    instance_types = make_instance_types(rand, args.flavors)
+    reserve_level = args.reserve_percent / 100.0
+
+    def loop():
+        return capacity.get_capacities(compute_hosts, instance_types,
+                                       reserve_level)
+
+    def full():
+        return capacity.CapacityTable().refresh(compute_hosts,
+                                                instance_types,
+                                                reserve_level)
+
+    table = capacity.CapacityTable()
+    table.refresh(compute_hosts, instance_types, reserve_level)
+
+    def incremental():
+        change_compute_hosts(rand, compute_hosts, args.changed)
+        return table.refresh(compute_hosts, instance_types, reserve_level)
+
+    expected, loop_time = timed(loop, args.repeat)
+    result, full_time = timed(full, args.repeat)
+    if result != expected:
+        print("CapacityTable capacities differ from the loop")
+        return 1
+    result, incremental_time = timed(incremental, args.repeat)
+    if result != loop():
+        print("Refreshed CapacityTable capacities differ from the loop")
+        return 1
+
+    print("%d compute nodes, %d instance types, %d changed per refresh" %
+          (args.hosts, args.flavors, args.changed))
+    for name, elapsed in [('loop', loop_time), ('table', full_time),
+                          ('incremental', incremental_time)]:
+        print("%-12s %10.2fms %8.1fx" %
+              (name, elapsed * 1000, loop_time / elapsed))
+
+
+if __name__ == '__main__':
+    sys.exit(main())